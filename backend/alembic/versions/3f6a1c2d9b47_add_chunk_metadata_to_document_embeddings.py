@@ -0,0 +1,35 @@
+"""add chunk metadata to document embeddings
+
+Revision ID: 3f6a1c2d9b47
+Revises: 8dbf026d7fe9
+Create Date: 2026-10-18 10:02:17.540913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a1c2d9b47'
+down_revision: Union[str, None] = '8dbf026d7fe9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('document_embeddings', sa.Column('block_ids', sa.JSON(), nullable=True))
+    op.add_column('document_embeddings', sa.Column('heading_path', sa.JSON(), nullable=True))
+    op.create_index('ix_document_embeddings_note_id_content_hash', 'document_embeddings', ['note_id', 'content_hash'], unique=False)
+    # Hashes now cover whole chunks instead of blocks; drop the old ones so
+    # the next reindex replaces those rows
+    op.execute("UPDATE document_embeddings SET content_hash = NULL WHERE source_type = 'NOTE_TEXT'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_embeddings_note_id_content_hash', table_name='document_embeddings')
+    op.drop_column('document_embeddings', 'heading_path')
+    op.drop_column('document_embeddings', 'block_ids')
@@ -0,0 +1,40 @@
+"""add tenant scope to document embeddings
+
+Revision ID: 5c2d8e7f1a36
+Revises: b71e0c94d2a8
+Create Date: 2026-10-18 13:05:52.804417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2d8e7f1a36'
+down_revision: Union[str, None] = 'b71e0c94d2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('document_embeddings', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.add_column('document_embeddings', sa.Column('workspace_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key('document_embeddings_user_id_fkey', 'document_embeddings', 'users', ['user_id'], ['id'])
+    op.execute(
+        "UPDATE document_embeddings AS de "
+        "SET user_id = notes.user_id, workspace_id = notes.workspace_id "
+        "FROM notes WHERE de.note_id = notes.id"
+    )
+    op.create_index('ix_document_embeddings_user_id_workspace_id', 'document_embeddings', ['user_id', 'workspace_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_embeddings_user_id_workspace_id', table_name='document_embeddings')
+    op.drop_constraint('document_embeddings_user_id_fkey', 'document_embeddings', type_='foreignkey')
+    op.drop_column('document_embeddings', 'workspace_id')
+    op.drop_column('document_embeddings', 'user_id')
@@ -0,0 +1,32 @@
+"""add block tracking to document embeddings
+
+Revision ID: 8dbf026d7fe9
+Revises: 911c472fee53
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8dbf026d7fe9'
+down_revision: Union[str, None] = '911c472fee53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('document_embeddings', sa.Column('block_id', sa.String(), nullable=True))
+    op.add_column('document_embeddings', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_document_embeddings_note_id_block_id', 'document_embeddings', ['note_id', 'block_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_embeddings_note_id_block_id', table_name='document_embeddings')
+    op.drop_column('document_embeddings', 'content_hash')
+    op.drop_column('document_embeddings', 'block_id')
@@ -0,0 +1,114 @@
+"""configure embedding storage
+
+Converts document_embeddings.embedding to the storage pinned below and
+rebuilds the ANN indexes. The target schema is fixed in the revision rather
+than read from settings, so the same revision always produces the same
+schema; switching EMBEDDING_STORAGE or EMBEDDING_DIMENSIONS takes a new
+revision that calls these helpers with the new target.
+
+Shrinking the dimensions truncates and re-normalises the stored vectors,
+which is valid for text-embedding-3 models. When the dimensions grow the
+column is emptied and the backfill_embeddings Celery task re-embeds it; a
+downgrade refuses to do that, since the task may not exist at the older
+revision. The type change rewrites the table under an exclusive lock.
+
+Revision ID: a93f5d21c7e0
+Revises: e4a9b3f06c15
+Create Date: 2026-10-18 15:48:12.905531
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93f5d21c7e0'
+down_revision: Union[str, None] = 'e4a9b3f06c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ANN_INDEX_NAME = 'ix_document_embeddings_embedding_ann'
+BINARY_INDEX_NAME = 'ix_document_embeddings_embedding_bq'
+
+# Schema after this revision, matching the defaults in app/config.py
+EMBEDDING_STORAGE = 'vector'
+EMBEDDING_DIMENSIONS = 1536
+BINARY_INDEX = False
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+# Schema before this revision
+PREVIOUS_EMBEDDING_STORAGE = 'vector'
+PREVIOUS_EMBEDDING_DIMENSIONS = 1536
+
+
+def current_embedding_type():
+    column_type = op.get_bind().execute(sa.text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'document_embeddings'::regclass AND attname = 'embedding'"
+    )).scalar()
+    match = re.match(r"(\w+)\((\d+)\)", column_type or "")
+    if not match:
+        return "vector", 1536
+    return match.group(1), int(match.group(2))
+
+
+def convert_embeddings(storage, dimensions, allow_reembed=False):
+    current_storage, current_dimensions = current_embedding_type()
+    if (current_storage, current_dimensions) == (storage, dimensions):
+        return False
+
+    target = f"{storage}({dimensions})"
+    if dimensions == current_dimensions:
+        using = f"embedding::{target}"
+    elif dimensions < current_dimensions:
+        using = f"l2_normalize(subvector(embedding, 1, {dimensions}))::{target}"
+    elif allow_reembed:
+        using = "NULL"
+    else:
+        raise RuntimeError(
+            f"Converting document_embeddings.embedding from "
+            f"{current_storage}({current_dimensions}) to {target} would clear "
+            f"every stored vector. Re-embed the notes at {dimensions} dimensions "
+            f"before downgrading."
+        )
+
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX_NAME}")
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {BINARY_INDEX_NAME}")
+    op.execute(f"ALTER TABLE document_embeddings ALTER COLUMN embedding TYPE {target} USING {using}")
+    return True
+
+
+def create_indexes(storage, dimensions, binary):
+    ops = 'halfvec_cosine_ops' if storage == 'halfvec' else 'vector_cosine_ops'
+    method = (
+        f"hnsw (embedding {ops}) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {ANN_INDEX_NAME} ON document_embeddings USING {method}")
+        if binary:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {BINARY_INDEX_NAME} ON document_embeddings "
+                f"USING hnsw ((binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops)"
+            )
+        else:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {BINARY_INDEX_NAME}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    convert_embeddings(EMBEDDING_STORAGE, EMBEDDING_DIMENSIONS, allow_reembed=True)
+    create_indexes(EMBEDDING_STORAGE, EMBEDDING_DIMENSIONS, BINARY_INDEX)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Truncated vectors cannot be restored, so this fails rather than
+    # leaving the column empty
+    convert_embeddings(PREVIOUS_EMBEDDING_STORAGE, PREVIOUS_EMBEDDING_DIMENSIONS)
+    create_indexes(PREVIOUS_EMBEDDING_STORAGE, PREVIOUS_EMBEDDING_DIMENSIONS, False)
@@ -0,0 +1,42 @@
+"""add ann index to document embeddings
+
+Revision ID: b71e0c94d2a8
+Revises: 3f6a1c2d9b47
+Create Date: 2026-10-18 11:40:05.127366
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e0c94d2a8'
+down_revision: Union[str, None] = '3f6a1c2d9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_document_embeddings_embedding_ann'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if settings.VECTOR_INDEX_TYPE == 'ivfflat':
+        # IVFFlat picks its lists from existing rows; build it once the table has data
+        method = f"ivfflat (embedding vector_cosine_ops) WITH (lists = {settings.VECTOR_IVFFLAT_LISTS})"
+    else:
+        method = (
+            f"hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {settings.VECTOR_HNSW_M}, ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION})"
+        )
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON document_embeddings USING {method}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
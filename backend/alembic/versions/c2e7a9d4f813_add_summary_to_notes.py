@@ -0,0 +1,30 @@
+"""add summary to notes
+
+Revision ID: c2e7a9d4f813
+Revises: a93f5d21c7e0
+Create Date: 2026-10-18 16:32:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e7a9d4f813'
+down_revision: Union[str, None] = 'a93f5d21c7e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('notes', sa.Column('summary_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'summary_updated_at')
+    op.drop_column('notes', 'summary')
@@ -0,0 +1,33 @@
+"""add full text search to document embeddings
+
+Revision ID: e4a9b3f06c15
+Revises: 5c2d8e7f1a36
+Create Date: 2026-10-18 14:21:30.662094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9b3f06c15'
+down_revision: Union[str, None] = '5c2d8e7f1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('document_embeddings', sa.Column('content_tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('simple', content)", persisted=True), nullable=True))
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_embeddings_content_tsv ON document_embeddings USING gin (content_tsv)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_embeddings_content_tsv")
+    op.drop_column('document_embeddings', 'content_tsv')
@@ -43,7 +43,128 @@ class Setting(BaseSettings):
     PASSWORD_RESET_CODE_EXPIRE_MINUTES: int
 
     OPENAI_API_KEY: str
+    CHAT_MODEL: str = "gpt-4.1-nano"
+    # Shared HTTP pool and per-process limits for OpenAI calls
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_MAX_CONNECTIONS: int = 50
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    OPENAI_MAX_CONCURRENT_REQUESTS: int = 32
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    # text-embedding-3 models accept a reduced output size
+    EMBEDDING_DIMENSIONS: int = 1536
+    # "vector" (float32) or "halfvec" (float16)
+    EMBEDDING_STORAGE: str = "vector"
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
+    # Provider limits for a single embeddings request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100000
+    EMBEDDING_BATCH_MAX_INPUTS: int = 2048
+    EMBEDDING_INPUT_MAX_TOKENS: int = 8191
+    # Per-process share of the embeddings quota used by the async pipeline
+    EMBEDDING_RPM_LIMIT: int = 3000
+    EMBEDDING_TPM_LIMIT: int = 1000000
+    EMBEDDING_PIPELINE_BATCH_INPUTS: int = 64
+    EMBEDDING_MAX_PARALLEL_BATCHES: int = 4
+    EMBEDDING_MAX_RETRIES: int = 6
+    EMBEDDING_BACKOFF_BASE_SECONDS: float = 1.0
+    EMBEDDING_BACKOFF_MAX_SECONDS: float = 60.0
+    # "bulk" (multi-row INSERT, one transaction) or "orm" (one object per row)
+    EMBEDDING_WRITE_MODE: str = "bulk"
+    EMBEDDING_BULK_INSERT_ROWS: int = 500
+    # ANN index on document_embeddings.embedding: "hnsw" or "ivfflat"
+    VECTOR_INDEX_TYPE: str = "hnsw"
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_HNSW_EF_SEARCH: int = 40
+    VECTOR_IVFFLAT_LISTS: int = 1000
+    VECTOR_IVFFLAT_PROBES: int = 10
+    # pgvector >= 0.8 iterative scans for filtered searches: "relaxed_order",
+    # "strict_order" or "off"; ignored on older pgvector versions
+    VECTOR_ITERATIVE_SCAN: str = "relaxed_order"
+    # Filtered searches over at most this many chunks skip the ANN index and
+    # rank their scope exactly; larger scopes on older pgvector versions
+    # widen ef_search / probes by the filter's selectivity instead
+    VECTOR_EXACT_SCAN_MAX_ROWS: int = 10000
+    # First pass over binary-quantized vectors, re-ranked at full precision
+    VECTOR_BINARY_RERANK: bool = False
+    VECTOR_BINARY_CANDIDATE_MULTIPLIER: int = 10
+    # Retrieval: "vector", "lexical" or "hybrid" (reciprocal rank fusion);
+    # compare them with scripts/evaluate_retrieval before changing the default
+    SEARCH_MODE: str = "vector"
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    HYBRID_RRF_K: int = 60
+    # Optional in-process NumPy index for users with few chunks
+    LOCAL_VECTOR_INDEX_ENABLED: bool = False
+    LOCAL_VECTOR_INDEX_DIR: str = "/tmp/rag-note-vector-index"
+    # "float32", or "float16" to halve memory at several times the scoring
+    # cost (float16 rows are upcast before scoring)
+    LOCAL_VECTOR_INDEX_DTYPE: str = "float32"
+    LOCAL_VECTOR_INDEX_MAX_ROWS: int = 20000
+    LOCAL_VECTOR_INDEX_MAX_USERS: int = 256
+    # Query embedding and search result caches (in-process LRU over Redis)
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_LOCAL_MAX_ENTRIES: int = 1024
+    QUERY_RESULT_CACHE_TTL_SECONDS: int = 600
+    # Local intent classifier tried before the LLM router
+    INTENT_CLASSIFIER_ENABLED: bool = True
+    INTENT_CLASSIFIER_MIN_SIMILARITY: float = 0.45
+    INTENT_CLASSIFIER_MIN_MARGIN: float = 0.05
+    # Start retrieval for the raw message while the LLM router runs
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = True
+    SPECULATIVE_RETRIEVAL_WORKERS: int = 8
+    # Threads routing and retrieving async chat turns per process; turns
+    # beyond this wait for a free worker
+    CHAT_PREPARE_WORKERS: int = 16
+    # Delta SSE protocol: tokens are batched into frames of at most this
+    # many characters or milliseconds
+    SSE_DELTA_MAX_CHARS: int = 64
+    SSE_DELTA_MAX_INTERVAL_MS: int = 50
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    # Metrics are counted in-process and written to Redis on this interval
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # Coalesce identical in-flight LLM and embedding calls; optionally across
+    # processes through Redis
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_REDIS_ENABLED: bool = False
+    SINGLE_FLIGHT_REDIS_WAIT_SECONDS: int = 60
+    SINGLE_FLIGHT_REDIS_POLL_SECONDS: float = 0.05
+    SINGLE_FLIGHT_REDIS_RESULT_TTL_SECONDS: int = 5
+    # Map-reduce summaries: cached per note, rolled up per workspace
+    NOTE_SUMMARY_INPUT_MAX_TOKENS: int = 3000
+    NOTE_SUMMARY_EXCERPT_TOKENS: int = 120
+    # Serialised content read per note for an excerpt; BlockNote JSON is
+    # mostly markup, so this is well above the excerpt's own size
+    NOTE_SUMMARY_EXCERPT_SOURCE_CHARS: int = 4000
+    NOTE_SUMMARY_QUEUED_TTL_SECONDS: int = 600
+    NOTE_SUMMARY_MAX_INLINE: int = 8
+    NOTE_SUMMARY_PARALLELISM: int = 4
+    NOTE_SUMMARY_FETCH_BATCH: int = 500
+    NOTE_SUMMARY_ROLLUP_MAX_TOKENS: int = 400
+    NOTE_SUMMARY_ROLLUP_TTL_SECONDS: int = 7 * 24 * 3600
+    NOTE_REINDEX_DEBOUNCE_SECONDS: float = 2.0
+    NOTE_REINDEX_SCHEDULED_TTL_SECONDS: int = 600
+    NOTE_REINDEX_LOCK_TIMEOUT_SECONDS: int = 300
+    # Failed reindexes are retried after base * 2^n seconds, up to the max
+    NOTE_REINDEX_MAX_RETRIES: int = 5
+    NOTE_REINDEX_RETRY_BASE_SECONDS: float = 10.0
+    NOTE_REINDEX_RETRY_MAX_SECONDS: float = 300.0
     MAX_ALLOWED_TOKENS: int = 400
+    # Chat prompt packing: history, retrieved chunks and note contents are
+    # fitted into this many tokens instead of rejecting long conversations
+    CHAT_PROMPT_TOKEN_BUDGET: int = 3000
+    CHAT_HISTORY_MAX_SHARE: float = 0.4
+    CHAT_CONTEXT_MIN_ITEM_TOKENS: int = 48
+    CHAT_CONTEXT_MIN_OVERLAP_CHARS: int = 20
+    TOKEN_COUNT_CACHE_MAX_ENTRIES: int = 10000
+    # Server-side chat sessions with a rolling summary of older turns
+    CHAT_SESSION_TTL_SECONDS: int = 7 * 24 * 3600
+    CHAT_SESSION_SUMMARY_TRIGGER_TOKENS: int = 1500
+    CHAT_SESSION_KEEP_RECENT_TURNS: int = 6
+    CHAT_SESSION_SUMMARY_MAX_TOKENS: int = 300
+    CHAT_SESSION_SUMMARY_LOCK_SECONDS: int = 120
     ALLOWED_ORIGINS: str = "http://localhost:5173"
 
     @property
@@ -1,3 +1,5 @@
+import asyncio
+from uuid import UUID
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException
 from fastapi.responses import StreamingResponse
@@ -6,20 +8,39 @@ from app.models.user import User
 from app.utils.jwt import get_current_user
 from app.schemas.chatbot_schemas import RAGChatRequest
 from app.services.rag_chatbot_service import RAGChatbotService
+from app.services.chat_session_service import ChatSessionService
 from app.schemas.file_schemas import PdfUploadRequest
 from app.models.note import Note
+from app.utils.metrics import average_durations, get_metrics, hit_rate
+from app.services.openai_client import OpenAiClientRegistry
+from app.utils.sse import with_heartbeats
 
 
 class ChatbotController:
-    def rag_chat(
+    async def rag_chat(
         req: RAGChatRequest,
-        db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user),
     ):
+        if req.session_id:
+            # Fail before streaming starts so the client gets a plain 404
+            await asyncio.to_thread(
+                ChatSessionService.get_or_404, req.session_id, current_user.id
+            )
+
         chatbot = RAGChatbotService()
         return StreamingResponse(
-            chatbot.answer(
-                req.message, current_user.id, db, req.note_ids, req.chat_history
+            with_heartbeats(
+                chatbot.aanswer(
+                    req.message,
+                    current_user.id,
+                    req.note_ids,
+                    req.chat_history,
+                    workspace_id=req.workspace_id,
+                    search_mode=req.search_mode,
+                    session_id=req.session_id,
+                    protocol_version=req.protocol_version,
+                    current_note_id=req.current_note_id,
+                )
             ),
             media_type="text/event-stream",
             headers={
@@ -29,6 +50,24 @@ class ChatbotController:
             },
         )
 
+    def create_chat_session(current_user: User = Depends(get_current_user)):
+        session_id = ChatSessionService.create(current_user.id)
+        return ChatSessionService.to_response(session_id, "", [])
+
+    def get_chat_session(
+        session_id: UUID, current_user: User = Depends(get_current_user)
+    ):
+        ChatSessionService.get_or_404(session_id, current_user.id)
+        summary, turns = ChatSessionService.get_history(session_id)
+        return ChatSessionService.to_response(session_id, summary, turns)
+
+    def delete_chat_session(
+        session_id: UUID, current_user: User = Depends(get_current_user)
+    ):
+        ChatSessionService.get_or_404(session_id, current_user.id)
+        ChatSessionService.delete(session_id)
+        return {"status": "success", "message": "Chat session deleted"}
+
     def process_pdf_for_vector_db(
         data: PdfUploadRequest,
         db: Session = Depends(get_db),
@@ -58,3 +97,38 @@ class ChatbotController:
             "message": "PDF processing has been queued",
             "taskId": task.id,  # Return the Celery task ID
         }
+
+    def get_chatbot_metrics():
+        metrics = get_metrics()
+        return {
+            **metrics,
+            "hit_rates": {
+                "embedding_cache": hit_rate(
+                    metrics, ["embedding_cache_hits"], ["embedding_cache_misses"]
+                ),
+                "query_embedding_local": hit_rate(
+                    metrics,
+                    ["query_embedding_local_hits"],
+                    ["query_embedding_local_misses"],
+                ),
+                "search_results": hit_rate(
+                    metrics,
+                    ["search_result_local_hits", "search_result_redis_hits"],
+                    ["search_result_misses"],
+                ),
+                # Share of upstream calls answered by an identical call in flight
+                **{
+                    f"single_flight_{name}": hit_rate(
+                        metrics,
+                        [
+                            f"single_flight_{name}_shared",
+                            f"single_flight_{name}_shared_remote",
+                        ],
+                        [f"single_flight_{name}_calls"],
+                    )
+                    for name in ("chat", "embeddings", "chat_stream")
+                },
+            },
+            "latency_ms": average_durations(metrics),
+            "openai_pool": OpenAiClientRegistry.get_pool_stats(),
+        }
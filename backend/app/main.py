@@ -12,6 +12,9 @@ from app.routes import (
 from app.db.database import Base, engine
 from app.config import settings
 from sqlalchemy import text
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Create pgvector extension if it doesn't exist
 with engine.connect() as conn:
@@ -20,6 +23,20 @@ with engine.connect() as conn:
 
 Base.metadata.create_all(bind=engine)
 
+# Without an ANN index every chat search scans all embeddings
+with engine.connect() as conn:
+    has_vector_index = conn.execute(
+        text(
+            "SELECT 1 FROM pg_indexes WHERE tablename = 'document_embeddings' "
+            "AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')"
+        )
+    ).first()
+if not has_vector_index:
+    logger.warning(
+        "No HNSW/IVFFlat index on document_embeddings.embedding; vector search "
+        "will use sequential scans. Run `alembic upgrade head` to create it."
+    )
+
 app = FastAPI(title="FastAPI Note Management", version="1.0.0")
 
 origins = settings.ALLOWED_ORIGINS.split(",") if settings.ALLOWED_ORIGINS else ["*"]
@@ -1,11 +1,39 @@
-from sqlalchemy import Column, Integer, DateTime, func, Text, ForeignKey, Enum, String
+from sqlalchemy import (
+    Column,
+    Integer,
+    DateTime,
+    func,
+    Text,
+    ForeignKey,
+    Enum,
+    String,
+    Index,
+    JSON,
+    Computed,
+)
 from app.db.database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from pgvector.sqlalchemy import Vector, HALFVEC
+from app.config import settings
 import uuid
 import enum
 
+# The 'simple' configuration does no stemming or stop-word removal, which
+# keeps identifiers, names and code searchable in any language
+TEXT_SEARCH_CONFIG = "simple"
+
+
+
+def embedding_column_type():
+    """
+    Storage type of the embedding column: full float32 vectors or halfvec,
+    with EMBEDDING_DIMENSIONS dimensions.
+    """
+    if settings.EMBEDDING_STORAGE == "halfvec":
+        return HALFVEC(settings.EMBEDDING_DIMENSIONS)
+    return Vector(settings.EMBEDDING_DIMENSIONS)
+
 
 # Add this Enum class
 class EmbeddingSource(enum.Enum):
@@ -15,14 +43,35 @@ class EmbeddingSource(enum.Enum):
 
 class DocumentEmbedding(Base):
     __tablename__ = "document_embeddings"
+    __table_args__ = (
+        Index("ix_document_embeddings_note_id_block_id", "note_id", "block_id"),
+        Index(
+            "ix_document_embeddings_note_id_content_hash", "note_id", "content_hash"
+        ),
+        Index(
+            "ix_document_embeddings_user_id_workspace_id", "user_id", "workspace_id"
+        ),
+        Index(
+            "ix_document_embeddings_content_tsv",
+            "content_tsv",
+            postgresql_using="gin",
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     note_id = Column(
         UUID(as_uuid=True), ForeignKey("notes.id", ondelete="CASCADE"), nullable=True
     )
+    # Copied from the note so searches can be scoped without a join
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    workspace_id = Column(UUID(as_uuid=True), nullable=True)
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(1536))  # Mistral embeddings are 1024-dimensional
+    content_tsv = Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', content)", persisted=True),
+    )
+    embedding = Column(embedding_column_type())
 
     # Add these new columns
     source_type = Column(
@@ -30,6 +79,14 @@ class DocumentEmbedding(Base):
     )
     source_file = Column(String, nullable=True)  # Stores filename for PDFs
 
+    # BlockNote blocks the chunk was built from (block_id is the first one),
+    # the headings enclosing it, and a hash of the chunk used to reindex
+    # only what changed
+    block_id = Column(String, nullable=True)
+    block_ids = Column(JSON, nullable=True)
+    heading_path = Column(JSON, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -1,9 +1,10 @@
+from uuid import UUID
 from fastapi import Depends
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.utils.jwt import get_current_user
 from app.models.user import User as UserModel
-from app.schemas.chatbot_schemas import RAGChatRequest
+from app.schemas.chatbot_schemas import ChatSessionResponse, RAGChatRequest
 from app.controllers.chatbot_controller import ChatbotController
 from app.schemas.file_schemas import PdfUploadRequest
 from app.utils.api_router import CustomApiRouter
@@ -12,15 +13,44 @@ router = CustomApiRouter()
 
 
 @router.post("/chat", response_model=dict)
-def chatbot_endpoint(
+async def chatbot_endpoint(
     data: RAGChatRequest,
-    db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user),
 ):
     """
-    Endpoint for the chatbot.
+    Endpoint for the chatbot. Streams on the event loop; the request's DB
+    work uses short-lived sessions of its own.
     """
-    return ChatbotController.rag_chat(data, db, current_user)
+    return await ChatbotController.rag_chat(data, current_user)
+
+
+@router.post("/sessions", response_model=ChatSessionResponse)
+def create_chat_session_endpoint(current_user: UserModel = Depends(get_current_user)):
+    """
+    Start a server-side chat session; pass its id as session_id instead of
+    resending chat_history on every turn.
+    """
+    return ChatbotController.create_chat_session(current_user)
+
+
+@router.get("/sessions/{session_id}", response_model=ChatSessionResponse)
+def get_chat_session_endpoint(
+    session_id: UUID, current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Endpoint returning a chat session's summary and recent turns.
+    """
+    return ChatbotController.get_chat_session(session_id, current_user)
+
+
+@router.delete("/sessions/{session_id}", response_model=dict)
+def delete_chat_session_endpoint(
+    session_id: UUID, current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Endpoint to delete a chat session.
+    """
+    return ChatbotController.delete_chat_session(session_id, current_user)
 
 
 @router.post("/upload/process-pdf", dependencies=[Depends(get_current_user)])
@@ -29,3 +59,11 @@ def process_pdf_endpoint(data: PdfUploadRequest, db: Session = Depends(get_db)):
     Endpoint to process PDF for vector DB.
     """
     return ChatbotController.process_pdf_for_vector_db(data, db)
+
+
+@router.get("/metrics", response_model=dict, dependencies=[Depends(get_current_user)])
+def chatbot_metrics_endpoint():
+    """
+    Endpoint exposing RAG pipeline counters (cache hits, misses, ...).
+    """
+    return ChatbotController.get_chatbot_metrics()
@@ -1,8 +1,25 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
+from uuid import UUID
 from pydantic import BaseModel
 
 
 class RAGChatRequest(BaseModel):
     message: str
-    note_ids: Optional[List[str]] = None
+    # Restricts retrieval to these notes
+    note_ids: Optional[List[UUID]] = None
+    # Note open in the editor; only a hint for "this note", not a filter
+    current_note_id: Optional[UUID] = None
+    workspace_id: Optional[UUID] = None
+    search_mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    # Either a server-side session (see POST /chatbot/sessions) or the full
+    # history resent by the client
+    session_id: Optional[UUID] = None
     chat_history: Optional[List[dict]] = None
+    # SSE format: 1 re-sends the whole answer per event, 2 sends deltas
+    protocol_version: Literal[1, 2] = 1
+
+
+class ChatSessionResponse(BaseModel):
+    session_id: str
+    summary: str = ""
+    turns: List[dict] = []
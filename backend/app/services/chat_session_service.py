@@ -0,0 +1,232 @@
+import json
+import logging
+import time
+import uuid
+from typing import List, Tuple
+from uuid import UUID
+from fastapi import HTTPException, status
+from langchain.schema import HumanMessage, SystemMessage
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.utils.tokens import count_tokens, get_encoding
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY_PREFIX = "chat_session"
+
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a user and the "
+    "assistant of a note-taking app. Merge the current summary with the new "
+    "turns into one updated summary. Keep facts, names, note ids, decisions and "
+    "open questions; drop greetings and repetition. Reply with the summary only."
+)
+
+# Append turns (ARGV[3:]) to a session and add ARGV[1] to its pending tokens,
+# refreshing the TTL (ARGV[2]). Returns the new pending token count, or -1
+# without writing anything when the session has expired: recreating the hash
+# would leave it without its user_id.
+_APPEND_TURNS_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return -1
+    end
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, 3))
+    local pending = redis.call('HINCRBY', KEYS[1], 'pending_tokens', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return pending
+    """
+)
+
+# Store a new summary (ARGV[1]) covering the first ARGV[3] turns, which held
+# ARGV[2] tokens, unless the session has expired meanwhile. Returns 1 when
+# the summary was stored.
+_STORE_SUMMARY_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'summary', ARGV[1])
+    redis.call('HINCRBY', KEYS[1], 'pending_tokens', -tonumber(ARGV[2]))
+    redis.call('LTRIM', KEYS[2], ARGV[3], -1)
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return 1
+    """
+)
+
+
+class ChatSessionService:
+    """
+    Server-side chat sessions stored in Redis.
+
+    A session keeps its recent turns, each with its token count, in a list and
+    folds older turns into a rolling summary. Once the unsummarised turns pass
+    CHAT_SESSION_SUMMARY_TRIGGER_TOKENS a Celery task summarises all but the
+    newest CHAT_SESSION_KEEP_RECENT_TURNS, so what a turn has to load and send
+    stays bounded however long the conversation runs. Sessions expire after
+    CHAT_SESSION_TTL_SECONDS without activity.
+    """
+
+    @staticmethod
+    def _key(session_id) -> str:
+        return f"{SESSION_KEY_PREFIX}:{session_id}"
+
+    @staticmethod
+    def _turns_key(session_id) -> str:
+        return f"{SESSION_KEY_PREFIX}:{session_id}:turns"
+
+    @staticmethod
+    def _summarizing_key(session_id) -> str:
+        return f"{SESSION_KEY_PREFIX}:{session_id}:summarizing"
+
+    @staticmethod
+    def create(user_id: int) -> str:
+        session_id = str(uuid.uuid4())
+        key = ChatSessionService._key(session_id)
+        pipe = redis_client.pipeline()
+        pipe.hset(
+            key,
+            mapping={
+                "user_id": user_id,
+                "summary": "",
+                "pending_tokens": 0,
+                "created_at": time.time(),
+            },
+        )
+        pipe.expire(key, settings.CHAT_SESSION_TTL_SECONDS)
+        pipe.execute()
+        return session_id
+
+    @staticmethod
+    def get_or_404(session_id: UUID, user_id: int) -> dict:
+        """
+        Return the session record, making sure it belongs to the user.
+        """
+        session = redis_client.hgetall(ChatSessionService._key(session_id))
+        if not session or session.get("user_id") != str(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found"
+            )
+        return session
+
+    @staticmethod
+    def get_history(session_id: UUID) -> Tuple[str, List[dict]]:
+        """
+        Return the rolling summary and the turns not summarised yet, oldest
+        first. Turns carry their token counts.
+        """
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hget(ChatSessionService._key(session_id), "summary")
+        pipe.lrange(ChatSessionService._turns_key(session_id), 0, -1)
+        summary, turns = pipe.execute()
+        return summary or "", [json.loads(turn) for turn in turns]
+
+    @staticmethod
+    def append_turns(session_id: UUID, turns: List[Tuple[str, str]]):
+        """
+        Record new (role, content) turns and schedule summarisation when the
+        unsummarised part of the session has grown past the threshold.
+        Nothing is recorded once the session has expired.
+        """
+        key = ChatSessionService._key(session_id)
+        turns_key = ChatSessionService._turns_key(session_id)
+        records = [
+            {"role": role, "content": content, "tokens": count_tokens(content)}
+            for role, content in turns
+            if content
+        ]
+        if not records:
+            return
+
+        pending_tokens = _APPEND_TURNS_SCRIPT(
+            keys=[key, turns_key],
+            args=[
+                sum(r["tokens"] for r in records),
+                settings.CHAT_SESSION_TTL_SECONDS,
+                *[json.dumps(record) for record in records],
+            ],
+        )
+        if pending_tokens < 0:
+            logger.warning(f"Chat session {session_id} expired; turns not recorded")
+            return
+
+        if pending_tokens <= settings.CHAT_SESSION_SUMMARY_TRIGGER_TOKENS:
+            return
+        # One summarisation per session at a time
+        if redis_client.set(
+            ChatSessionService._summarizing_key(session_id),
+            1,
+            nx=True,
+            ex=settings.CHAT_SESSION_SUMMARY_LOCK_SECONDS,
+        ):
+            from app.tasks import summarize_chat_session
+
+            summarize_chat_session.delay(str(session_id))
+
+    @staticmethod
+    def summarize(session_id: str, chat_fn) -> bool:
+        """
+        Fold all but the most recent turns into the rolling summary.
+        chat_fn takes LangChain messages and returns the reply text.
+        """
+        key = ChatSessionService._key(session_id)
+        turns_key = ChatSessionService._turns_key(session_id)
+        try:
+            summary, turns = ChatSessionService.get_history(session_id)
+            older = turns[: -settings.CHAT_SESSION_KEEP_RECENT_TURNS or None]
+            if not older or not redis_client.exists(key):
+                return False
+
+            transcript = "\n".join(
+                f"{turn['role']}: {turn['content']}" for turn in older
+            )
+            summary = chat_fn(
+                [
+                    SystemMessage(content=SUMMARY_PROMPT),
+                    HumanMessage(
+                        content=f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+                    ),
+                ]
+            )
+            encoding = get_encoding()
+            tokens = encoding.encode(summary)
+            if len(tokens) > settings.CHAT_SESSION_SUMMARY_MAX_TOKENS:
+                summary = encoding.decode(
+                    tokens[: settings.CHAT_SESSION_SUMMARY_MAX_TOKENS]
+                )
+
+            # Turns are only ever appended, so the summarised ones are still
+            # at the head of the list
+            stored = _STORE_SUMMARY_SCRIPT(
+                keys=[key, turns_key],
+                args=[
+                    summary,
+                    sum(t["tokens"] for t in older),
+                    len(older),
+                    settings.CHAT_SESSION_TTL_SECONDS,
+                ],
+            )
+            if not stored:
+                return False
+            logger.info(f"Summarised {len(older)} turns of chat session {session_id}")
+            return True
+        finally:
+            redis_client.delete(ChatSessionService._summarizing_key(session_id))
+
+    @staticmethod
+    def delete(session_id: UUID):
+        redis_client.delete(
+            ChatSessionService._key(session_id),
+            ChatSessionService._turns_key(session_id),
+            ChatSessionService._summarizing_key(session_id),
+        )
+
+    @staticmethod
+    def to_response(session_id: UUID, summary: str, turns: List[dict]) -> dict:
+        return {
+            "session_id": str(session_id),
+            "summary": summary,
+            "turns": [
+                {"role": turn["role"], "content": turn["content"]} for turn in turns
+            ],
+        }
@@ -0,0 +1,159 @@
+import logging
+from functools import lru_cache
+from typing import Callable, List
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+LIST_ITEM_TYPES = {"bulletListItem", "numberedListItem", "checkListItem"}
+
+
+@lru_cache(maxsize=8)
+def get_text_splitter(chunk_size=800, overlap=100) -> RecursiveCharacterTextSplitter:
+    """
+    Splitters are stateless, so one instance per configuration is shared.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap,
+        length_function=len,
+    )
+
+
+class ChunkingService:
+    """
+    Structure-aware chunker for BlockNote documents.
+
+    Headings start a new section, and list items, table rows and other blocks
+    are kept whole inside a chunk whenever they fit. Consecutive blocks of the
+    same section are packed together up to chunk_size characters; only a
+    single block longer than that is split with the character splitter.
+
+    Each chunk is a dict with:
+        content: chunk text, prefixed with its heading path
+        block_ids: ids of the blocks the chunk was built from
+        heading_path: titles of the enclosing headings, outermost first
+        chunk_index: position of the chunk within its first block
+    """
+
+    def __init__(self, extract_text: Callable, chunk_size=800, overlap=100):
+        self.extract_text = extract_text
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def _block_id(self, block, fallback):
+        return str(block.get("id") or fallback)
+
+    def _table_rows(self, block) -> List[str]:
+        rows = []
+        table_content = block.get("content")
+        if not isinstance(table_content, dict):
+            return rows
+        for row in table_content.get("rows") or []:
+            cells = row.get("cells") if isinstance(row, dict) else None
+            if not isinstance(cells, list):
+                continue
+            row_texts = []
+            for cell in cells:
+                items = cell.get("content") if isinstance(cell, dict) else cell
+                row_texts.append(
+                    self.extract_text(items if isinstance(items, list) else [])
+                )
+            if row_texts:
+                rows.append(" | ".join(row_texts))
+        return rows
+
+    def _units(self, blocks, heading_path, id_prefix=""):
+        """
+        Yield (kind, block_id, text, heading_path) units in document order.
+        kind is "heading" or "text"; heading units carry the updated path.
+        """
+        for position, block in enumerate(blocks):
+            if not isinstance(block, dict):
+                continue
+            block_id = self._block_id(block, f"position:{id_prefix}{position}")
+            block_type = block.get("type")
+            own = {key: value for key, value in block.items() if key != "children"}
+
+            if block_type == "heading":
+                title = self.extract_text(own)
+                level = (block.get("props") or {}).get("level", 1)
+                heading_path = [
+                    (heading_level, heading)
+                    for heading_level, heading in heading_path
+                    if heading_level < level
+                ]
+                if title:
+                    heading_path.append((level, title))
+                yield "heading", block_id, title, heading_path
+            elif block_type == "table":
+                for row in self._table_rows(block):
+                    if row:
+                        yield "text", block_id, row, heading_path
+            else:
+                text = self.extract_text(own)
+                if text:
+                    if block_type in LIST_ITEM_TYPES:
+                        text = f"- {text}"
+                    yield "text", block_id, text, heading_path
+
+            children = block.get("children")
+            if isinstance(children, list) and children:
+                yield from self._units(
+                    children, heading_path, f"{id_prefix}{position}."
+                )
+
+    def _make_chunk(self, texts, block_ids, heading_path, chunk_index):
+        titles = [title for _, title in heading_path]
+        body = "\n".join(texts)
+        content = f"{' > '.join(titles)}\n{body}" if titles else body
+        return {
+            "content": content,
+            "block_ids": list(dict.fromkeys(block_ids)),
+            "heading_path": titles,
+            "chunk_index": chunk_index,
+        }
+
+    def chunk_blocks(self, blocks) -> List[dict]:
+        if isinstance(blocks, dict):
+            blocks = [blocks]
+        if not isinstance(blocks, list):
+            return []
+
+        chunks = []
+        texts, block_ids, size = [], [], 0
+        current_path = []
+
+        def flush():
+            nonlocal texts, block_ids, size
+            if texts:
+                chunks.append(self._make_chunk(texts, block_ids, current_path, 0))
+            texts, block_ids, size = [], [], 0
+
+        for kind, block_id, text, heading_path in self._units(blocks, []):
+            if heading_path != current_path:
+                # A new section starts; never let a chunk cross a heading
+                flush()
+                current_path = heading_path
+            if kind == "heading":
+                continue
+
+            if len(text) > self.chunk_size:
+                flush()
+                pieces = get_text_splitter(self.chunk_size, self.overlap).split_text(
+                    text
+                )
+                for idx, piece in enumerate(pieces):
+                    chunks.append(
+                        self._make_chunk([piece], [block_id], current_path, idx)
+                    )
+                continue
+
+            if texts and size + len(text) + 1 > self.chunk_size:
+                flush()
+            texts.append(text)
+            block_ids.append(block_id)
+            size += len(text) + 1
+
+        flush()
+        return chunks
@@ -0,0 +1,215 @@
+import logging
+from typing import List, Optional
+from app.config import settings
+from app.utils.tokens import count_tokens, get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Per OpenAI's documentation for chat models: every message follows
+# <|start|>{role/name}\n{content}<|end|>, and the reply is primed with 3 tokens
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+class PackedContext:
+    """
+    Result of packing: the history turns (oldest first) and context items
+    (best first) that fit, plus accounting for logs and metrics.
+    """
+
+    def __init__(self):
+        self.history: List[dict] = []
+        self.chunks: List[str] = []
+        self.documents: List[str] = []
+        self.tokens = 0
+        self.dropped = 0
+        self.trimmed = 0
+
+
+class ContextPackerService:
+    """
+    Fit a chat prompt into a fixed token budget.
+
+    The system prompt and the user's question are always kept. The rest of
+    the budget is filled in priority order: chat history newest first (up to
+    CHAT_HISTORY_MAX_SHARE of what is left), then retrieved chunks by rank,
+    then whole documents such as note contents or summaries. The item that
+    crosses the budget is trimmed when a useful part of it still fits;
+    everything after it is dropped. Text that overlaps a chunk already packed
+    (neighbouring chunks share their overlap window) is removed first.
+    """
+
+    def __init__(self, budget: int = None, model: str = None):
+        self.budget = budget or settings.CHAT_PROMPT_TOKEN_BUDGET
+        self.model = model
+        self.encoding = get_encoding(model)
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        # Leave room for the ellipsis marking the cut
+        max_tokens -= self.count_tokens(" …")
+        return self.encoding.decode(tokens[:max_tokens]).rstrip() + " …"
+
+    @staticmethod
+    def _covered_length(text: str, packed: List[str], from_end=False) -> int:
+        """
+        Length of the longest prefix (or suffix) of text that already appears
+        inside a packed chunk. Containment is monotone in the length, so the
+        longest match is found by binary search.
+        """
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            part = text[-middle:] if from_end else text[:middle]
+            if any(part in other for other in packed):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def deduplicate(self, chunk: str, packed: List[str]) -> Optional[str]:
+        """
+        Strip the parts of chunk already present in packed chunks. Returns
+        None when nothing new is left.
+
+        Pieces of one section all start with the same heading-path line (see
+        ChunkingService), which would hide their overlap, so that line is set
+        aside while comparing. It is kept once per source: a piece whose
+        heading is already shown by a packed chunk from the same note drops it.
+        """
+        header, separator, body = chunk.partition("\n\n")
+        if not separator:
+            header, body = "", chunk
+        packed_parts = []
+        for other in packed:
+            other_header, other_separator, other_body = other.partition("\n\n")
+            if not other_separator:
+                other_header, other_body = "", other
+            packed_parts.append((other_header, other_body))
+
+        heading, newline, rest = body.partition("\n")
+        heading_line = heading + "\n"
+        heading_shown = False
+        if newline and any(
+            other_body.startswith(heading_line) for _, other_body in packed_parts
+        ):
+            body = rest
+            bodies = [
+                other_body[len(heading_line) :]
+                if other_body.startswith(heading_line)
+                else other_body
+                for _, other_body in packed_parts
+            ]
+            heading_shown = any(
+                other_header == header and other_body.startswith(heading_line)
+                for other_header, other_body in packed_parts
+            )
+        else:
+            heading = ""
+            bodies = [other_body for _, other_body in packed_parts]
+
+        prefix = self._covered_length(body, bodies)
+        if prefix == len(body):
+            return None
+        if prefix < settings.CHAT_CONTEXT_MIN_OVERLAP_CHARS:
+            prefix = 0
+        suffix = self._covered_length(body[prefix:], bodies, from_end=True)
+        if suffix < settings.CHAT_CONTEXT_MIN_OVERLAP_CHARS:
+            suffix = 0
+
+        body = body[prefix : len(body) - suffix].strip()
+        if not body:
+            return None
+        if prefix:
+            body = "… " + body
+        if suffix:
+            body = body + " …"
+        if heading and not heading_shown:
+            body = f"{heading}\n{body}"
+        return f"{header}{separator}{body}" if header else body
+
+    def _fit(self, text: str, remaining: int, result: PackedContext, tokens=None):
+        """
+        Return (text, tokens) for as much of text as fits, or (None, 0).
+        """
+        if tokens is None:
+            tokens = self.count_tokens(text)
+        if tokens <= remaining:
+            return text, tokens
+        if remaining < settings.CHAT_CONTEXT_MIN_ITEM_TOKENS:
+            result.dropped += 1
+            return None, 0
+        result.trimmed += 1
+        text = self.truncate(text, remaining)
+        return text, self.count_tokens(text)
+
+    def pack(
+        self,
+        system_prompt: str,
+        question: str,
+        chat_history: Optional[List[dict]] = None,
+        chunks: Optional[List[str]] = None,
+        documents: Optional[List[str]] = None,
+    ) -> PackedContext:
+        """
+        question is the final user prompt without its context; its tokens and
+        the system prompt's are reserved before anything else is packed.
+        """
+        result = PackedContext()
+        used = (
+            2 * TOKENS_PER_MESSAGE
+            + TOKENS_PER_REPLY
+            + self.count_tokens(system_prompt)
+            + self.count_tokens(question)
+        )
+
+        history_budget = int(
+            max(self.budget - used, 0) * settings.CHAT_HISTORY_MAX_SHARE
+        )
+        history_used = 0
+        for index, item in enumerate(reversed(chat_history or [])):
+            if item.get("role") not in ("user", "assistant"):
+                continue
+            # Session turns carry their token count already
+            content, tokens = self._fit(
+                item.get("content") or "",
+                history_budget - history_used - TOKENS_PER_MESSAGE,
+                result,
+                item.get("tokens"),
+            )
+            if content is None:
+                # Older turns make no sense without the ones after them
+                result.dropped += len(chat_history) - index - 1
+                break
+            result.history.insert(
+                0, {"role": item["role"], "content": content, "tokens": tokens}
+            )
+            history_used += tokens + TOKENS_PER_MESSAGE
+        used += history_used
+
+        for target, items in ((result.chunks, chunks), (result.documents, documents)):
+            for item in items or []:
+                if target is result.chunks:
+                    item = self.deduplicate(item, result.chunks)
+                    if item is None:
+                        result.dropped += 1
+                        continue
+                # Items are joined with a blank line
+                content, tokens = self._fit(item, self.budget - used - 1, result)
+                if content is None:
+                    continue
+                target.append(content)
+                used += tokens + 1
+
+        result.tokens = used
+        if result.dropped or result.trimmed:
+            logger.info(
+                f"Packed prompt into {used}/{self.budget} tokens "
+                f"({result.trimmed} trimmed, {result.dropped} dropped)"
+            )
+        return result
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import logging
+from array import array
+from typing import Callable, List, Optional
+import redis
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheService:
+    """
+    Content-addressed embedding cache backed by Redis.
+
+    Keys are (model, dimensions, sha256 of the text), so the same chunk is only
+    embedded once no matter which note, PDF or query it comes from. Entries use
+    a sliding TTL: every hit refreshes the expiry, so rarely used vectors age
+    out first.
+    """
+
+    KEY_PREFIX = "embedding"
+
+    def __init__(self, model: str = None, dimensions: int = None):
+        self.model = model or settings.EMBEDDING_MODEL
+        self.dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+        self.ttl = settings.EMBEDDING_CACHE_TTL_SECONDS
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{self.model}:{self.dimensions}:{digest}"
+
+    @staticmethod
+    def _encode(embedding: List[float]) -> str:
+        return base64.b64encode(array("f", embedding).tobytes()).decode("ascii")
+
+    @staticmethod
+    def _decode(value: str) -> List[float]:
+        vector = array("f")
+        vector.frombytes(base64.b64decode(value))
+        return vector.tolist()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings, returning None for every miss.
+        """
+        if not texts:
+            return []
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for text in texts:
+                pipe.getex(self._key(text), ex=self.ttl)
+            values = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            values = [None] * len(texts)
+
+        embeddings = [self._decode(value) if value else None for value in values]
+        hits = sum(1 for embedding in embeddings if embedding is not None)
+        incr_metric("embedding_cache_hits", hits)
+        incr_metric("embedding_cache_misses", len(texts) - hits)
+        return embeddings
+
+    def set_many(self, texts: List[str], embeddings: List[List[float]]):
+        if not texts:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for text, embedding in zip(texts, embeddings):
+                pipe.set(self._key(text), self._encode(embedding), ex=self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def get_or_embed(
+        self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """
+        Return embeddings for texts in order, calling embed_fn only for the
+        distinct texts that are not cached yet.
+        """
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return embed_fn(texts)
+
+        embeddings = self.get_many(texts)
+        missing = list(
+            dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            )
+        )
+        if missing:
+            fresh = dict(zip(missing, embed_fn(missing)))
+            self.set_many(missing, [fresh[text] for text in missing])
+            embeddings = [
+                embedding if embedding is not None else fresh[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import List
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from app.config import settings
+from app.exception.service_unavailable import ServiceUnavailableError
+from app.services.openai_client import OpenAiClient, OpenAiClientRegistry
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at limit_per_minute / 60 per second.
+
+    acquire() reserves its tokens up front (the balance may go negative) and
+    then sleeps until the reservation is covered, so concurrent callers are
+    served in arrival order. State is guarded by a thread lock rather than
+    an asyncio lock, so one bucket can be shared by every event loop and
+    thread in the process.
+    """
+
+    def __init__(self, limit_per_minute: int):
+        self.capacity = float(limit_per_minute)
+        self.rate = limit_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Reserve tokens and return how many seconds to wait before using them.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def drain(self):
+        """
+        Empty the bucket after the provider rejected a request, so every
+        caller slows down instead of only the one that got the 429.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+    async def acquire(self, amount: float):
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class EmbeddingPipelineService:
+    """
+    Async embedding pipeline that keeps throughput close to the account quota
+    without going over it.
+
+    Texts are split into token-bounded batches which are embedded with at most
+    EMBEDDING_MAX_PARALLEL_BATCHES requests in flight. Every request first
+    takes one token from the requests-per-minute bucket and its token count
+    from the tokens-per-minute bucket. Rate-limit responses, timeouts,
+    connection errors and 5xx responses are retried with exponential backoff
+    (or the provider's Retry-After).
+
+    The buckets are shared by the whole process, so the configured limits are
+    the share of the account quota given to each API or Celery worker process.
+    """
+
+    _request_bucket = None
+    _token_bucket = None
+    _buckets_lock = threading.Lock()
+
+    def __init__(self):
+        self.openAiClient = OpenAiClient()
+        with EmbeddingPipelineService._buckets_lock:
+            if EmbeddingPipelineService._request_bucket is None:
+                EmbeddingPipelineService._request_bucket = TokenBucket(
+                    settings.EMBEDDING_RPM_LIMIT
+                )
+                EmbeddingPipelineService._token_bucket = TokenBucket(
+                    settings.EMBEDDING_TPM_LIMIT
+                )
+
+    def _retry_after(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        try:
+            if retry_after is not None:
+                return float(retry_after)
+        except ValueError:
+            pass
+        delay = settings.EMBEDDING_BACKOFF_BASE_SECONDS * (2**attempt)
+        return min(delay, settings.EMBEDDING_BACKOFF_MAX_SECONDS) * (
+            0.5 + random.random() / 2
+        )
+
+    async def _embed_batch(self, batch: List[str], token_count: int, semaphore):
+        embedder = OpenAiClientRegistry.get_async_embeddings_model(max_retries=0)
+        async with semaphore:
+            for attempt in range(settings.EMBEDDING_MAX_RETRIES + 1):
+                await self._request_bucket.acquire(1)
+                await self._token_bucket.acquire(token_count)
+                try:
+                    return await embedder.aembed_documents(
+                        batch, chunk_size=len(batch)
+                    )
+                except RateLimitError as e:
+                    if attempt == settings.EMBEDDING_MAX_RETRIES:
+                        raise
+                    incr_metric("embedding_rate_limited")
+                    self._request_bucket.drain()
+                    self._token_bucket.drain()
+                    delay = self._retry_after(e, attempt)
+                    logger.warning(
+                        f"Embedding rate limited, retrying in {delay:.1f}s "
+                        f"(attempt {attempt + 1})"
+                    )
+                    await asyncio.sleep(delay)
+                except (APITimeoutError, APIConnectionError, InternalServerError) as e:
+                    # The client is built without SDK retries, so transient
+                    # failures are retried here instead of failing the gather
+                    if attempt == settings.EMBEDDING_MAX_RETRIES:
+                        raise
+                    incr_metric("embedding_transient_errors")
+                    delay = self._retry_after(e, attempt)
+                    logger.warning(
+                        f"Embedding request failed ({type(e).__name__}), retrying "
+                        f"in {delay:.1f}s (attempt {attempt + 1})"
+                    )
+                    await asyncio.sleep(delay)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, returning one vector per text in the same order.
+        """
+        if not texts:
+            return []
+        batches = self.openAiClient.split_batches_with_token_counts(
+            texts, max_inputs=settings.EMBEDDING_PIPELINE_BATCH_INPUTS
+        )
+        semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_PARALLEL_BATCHES)
+        try:
+            results = await asyncio.gather(
+                *(
+                    self._embed_batch(batch, token_count, semaphore)
+                    for batch, token_count in batches
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error generating embeddings in pipeline: {e}")
+            raise ServiceUnavailableError(
+                "Sorry, the AI service is currently unavailable. Please try again later."
+            )
+        return [embedding for batch in results for embedding in batch]
+
+    async def _run(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return await self.aembed_documents(texts)
+        finally:
+            await OpenAiClientRegistry.aclose_loop_clients()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Blocking entry point for sync callers such as the indexers and Celery
+        tasks. Must not be called from a thread with a running event loop.
+        """
+        if not texts:
+            return []
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._run(texts))
+        raise RuntimeError(
+            "embed_documents cannot run inside an event loop, use aembed_documents"
+        )
@@ -0,0 +1,32 @@
+import logging
+import redis
+from app.db.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_KEY_PREFIX = "index_version"
+
+
+class IndexVersionService:
+    """
+    Per-user counter bumped after every write that changes what a search for
+    that user can return (indexing, note deletion, title changes). Derived
+    structures such as in-process indexes and cached results are stamped with
+    the version they were built from and rebuilt when it moves on.
+    """
+
+    @staticmethod
+    def get(user_id: int) -> int:
+        try:
+            return int(redis_client.get(f"{INDEX_VERSION_KEY_PREFIX}:{user_id}") or 0)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read index version for user {user_id}: {e}")
+            return -1
+
+    @staticmethod
+    def bump(user_id: int) -> int:
+        try:
+            return redis_client.incr(f"{INDEX_VERSION_KEY_PREFIX}:{user_id}")
+        except redis.RedisError as e:
+            logger.warning(f"Failed to bump index version for user {user_id}: {e}")
+            return -1
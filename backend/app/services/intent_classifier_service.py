@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+from typing import Callable, List, Optional
+from uuid import UUID
+import numpy as np
+from app.config import settings
+from app.services.embedding_cache_service import EmbeddingCacheService
+from app.services.openai_client import OpenAiClient
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I
+)
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|great|bye|goodbye|good (morning|afternoon|evening|night))\b[\s!.,?]*(there|so much|a lot)?[\s!.,?]*$",
+    re.I,
+)
+SUMMARIZE_PATTERN = re.compile(r"\b(summari[sz]e|summary|tl;?dr|recap)\b", re.I)
+ALL_NOTES_PATTERN = re.compile(r"\b(all|every|each|entire)\b.*\bnotes\b", re.I)
+# Only unambiguous references to the open note: "the note about X" or "my
+# note on X" name some other note
+THIS_NOTE_PATTERN = re.compile(r"\b(this|current) note\b", re.I)
+SEARCH_PATTERN = re.compile(
+    r"\b(in|from|across|search) my notes?\b|\bmy notes? (about|on|for)\b|"
+    r"\bdid i (write|note|save|mention)\b|\bwhere did i\b|\bfind (the )?notes?\b",
+    re.I,
+)
+# Follow-ups such as "and what about that?" depend on the history; leave them
+# to the LLM router
+ANAPHORA_PATTERN = re.compile(r"\b(it|that|this|those|these|them|above|previous)\b", re.I)
+
+# Labelled example utterances; each intent is represented by the centroid of
+# their embeddings
+INTENT_EXAMPLES = {
+    "general": [
+        "What is the capital of France?",
+        "Explain how photosynthesis works",
+        "Write a short poem about autumn",
+        "How do I reverse a list in Python?",
+        "What does HTTP 404 mean?",
+        "Give me tips for a job interview",
+        "Translate good morning into Spanish",
+        "What's the difference between TCP and UDP?",
+    ],
+    "search": [
+        "What did I write about the marketing plan?",
+        "Find my notes on the database migration",
+        "When is the deadline I noted for the project?",
+        "What were the action items from last week's meeting?",
+        "Do I have anything saved about React hooks?",
+        "Which recipe did I save for dinner?",
+        "What did the client ask for in my meeting notes?",
+        "Look up the API keys section in my notes",
+    ],
+    "summarize_note": [
+        "Summarize this note",
+        "Give me a summary of the current note",
+        "TL;DR of this note please",
+        "Can you recap what this note says?",
+        "Sum up the note I'm looking at",
+        "What are the key points of this note?",
+    ],
+    "summarize_all_notes": [
+        "Summarize all my notes",
+        "Give me an overview of everything I've written",
+        "Recap all of my notes",
+        "What are all my notes about?",
+        "Summarize every note I have",
+        "Give me a summary across all my workspaces",
+    ],
+}
+
+
+class IntentClassifierService:
+    """
+    Local fast path for the chat router.
+
+    Clear cases are decided without an LLM call: regular expressions first,
+    then nearest-centroid matching of the message embedding against the
+    labelled examples above. Returns None when neither is confident, in which
+    case the caller falls back to the LLM router. The message embedding comes
+    from the query cache, so a "search" decision reuses it for retrieval.
+    """
+
+    _centroids = None
+    _labels = None
+    _lock = threading.Lock()
+
+    def __init__(self, embed_query: Callable[[str], List[float]]):
+        self.embed_query = embed_query
+
+    @classmethod
+    def _get_centroids(cls):
+        if cls._centroids is not None:
+            return cls._labels, cls._centroids
+        with cls._lock:
+            if cls._centroids is None:
+                labels = list(INTENT_EXAMPLES)
+                texts = [text for label in labels for text in INTENT_EXAMPLES[label]]
+                vectors = np.asarray(
+                    EmbeddingCacheService().get_or_embed(
+                        texts, OpenAiClient().embed_documents
+                    ),
+                    dtype=np.float32,
+                )
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                centroids = []
+                start = 0
+                for label in labels:
+                    end = start + len(INTENT_EXAMPLES[label])
+                    centroid = vectors[start:end].mean(axis=0)
+                    centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+                    start = end
+                cls._labels = labels
+                cls._centroids = np.stack(centroids)
+        return cls._labels, cls._centroids
+
+    def _target_note(self, user_message: str, note_ids: Optional[List[UUID]]):
+        match = UUID_PATTERN.search(user_message)
+        if match:
+            return match.group(0)
+        if note_ids and len(note_ids) == 1:
+            return str(note_ids[0])
+        return None
+
+    def classify_by_rules(
+        self, user_message: str, has_history: bool, note_ids: Optional[List[UUID]]
+    ) -> Optional[dict]:
+        if SMALL_TALK_PATTERN.match(user_message):
+            return {"type": "general"}
+        if SUMMARIZE_PATTERN.search(user_message):
+            if ALL_NOTES_PATTERN.search(user_message):
+                return {"type": "summarize_all_notes"}
+            note_id = self._target_note(user_message, note_ids)
+            if note_id and (
+                UUID_PATTERN.search(user_message) or THIS_NOTE_PATTERN.search(user_message)
+            ):
+                return {"type": "summarize_note", "query": note_id}
+            return None
+        if SEARCH_PATTERN.search(user_message) and not (
+            has_history and ANAPHORA_PATTERN.search(user_message)
+        ):
+            return {"type": "search", "query": user_message}
+        return None
+
+    def classify_by_embedding(
+        self, user_message: str, note_ids: Optional[List[UUID]]
+    ) -> Optional[dict]:
+        labels, centroids = self._get_centroids()
+        query = np.asarray(self.embed_query(user_message), dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        scores = centroids @ query
+        order = np.argsort(scores)[::-1]
+        best, second = scores[order[0]], scores[order[1]]
+        if (
+            best < settings.INTENT_CLASSIFIER_MIN_SIMILARITY
+            or best - second < settings.INTENT_CLASSIFIER_MIN_MARGIN
+        ):
+            return None
+
+        label = labels[order[0]]
+        if label == "search":
+            return {"type": "search", "query": user_message}
+        if label == "summarize_note":
+            note_id = self._target_note(user_message, note_ids)
+            return {"type": "summarize_note", "query": note_id} if note_id else None
+        return {"type": label}
+
+    def classify(
+        self,
+        user_message: str,
+        chat_history: Optional[List[dict]] = None,
+        note_ids: Optional[List[UUID]] = None,
+    ) -> Optional[dict]:
+        """
+        Return the routing decision ({"type": ..., "query": ...}, the same
+        shape as the LLM router's) or None when the LLM should decide.
+        """
+        if not settings.INTENT_CLASSIFIER_ENABLED:
+            return None
+        has_history = bool(chat_history)
+
+        decision = self.classify_by_rules(user_message, has_history, note_ids)
+        if decision is not None:
+            incr_metric("intent_local_rule")
+            return decision
+
+        if has_history and ANAPHORA_PATTERN.search(user_message):
+            incr_metric("intent_llm")
+            return None
+        try:
+            decision = self.classify_by_embedding(user_message, note_ids)
+        except Exception as e:
+            logger.warning(f"Local intent classification failed: {e}")
+            decision = None
+        incr_metric("intent_local_embedding" if decision else "intent_llm")
+        return decision
@@ -0,0 +1,198 @@
+import glob
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.document_embedding import DocumentEmbedding
+from app.services.index_version_service import IndexVersionService
+
+logger = logging.getLogger(__name__)
+
+# Rows of a float16 matrix upcast at a time when scoring
+SCORE_BLOCK_ROWS = 1024
+
+
+class LocalVectorIndexService:
+    """
+    Optional in-process vector index for users with few chunks.
+
+    Each user's embeddings are normalised once into a float16/float32 matrix
+    saved under LOCAL_VECTOR_INDEX_DIR and memory-mapped back, so top-k is a
+    single matrix-vector product plus argpartition instead of a database
+    round trip. Files are named after the user's index version; a write bumps
+    the version, which makes every process rebuild on its next search.
+    Memory is bounded by an LRU over users.
+    """
+
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+
+    def _path(self, user_id: int, version: int) -> str:
+        """
+        Path prefix of a user's index files: <prefix>.npy holds the matrix
+        and <prefix>.meta.npz the row ids.
+        """
+        return os.path.join(settings.LOCAL_VECTOR_INDEX_DIR, f"{user_id}-{version}")
+
+    def _remove_files(self, user_id: int, keep: Optional[str] = None):
+        pattern = os.path.join(settings.LOCAL_VECTOR_INDEX_DIR, f"{user_id}-*")
+        for path in glob.glob(pattern):
+            if keep is None or not path.startswith(f"{keep}."):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _save(self, path: str, **arrays):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            if "matrix" in arrays:
+                np.save(f, arrays["matrix"])
+            else:
+                np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def _build(self, user_id: int, db: Session, path: str) -> bool:
+        rows = db.execute(
+            select(
+                DocumentEmbedding.id,
+                DocumentEmbedding.note_id,
+                DocumentEmbedding.workspace_id,
+                DocumentEmbedding.embedding,
+            )
+            .where(
+                DocumentEmbedding.user_id == user_id,
+                # Rows awaiting the embedding backfill have none yet
+                DocumentEmbedding.embedding.isnot(None),
+            )
+            .limit(settings.LOCAL_VECTOR_INDEX_MAX_ROWS + 1)
+        ).all()
+        if len(rows) > settings.LOCAL_VECTOR_INDEX_MAX_ROWS:
+            return False
+
+        dtype = np.dtype(settings.LOCAL_VECTOR_INDEX_DTYPE)
+        if rows:
+            # halfvec columns load as HalfVector objects
+            matrix = np.asarray(
+                [
+                    row.embedding.to_list()
+                    if hasattr(row.embedding, "to_list")
+                    else row.embedding
+                    for row in rows
+                ],
+                dtype=np.float32,
+            )
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = (matrix / np.maximum(norms, 1e-12)).astype(dtype)
+        else:
+            matrix = np.zeros((0, settings.EMBEDDING_DIMENSIONS), dtype=dtype)
+
+        os.makedirs(settings.LOCAL_VECTOR_INDEX_DIR, exist_ok=True)
+        # Metadata first: the matrix file marks a complete index
+        self._save(
+            f"{path}.meta.npz",
+            ids=np.asarray([str(row.id) for row in rows]),
+            note_ids=np.asarray([str(row.note_id) for row in rows]),
+            workspace_ids=np.asarray([str(row.workspace_id) for row in rows]),
+        )
+        self._save(f"{path}.npy", matrix=matrix)
+        self._remove_files(user_id, keep=path)
+        return True
+
+    def _load(self, path: str) -> dict:
+        with np.load(f"{path}.meta.npz") as data:
+            entry = {key: data[key] for key in ("ids", "note_ids", "workspace_ids")}
+        entry["matrix"] = np.load(f"{path}.npy", mmap_mode="r")
+        return entry
+
+    def _get_entry(self, user_id: int, db: Session) -> Optional[dict]:
+        version = IndexVersionService.get(user_id)
+        if version < 0:
+            # Redis is unavailable, so freshness cannot be checked
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(user_id)
+                return entry
+
+        path = self._path(user_id, version)
+        if not os.path.exists(f"{path}.npy") and not self._build(user_id, db, path):
+            return None
+        entry = self._load(path)
+        entry["version"] = version
+
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.LOCAL_VECTOR_INDEX_MAX_USERS:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _scores(self, matrix, query):
+        """
+        Cosine similarities of the normalised rows with the query. NumPy has
+        no BLAS path for float16, so a float16 matrix stays float16 on disk
+        and in the mmap but is upcast a block of rows at a time and scored
+        in float32.
+        """
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = matrix[start : start + SCORE_BLOCK_ROWS]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def search(
+        self,
+        user_id: int,
+        query_embedding: List[float],
+        top_k: int,
+        db: Session,
+        workspace_ids=None,
+        note_ids=None,
+    ):
+        """
+        Return [(embedding_id, cosine_distance)] best first, or None when the
+        user is not served by the local index (too many rows, Redis down).
+        """
+        entry = self._get_entry(user_id, db)
+        if entry is None:
+            return None
+        if not len(entry["ids"]) or top_k <= 0:
+            return []
+
+        query = np.array(query_embedding, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        scores = self._scores(entry["matrix"], query)
+
+        if workspace_ids is not None:
+            mask = np.isin(entry["workspace_ids"], [str(w) for w in workspace_ids])
+            scores[~mask] = -np.inf
+        if note_ids:
+            mask = np.isin(entry["note_ids"], [str(n) for n in note_ids])
+            scores[~mask] = -np.inf
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (str(entry["ids"][i]), float(1.0 - scores[i]))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+    def invalidate(self, user_id: int):
+        """
+        Drop a user's index from this process and from disk. Other processes
+        notice through the bumped index version.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self._remove_files(user_id)
@@ -0,0 +1,184 @@
+import logging
+import time
+import uuid
+from typing import Optional
+from uuid import UUID
+from app.config import settings
+from app.db.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DIRTY_NOTES_KEY = "reindex:dirty"
+SCHEDULED_KEY_PREFIX = "reindex:scheduled"
+LOCK_KEY_PREFIX = "reindex:lock"
+FAILURES_KEY_PREFIX = "reindex:failures"
+
+# Claim a dirty note for the task chain ARGV[4] once its quiet period has
+# passed. Returns "-1" when the note is no longer dirty or another chain owns
+# it, the remaining wait in seconds while edits are still arriving, or "0"
+# after removing the note from the dirty set. The scheduled key is only ever
+# deleted by the chain it names. Values are returned as strings because Lua
+# numbers are truncated to integers.
+_CLAIM_SCRIPT = redis_client.register_script(
+    """
+    local owner = redis.call('GET', KEYS[2])
+    if owner and owner ~= ARGV[4] then
+        return '-1'
+    end
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+    if not score then
+        if owner then
+            redis.call('DEL', KEYS[2])
+        end
+        return '-1'
+    end
+    local remaining = tonumber(score) + tonumber(ARGV[2]) - tonumber(ARGV[3])
+    if remaining > 0 then
+        redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[5])
+        return tostring(remaining)
+    end
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    if owner then
+        redis.call('DEL', KEYS[2])
+    end
+    return '0'
+    """
+)
+
+
+class NoteReindexService:
+    """
+    Redis-backed debounce for note reindexing.
+
+    Every content update records "note X dirty at time T" in a sorted set and
+    makes sure one Celery task chain is scheduled for the note. The chain
+    re-arms itself until no edit has arrived for
+    NOTE_REINDEX_DEBOUNCE_SECONDS, then reindexes the note, whichever API
+    worker received the edits. The scheduled key holds the id of the chain
+    that owns the note; every edit refreshes its TTL, and a task whose chain
+    no longer owns the note stops. Dirty notes survive restarts and are
+    rescheduled when a Celery worker starts.
+    """
+
+    @staticmethod
+    def _schedule(note_id: str, countdown: float, chain: str):
+        from app.tasks import reindex_note
+
+        reindex_note.apply_async(args=[note_id, chain], countdown=countdown)
+
+    @staticmethod
+    def mark_dirty(note_id: UUID):
+        note_id = str(note_id)
+        scheduled_key = f"{SCHEDULED_KEY_PREFIX}:{note_id}"
+        chain = uuid.uuid4().hex
+        pipe = redis_client.pipeline()
+        pipe.zadd(DIRTY_NOTES_KEY, {note_id: time.time()})
+        pipe.set(
+            scheduled_key, chain, nx=True, ex=settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS
+        )
+        # Keep the running chain's claim alive for as long as edits arrive
+        pipe.expire(scheduled_key, settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS)
+        _, started, _ = pipe.execute()
+        # Only the first edit of a burst schedules a task; the task itself
+        # re-arms while edits keep arriving
+        if started:
+            NoteReindexService._schedule(
+                note_id, settings.NOTE_REINDEX_DEBOUNCE_SECONDS, chain
+            )
+
+    @staticmethod
+    def mark_failed(note_id: str, chain: str):
+        """
+        Put a note back in the dirty set after a failed reindex, keeping the
+        timestamp of any newer edit, and retry it with exponential backoff.
+        After NOTE_REINDEX_MAX_RETRIES failures in a row it waits for the
+        next edit or worker restart instead. If an edit has started a new
+        chain in the meantime, that chain covers the retry.
+        """
+        failures_key = f"{FAILURES_KEY_PREFIX}:{note_id}"
+        pipe = redis_client.pipeline()
+        pipe.zadd(DIRTY_NOTES_KEY, {note_id: time.time()}, nx=True)
+        pipe.incr(failures_key)
+        pipe.expire(failures_key, settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS)
+        _, failures, _ = pipe.execute()
+        if failures > settings.NOTE_REINDEX_MAX_RETRIES:
+            logger.warning(
+                f"Giving up on reindexing note {note_id} after {failures - 1} retries"
+            )
+            return
+
+        countdown = min(
+            settings.NOTE_REINDEX_RETRY_BASE_SECONDS * 2 ** (failures - 1),
+            settings.NOTE_REINDEX_RETRY_MAX_SECONDS,
+        )
+        # Hold the scheduled key so edits in the meantime do not add a chain
+        chain = chain or uuid.uuid4().hex
+        if redis_client.set(
+            f"{SCHEDULED_KEY_PREFIX}:{note_id}",
+            chain,
+            nx=True,
+            ex=settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS,
+        ):
+            NoteReindexService._schedule(note_id, countdown, chain)
+
+    @staticmethod
+    def mark_indexed(note_id: str):
+        redis_client.delete(f"{FAILURES_KEY_PREFIX}:{note_id}")
+
+    @staticmethod
+    def claim(note_id: str, chain: Optional[str]) -> float | None:
+        """
+        Returns 0 when the caller should reindex now, the number of seconds
+        left in the quiet period, or None when there is nothing to do,
+        including when another chain owns the note.
+        """
+        result = float(
+            _CLAIM_SCRIPT(
+                keys=[DIRTY_NOTES_KEY, f"{SCHEDULED_KEY_PREFIX}:{note_id}"],
+                args=[
+                    note_id,
+                    settings.NOTE_REINDEX_DEBOUNCE_SECONDS,
+                    time.time(),
+                    chain or "",
+                    settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS,
+                ],
+            )
+        )
+        if result < 0:
+            return None
+        return result
+
+    @staticmethod
+    def lock(note_id: str):
+        """
+        Lock held while a note is being reindexed, so two workers never write
+        rows for the same note at once.
+        """
+        return redis_client.lock(
+            f"{LOCK_KEY_PREFIX}:{note_id}",
+            timeout=settings.NOTE_REINDEX_LOCK_TIMEOUT_SECONDS,
+        )
+
+    @staticmethod
+    def reschedule(note_id: str, countdown: float, chain: str):
+        NoteReindexService._schedule(note_id, countdown, chain)
+
+    @staticmethod
+    def reschedule_all_dirty():
+        """
+        Schedule a task for every dirty note, e.g. after a restart lost the
+        tasks that were pending.
+        """
+        note_ids = redis_client.zrange(DIRTY_NOTES_KEY, 0, -1)
+        for note_id in note_ids:
+            # Take over from any chain lost with the restart; tasks of an
+            # older chain that are still queued stop at their claim
+            chain = uuid.uuid4().hex
+            redis_client.set(
+                f"{SCHEDULED_KEY_PREFIX}:{note_id}",
+                chain,
+                ex=settings.NOTE_REINDEX_SCHEDULED_TTL_SECONDS,
+            )
+            NoteReindexService._schedule(note_id, 0, chain)
+        if note_ids:
+            logger.info(f"Rescheduled reindexing for {len(note_ids)} dirty notes")
@@ -1,3 +1,4 @@
+import logging
 from sqlalchemy.orm import Session
 from app.models.note import Note
 from app.models.workspace import Workspace
@@ -6,8 +7,10 @@ from fastapi import HTTPException, status
 from uuid import UUID
 from fastapi.encoders import jsonable_encoder
 from app.schemas.note_schemas import NoteContent, NotePreview, NoteSchema
-from app.services.vector_service import VectorService
-from app.db.database import SessionLocal
+from app.services.note_reindex_service import NoteReindexService
+from app.services.index_version_service import IndexVersionService
+
+logger = logging.getLogger(__name__)
 
 
 class NoteService:
@@ -71,11 +74,14 @@ class NoteService:
             )
 
         note.content = content
+        note.summary = None
         db.commit()
         db.refresh(note)
-        VectorService().debounce_index_note(
-            note, db_factory=SessionLocal, wait_seconds=2
-        )
+        try:
+            NoteReindexService.mark_dirty(note.id)
+        except Exception as e:
+            # The content is saved; the note is reindexed on its next edit
+            logger.warning(f"Failed to schedule reindex for note {note.id}: {e}")
         return {"content": "Note updated successfully"}
 
     @staticmethod
@@ -93,6 +99,8 @@ class NoteService:
         note.title = title
         db.commit()
         db.refresh(note)
+        # Search results carry the note title
+        IndexVersionService.bump(note.user_id)
         return {
             "message": "Note's title updated successfully",
         }
@@ -109,8 +117,10 @@ class NoteService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
             )
 
+        user_id = note.user_id
         db.delete(note)
         db.commit()
+        IndexVersionService.bump(user_id)
         return {
             "message": "Note deleted successfully",
         }
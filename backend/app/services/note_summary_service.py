@@ -0,0 +1,253 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import redis
+from langchain.schema import HumanMessage, SystemMessage
+from sqlalchemy import Text, cast, func, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.redis_client import redis_client
+from app.models.note import Note
+from app.models.workspace import Workspace
+from app.services.openai_client import OpenAiClient
+from app.utils.metrics import incr_metric
+from app.utils.note_content import (
+    clean_text,
+    extract_plain_text,
+    iter_serialized_text_fragments,
+)
+from app.utils.tokens import count_tokens, get_encoding
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROLLUP_KEY_PREFIX = "summary:workspace"
+QUEUED_KEY_PREFIX = "summary:queued"
+
+NOTE_SUMMARY_PROMPT = (
+    "Summarize the following note from a note-taking app in at most 80 words. "
+    "Keep the key facts, names, dates and action items. Reply with the summary only."
+)
+WORKSPACE_ROLLUP_PROMPT = (
+    "Below are short summaries of the notes in one workspace of a note-taking app. "
+    "Combine them into a single overview of at most 200 words that covers the main "
+    "topics, facts and open action items. Reply with the overview only."
+)
+
+
+class NoteSummaryService:
+    """
+    Hierarchical (map-reduce) summaries of a user's notes.
+
+    Map: every note gets a short summary, stored on the note and cleared when
+    its content changes, so it is generated once per edit rather than per
+    request. Reduce: note summaries are rolled up per workspace; small
+    workspaces are passed through as-is and larger ones are condensed by the
+    LLM, cached in Redis under a hash of their inputs. The chat answer is then
+    written from the rollups in one call.
+    """
+
+    def __init__(self, openAiClient: Optional[OpenAiClient] = None):
+        self.openAiClient = openAiClient or OpenAiClient()
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        encoding = get_encoding()
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+    def summarize_text(self, title: str, text: str) -> str:
+        text = self._truncate(text, settings.NOTE_SUMMARY_INPUT_MAX_TOKENS)
+        return self.openAiClient.chat(
+            [
+                SystemMessage(content=NOTE_SUMMARY_PROMPT),
+                HumanMessage(content=f"Title: {title}\n\n{text}"),
+            ]
+        )
+
+    def summarize_note(self, note_id, db: Session) -> Optional[str]:
+        """
+        Summarise one note and store the result, unless its content changed
+        while the summary was being written.
+        """
+        row = db.execute(
+            select(Note.title, Note.content, Note.updated_at).where(Note.id == note_id)
+        ).first()
+        if row is None:
+            return None
+
+        text = extract_plain_text(row.content)
+        summary = self.summarize_text(row.title, text) if text else ""
+        db.execute(
+            update(Note)
+            .where(Note.id == note_id, Note.updated_at.isnot_distinct_from(row.updated_at))
+            # Keep updated_at: it tracks user edits, not cache refreshes
+            .values(
+                summary=summary,
+                summary_updated_at=func.now(),
+                updated_at=Note.updated_at,
+            )
+        )
+        db.commit()
+        return summary
+
+    def excerpts(self, note_ids: List, db: Session) -> Dict[object, str]:
+        """
+        Beginnings of the notes' text, used while their summaries are being
+        built. Read in one query, and only the first
+        NOTE_SUMMARY_EXCERPT_SOURCE_CHARS of each serialised document.
+        """
+        rows = db.execute(
+            select(
+                Note.id,
+                func.left(
+                    cast(Note.content, Text), settings.NOTE_SUMMARY_EXCERPT_SOURCE_CHARS
+                ),
+            ).where(Note.id.in_(note_ids))
+        )
+        return {
+            note_id: self._truncate(
+                clean_text(iter_serialized_text_fragments(prefix)),
+                settings.NOTE_SUMMARY_EXCERPT_TOKENS,
+            )
+            for note_id, prefix in rows
+        }
+
+    def queue_summaries(self, note_ids: List):
+        """
+        Hand notes to the summarize_notes task, skipping those already queued
+        by an earlier request.
+        """
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for note_id in note_ids:
+                pipe.set(
+                    f"{QUEUED_KEY_PREFIX}:{note_id}",
+                    1,
+                    nx=True,
+                    ex=settings.NOTE_SUMMARY_QUEUED_TTL_SECONDS,
+                )
+            queued = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Note summary queue check failed: {e}")
+            queued = [True] * len(note_ids)
+
+        note_ids = [str(note_id) for note_id, new in zip(note_ids, queued) if new]
+        if note_ids:
+            from app.tasks import summarize_notes
+
+            summarize_notes.delay(note_ids)
+
+    @staticmethod
+    def clear_queued(note_ids: List):
+        if not note_ids:
+            return
+        try:
+            redis_client.delete(
+                *[f"{QUEUED_KEY_PREFIX}:{note_id}" for note_id in note_ids]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to clear queued note summaries: {e}")
+
+    def get_note_summaries(self, user_id: int, db: Session) -> Dict[object, List[tuple]]:
+        """
+        Return {workspace_id: [(title, summary), ...]} for all of the user's
+        notes. Only the columns needed are read, in batches. Missing summaries
+        are built inline up to NOTE_SUMMARY_MAX_INLINE; the rest are queued
+        for the worker and represented by an excerpt for now.
+        """
+        summaries = {}
+        missing = []
+        rows = db.execute(
+            select(Note.id, Note.title, Note.workspace_id, Note.summary)
+            .where(Note.user_id == user_id)
+            .order_by(Note.workspace_id, Note.created_at)
+            .execution_options(yield_per=settings.NOTE_SUMMARY_FETCH_BATCH)
+        )
+        for row in rows:
+            summaries.setdefault(row.workspace_id, []).append([row.title, row.summary])
+            if row.summary is None:
+                missing.append((row.id, summaries[row.workspace_id][-1]))
+
+        total = sum(len(notes) for notes in summaries.values())
+        incr_metric("note_summary_cache_hits", total - len(missing))
+        incr_metric("note_summary_cache_misses", len(missing))
+
+        inline = missing[: settings.NOTE_SUMMARY_MAX_INLINE]
+        deferred = missing[settings.NOTE_SUMMARY_MAX_INLINE :]
+        if inline:
+            # Each worker thread needs its own session
+            def summarize(note_id):
+                session = SessionLocal()
+                try:
+                    return self.summarize_note(note_id, session)
+                finally:
+                    session.close()
+
+            with ThreadPoolExecutor(settings.NOTE_SUMMARY_PARALLELISM) as executor:
+                results = executor.map(summarize, [note_id for note_id, _ in inline])
+                for (_, entry), summary in zip(inline, results):
+                    entry[1] = summary or ""
+        if deferred:
+            note_ids = [note_id for note_id, _ in deferred]
+            self.queue_summaries(note_ids)
+            excerpts = self.excerpts(note_ids, db)
+            for note_id, entry in deferred:
+                entry[1] = excerpts.get(note_id, "")
+
+        return {
+            workspace_id: [(title, summary) for title, summary in notes if summary]
+            for workspace_id, notes in summaries.items()
+        }
+
+    def rollup_workspace(self, workspace_id, notes: List[tuple]) -> str:
+        text = "\n".join(f"- {title}: {summary}" for title, summary in notes)
+        if count_tokens(text) <= settings.NOTE_SUMMARY_ROLLUP_MAX_TOKENS:
+            return text
+
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        key = f"{WORKSPACE_ROLLUP_KEY_PREFIX}:{workspace_id}:{digest}"
+        try:
+            cached = redis_client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Workspace summary cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            incr_metric("workspace_summary_cache_hits")
+            return cached
+
+        incr_metric("workspace_summary_cache_misses")
+        rollup = self.openAiClient.chat(
+            [
+                SystemMessage(content=WORKSPACE_ROLLUP_PROMPT),
+                HumanMessage(
+                    content=self._truncate(text, settings.NOTE_SUMMARY_INPUT_MAX_TOKENS)
+                ),
+            ]
+        )
+        try:
+            redis_client.set(key, rollup, ex=settings.NOTE_SUMMARY_ROLLUP_TTL_SECONDS)
+        except redis.RedisError as e:
+            logger.warning(f"Workspace summary cache write failed: {e}")
+        return rollup
+
+    def summarize_user_notes(self, user_id: int, db: Session) -> List[str]:
+        """
+        One context document per workspace, ready for the final answer.
+        """
+        summaries = self.get_note_summaries(user_id, db)
+        if not summaries:
+            return []
+        names = dict(
+            db.execute(
+                select(Workspace.id, Workspace.name).where(Workspace.user_id == user_id)
+            ).all()
+        )
+        return [
+            f"Workspace: {names.get(workspace_id, 'Untitled')}\n"
+            f"{self.rollup_workspace(workspace_id, notes)}"
+            for workspace_id, notes in summaries.items()
+            if notes
+        ]
@@ -5,11 +5,280 @@ from langchain_openai import OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from openai import OpenAIError
+from contextlib import aclosing, asynccontextmanager, contextmanager
+import httpx
 import json
-import tiktoken
+import asyncio
+import os
+import threading
+import weakref
+from app.utils.tokens import count_tokens, get_encoding
+from app.utils.sse import SSE_PROTOCOL_CUMULATIVE, AnswerStreamEncoder, encode_answer
+from app.utils.single_flight import SingleFlight, StreamSingleFlight, request_key
 
 logger = logging.getLogger(__name__)
 
+_chat_flight = SingleFlight("chat")
+_embeddings_flight = SingleFlight("embeddings")
+_chat_stream_flight = StreamSingleFlight("chat_stream")
+
+
+class OpenAiClientRegistry:
+    """
+    Process-wide registry of LangChain model clients.
+
+    Every client shares one keep-alive httpx connection pool, so chat turns
+    and indexing jobs reuse TLS connections instead of opening new ones.
+    A semaphore caps the number of concurrent upstream requests per process.
+    State is keyed by pid: a forked Celery worker builds its own pool on
+    first use and never touches sockets inherited from the parent.
+    """
+
+    _lock = threading.Lock()
+    _pid = None
+    _http_client = None
+    _clients = {}
+    _semaphore = None
+    _in_flight = 0
+    _peak_in_flight = 0
+    _waits = 0
+    _total_requests = 0
+    _loop_state = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def _ensure_process_state(cls):
+        if cls._pid == os.getpid():
+            return
+        with cls._lock:
+            if cls._pid == os.getpid():
+                return
+            cls._http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    settings.OPENAI_TIMEOUT_SECONDS,
+                    connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+            cls._clients = {}
+            cls._semaphore = threading.BoundedSemaphore(
+                settings.OPENAI_MAX_CONCURRENT_REQUESTS
+            )
+            cls._in_flight = 0
+            cls._peak_in_flight = 0
+            cls._waits = 0
+            cls._total_requests = 0
+            cls._loop_state = weakref.WeakKeyDictionary()
+            cls._pid = os.getpid()
+
+    @classmethod
+    def _get_or_create(cls, key, factory):
+        cls._ensure_process_state()
+        client = cls._clients.get(key)
+        if client is None:
+            with cls._lock:
+                client = cls._clients.get(key)
+                if client is None:
+                    client = factory()
+                    cls._clients[key] = client
+        return client
+
+    @classmethod
+    def get_chat_model(cls, model=None, temperature=None, streaming=False):
+        model = model or settings.CHAT_MODEL
+
+        def factory():
+            kwargs = {}
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            return ChatOpenAI(
+                openai_api_key=settings.OPENAI_API_KEY,
+                model=model,
+                streaming=streaming,
+                http_client=cls._http_client,
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                max_retries=settings.OPENAI_MAX_RETRIES,
+                **kwargs,
+            )
+
+        return cls._get_or_create(("chat", model, temperature, streaming), factory)
+
+    @staticmethod
+    def _embedding_dimensions(model):
+        # Only the text-embedding-3 family accepts a reduced output size
+        if model.startswith("text-embedding-3"):
+            return settings.EMBEDDING_DIMENSIONS
+        return None
+
+    @classmethod
+    def get_embeddings_model(cls, model=None):
+        model = model or settings.EMBEDDING_MODEL
+
+        def factory():
+            return OpenAIEmbeddings(
+                openai_api_key=settings.OPENAI_API_KEY,
+                model=model,
+                dimensions=cls._embedding_dimensions(model),
+                http_client=cls._http_client,
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                max_retries=settings.OPENAI_MAX_RETRIES,
+            )
+
+        return cls._get_or_create(("embeddings", model), factory)
+
+    @classmethod
+    def _get_loop_state(cls):
+        """
+        httpx async connections are bound to the event loop that opened them,
+        so async clients are shared per running loop rather than per process.
+        """
+        cls._ensure_process_state()
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            state = cls._loop_state.get(loop)
+            if state is None:
+                state = {
+                    "http_client": httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                        ),
+                        timeout=httpx.Timeout(
+                            settings.OPENAI_TIMEOUT_SECONDS,
+                            connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+                        ),
+                    ),
+                    "clients": {},
+                    "semaphore": asyncio.Semaphore(
+                        settings.OPENAI_MAX_CONCURRENT_REQUESTS
+                    ),
+                }
+                cls._loop_state[loop] = state
+        return state
+
+    @classmethod
+    def get_async_embeddings_model(cls, model=None, max_retries=None):
+        model = model or settings.EMBEDDING_MODEL
+        if max_retries is None:
+            max_retries = settings.OPENAI_MAX_RETRIES
+        state = cls._get_loop_state()
+        key = ("embeddings", model, max_retries)
+        client = state["clients"].get(key)
+        if client is None:
+            client = OpenAIEmbeddings(
+                openai_api_key=settings.OPENAI_API_KEY,
+                model=model,
+                dimensions=cls._embedding_dimensions(model),
+                http_async_client=state["http_client"],
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                max_retries=max_retries,
+            )
+            state["clients"][key] = client
+        return client
+
+    @classmethod
+    def get_async_chat_model(cls, model=None, temperature=None, streaming=False):
+        model = model or settings.CHAT_MODEL
+        state = cls._get_loop_state()
+        key = ("chat", model, temperature, streaming)
+        client = state["clients"].get(key)
+        if client is None:
+            kwargs = {}
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            client = ChatOpenAI(
+                openai_api_key=settings.OPENAI_API_KEY,
+                model=model,
+                streaming=streaming,
+                http_async_client=state["http_client"],
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                max_retries=settings.OPENAI_MAX_RETRIES,
+                **kwargs,
+            )
+            state["clients"][key] = client
+        return client
+
+    @classmethod
+    async def aclose_loop_clients(cls):
+        """
+        Close the async clients of the running loop. Call before a short-lived
+        loop (e.g. one started with asyncio.run) finishes.
+        """
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            state = cls._loop_state.pop(loop, None)
+        if state:
+            await state["http_client"].aclose()
+
+    @classmethod
+    @contextmanager
+    def request_slot(cls):
+        """
+        Hold one of the per-process concurrent request slots for the duration
+        of an upstream call (or a whole streamed response).
+        """
+        cls._ensure_process_state()
+        semaphore = cls._semaphore
+        if not semaphore.acquire(blocking=False):
+            with cls._lock:
+                cls._waits += 1
+            semaphore.acquire()
+        with cls._lock:
+            cls._in_flight += 1
+            cls._total_requests += 1
+            cls._peak_in_flight = max(cls._peak_in_flight, cls._in_flight)
+        try:
+            yield
+        finally:
+            with cls._lock:
+                cls._in_flight -= 1
+            semaphore.release()
+
+    @classmethod
+    @asynccontextmanager
+    async def async_request_slot(cls):
+        """
+        request_slot() for coroutines: waits on the running loop's semaphore
+        instead of blocking the loop. The limit applies per event loop.
+        """
+        semaphore = cls._get_loop_state()["semaphore"]
+        if semaphore.locked():
+            with cls._lock:
+                cls._waits += 1
+        async with semaphore:
+            with cls._lock:
+                cls._in_flight += 1
+                cls._total_requests += 1
+                cls._peak_in_flight = max(cls._peak_in_flight, cls._in_flight)
+            try:
+                yield
+            finally:
+                with cls._lock:
+                    cls._in_flight -= 1
+
+    @classmethod
+    def get_pool_stats(cls) -> dict:
+        """
+        Utilisation of this process's client pool, used to size the limits.
+        """
+        cls._ensure_process_state()
+        limit = settings.OPENAI_MAX_CONCURRENT_REQUESTS
+        return {
+            "pid": cls._pid,
+            "clients": len(cls._clients),
+            "in_flight": cls._in_flight,
+            "peak_in_flight": cls._peak_in_flight,
+            "concurrency_limit": limit,
+            "utilisation": cls._in_flight / limit if limit else 0.0,
+            "waited_for_slot": cls._waits,
+            "total_requests": cls._total_requests,
+            "max_connections": settings.OPENAI_MAX_CONNECTIONS,
+        }
+
 
 class OpenAiClient:
 
@@ -17,13 +286,6 @@ class OpenAiClient:
         """
         Count tokens in a list of LangChain messages
         """
-        # Get the encoding for the model
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            # Fall back to cl100k_base for newer models not explicitly in tiktoken
-            encoding = tiktoken.get_encoding("cl100k_base")
-
         # Per OpenAI's documentation for chat models
         tokens_per_message = (
             3  # every message follows <|start|>{role/name}\n{content}<|end|>
@@ -33,13 +295,14 @@ class OpenAiClient:
         # Base tokens for the entire request
         num_tokens = 0
 
-        # Count tokens in each message
+        # Count tokens in each message; counts are memoised per content, so a
+        # replayed history is only encoded once
         for message in messages:
             num_tokens += tokens_per_message
 
             # Count tokens in the content
             if message.content:
-                num_tokens += len(encoding.encode(message.content))
+                num_tokens += count_tokens(message.content, model)
 
             # Count tokens in the name if applicable (rare in LangChain messages)
             if hasattr(message, "name") and message.name:
@@ -98,14 +361,100 @@ class OpenAiClient:
         ]
         return self.chat(messages)
 
-    def embedding_text(self, text):
+    def split_batches_with_token_counts(self, texts, max_inputs=None):
+        """
+        Group texts into consecutive batches that stay under the provider's
+        per-request token and input limits. Texts longer than the per-input
+        limit are truncated so a single large chunk can never fail a request.
+        Returns a list of (batch, token_count) pairs.
+        """
+        max_inputs = min(
+            max_inputs or settings.EMBEDDING_BATCH_MAX_INPUTS,
+            settings.EMBEDDING_BATCH_MAX_INPUTS,
+        )
+        encoding = get_encoding(settings.EMBEDDING_MODEL)
+
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = encoding.encode(text)
+            if len(tokens) > settings.EMBEDDING_INPUT_MAX_TOKENS:
+                tokens = tokens[: settings.EMBEDDING_INPUT_MAX_TOKENS]
+                text = encoding.decode(tokens)
+
+            if batch and (
+                batch_tokens + len(tokens) > settings.EMBEDDING_BATCH_MAX_TOKENS
+                or len(batch) >= max_inputs
+            ):
+                batches.append((batch, batch_tokens))
+                batch = []
+                batch_tokens = 0
+
+            batch.append(text)
+            batch_tokens += len(tokens)
+
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    def split_batches_by_tokens(self, texts, max_inputs=None):
+        return [
+            batch
+            for batch, _ in self.split_batches_with_token_counts(texts, max_inputs)
+        ]
+
+    def embed_documents(self, texts):
+        """
+        Embed a list of texts, returning one vector per text in the same order.
+        Texts are sent in as few requests as the provider limits allow.
+        """
+        if not texts:
+            return []
         try:
-            # Use the non-streaming API
-            embeddings = OpenAIEmbeddings(
-                openai_api_key=settings.OPENAI_API_KEY,
-                model="text-embedding-3-small",
-            ).embed_query(text)
+            embedder = OpenAiClientRegistry.get_embeddings_model()
+            embeddings = []
+            for batch in self.split_batches_by_tokens(texts):
+
+                def embed(batch=batch):
+                    with OpenAiClientRegistry.request_slot():
+                        return embedder.embed_documents(batch, chunk_size=len(batch))
+
+                # Identical batches in flight (e.g. the same query from
+                # several requests) share one upstream call
+                embeddings.extend(
+                    _embeddings_flight.do(
+                        request_key(
+                            "embeddings",
+                            embedder.model,
+                            batch,
+                            dimensions=embedder.dimensions,
+                        ),
+                        embed,
+                    )
+                )
             return embeddings
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings with LangChain: {e}")
+            raise ServiceUnavailableError(
+                "Sorry, the AI service is currently unavailable. Please try again later."
+            )
+
+    def embedding_text(self, text):
+        try:
+            embedder = OpenAiClientRegistry.get_embeddings_model()
+
+            def embed():
+                # Use the non-streaming API
+                with OpenAiClientRegistry.request_slot():
+                    return embedder.embed_query(text)
+
+            return _embeddings_flight.do(
+                request_key(
+                    "embedding", embedder.model, text, dimensions=embedder.dimensions
+                ),
+                embed,
+            )
         except Exception as e:
             logger.error(f"Error generating embedding with LangChain: {e}")
             raise ServiceUnavailableError(
@@ -114,14 +463,17 @@ class OpenAiClient:
 
     def chat(self, messages):
         try:
-            response = ChatOpenAI(
-                openai_api_key=settings.OPENAI_API_KEY,
-                model="gpt-4.1-nano",
-                temperature=0.2,
-            ).invoke(messages)
-            answer = response.content.strip()
+            chat = OpenAiClientRegistry.get_chat_model(temperature=0.2)
 
-            return answer
+            def invoke():
+                with OpenAiClientRegistry.request_slot():
+                    return chat.invoke(messages).content.strip()
+
+            # Identical prompts in flight (router, summaries) share one call
+            return _chat_flight.do(
+                request_key("chat", chat.model_name, messages, temperature=0.2),
+                invoke,
+            )
 
         except OpenAIError as e:
             logger.error(f"OpenAI API error: {e}")
@@ -134,30 +486,89 @@ class OpenAiClient:
                 "Sorry, the AI service is currently unavailable. Please try again later."
             )
 
-    def chat_stream(self, messages):
+    def chat_stream(self, messages, on_complete=None, protocol_version=SSE_PROTOCOL_CUMULATIVE):
+        """
+        Stream the answer as SSE events in the given protocol version (see
+        app.utils.sse). on_complete, if given, is called with the full answer
+        once it has been streamed.
+        """
         try:
-            # Create a streaming-enabled ChatOpenAI instance
-            chat = ChatOpenAI(
-                openai_api_key=settings.OPENAI_API_KEY,
-                streaming=True,
-                model="gpt-4.1-nano",  # Or gpt-3.5-turbo for a more economical option,
-            )
+            # Shared streaming-enabled ChatOpenAI instance
+            chat = OpenAiClientRegistry.get_chat_model(streaming=True)
+
+            # Collects the answer and encodes it for the client's protocol
+            encoder = AnswerStreamEncoder(protocol_version)
+
+            # Use LangChain's streaming capability; the request slot is held
+            # until the whole answer has been streamed
+            with OpenAiClientRegistry.request_slot():
+                for chunk in chat.stream(messages):
+                    if hasattr(chunk, "content") and chunk.content:
+                        # Send the incremental update as SSE
+                        event = encoder.add(chunk.content)
+                        if event:
+                            yield event
+
+            # Send the final message
+            for event in encoder.finish():
+                yield event
+
+            if on_complete:
+                try:
+                    on_complete(encoder.answer)
+                except Exception as e:
+                    logger.exception(f"Error in chat stream completion hook: {e}")
 
-            # Initialize an empty answer
-            answer_so_far = ""
+        except OpenAIError as e:
+            logger.error(f"OpenAI API error: {e}")
+            error_message = "I'm currently experiencing high demand. Please try again in a few moments."
+            if hasattr(e, "code") and e.code == "rate_limit_exceeded":
+                error_message = "I've reached my request limit. Please try again in a few moments. 🙏"
+            yield f"data: {json.dumps({'answer': error_message, 'done': True})}\n\n"
+        except Exception as e:
+            logger.exception(f"Unexpected error calling OpenAI API: {e}")
+            yield f"data: {json.dumps({'answer': 'An unexpected error occurred. Please try again later.', 'done': True})}\n\n"
 
-            # Use LangChain's streaming capability
-            for chunk in chat.stream(messages):
+    async def _astream_contents(self, chat, messages):
+        # The request slot is held until the whole answer has been streamed
+        async with OpenAiClientRegistry.async_request_slot():
+            async for chunk in chat.astream(messages):
                 if hasattr(chunk, "content") and chunk.content:
-                    # Extract the content
-                    delta_content = chunk.content
-                    answer_so_far += delta_content
+                    yield chunk.content
+
+    async def achat_stream(self, messages, on_complete=None, protocol_version=SSE_PROTOCOL_CUMULATIVE):
+        """
+        Async chat_stream() on the running loop's client pool. on_complete
+        runs in a worker thread.
+        """
+        try:
+            # Shared streaming-enabled ChatOpenAI instance
+            chat = OpenAiClientRegistry.get_async_chat_model(streaming=True)
 
-                    # Send the incremental update as SSE
-                    yield f"data: {json.dumps({'answer': answer_so_far, 'done': False})}\n\n"
+            # Collects the answer and encodes it for the client's protocol
+            encoder = AnswerStreamEncoder(protocol_version)
+
+            # Identical prompts in flight subscribe to the same upstream
+            # stream; each subscriber replays it from the first token
+            contents = _chat_stream_flight.subscribe(
+                request_key("chat_stream", chat.model_name, messages),
+                lambda: self._astream_contents(chat, messages),
+            )
+            # Send the incremental updates as SSE; closing the encoder
+            # leaves the shared stream now rather than when collected
+            async with aclosing(encode_answer(contents, encoder)) as events:
+                async for event in events:
+                    yield event
 
             # Send the final message
-            yield f"data: {json.dumps({'answer': answer_so_far, 'done': True})}\n\n"
+            for event in encoder.finish():
+                yield event
+
+            if on_complete:
+                try:
+                    await asyncio.to_thread(on_complete, encoder.answer)
+                except Exception as e:
+                    logger.exception(f"Error in chat stream completion hook: {e}")
 
         except OpenAIError as e:
             logger.error(f"OpenAI API error: {e}")
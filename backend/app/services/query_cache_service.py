@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Callable, List, Optional
+import redis
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.services.embedding_cache_service import EmbeddingCacheService
+from app.services.index_version_service import IndexVersionService
+from app.utils.lru_cache import LRUCache
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCacheService:
+    """
+    Two-level cache in front of retrieval.
+
+    The first level maps normalised query text to its embedding, the second
+    maps (user, search scope, query, index version) to the ranked results.
+    Both levels check an in-process LRU before Redis. Result entries embed the
+    user's index version in their key, so any write that bumps the version
+    makes older entries unreachable; they simply expire.
+    """
+
+    RESULT_KEY_PREFIX = "search_results"
+
+    _embeddings = LRUCache(settings.QUERY_CACHE_LOCAL_MAX_ENTRIES)
+    _results = LRUCache(settings.QUERY_CACHE_LOCAL_MAX_ENTRIES)
+
+    def __init__(self):
+        self.embeddingCache = EmbeddingCacheService()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r"\s+", " ", query).strip().casefold()
+
+    def get_embedding(
+        self, query: str, embed_fn: Callable[[List[str]], List[List[float]]]
+    ) -> List[float]:
+        """
+        Embed a search query, reusing the vector of any earlier query with the
+        same normalised text.
+        """
+        query = self.normalize_query(query)
+        if not settings.QUERY_CACHE_ENABLED:
+            return embed_fn([query])[0]
+
+        embedding = self._embeddings.get(query)
+        if embedding is not None:
+            incr_metric("query_embedding_local_hits")
+            return embedding
+
+        incr_metric("query_embedding_local_misses")
+        embedding = self.embeddingCache.get_or_embed([query], embed_fn)[0]
+        self._embeddings.set(query, embedding)
+        return embedding
+
+    def result_key(self, query: str, user_id: int, **scope) -> Optional[str]:
+        """
+        Cache key for a search, or None when the user's index version is
+        unknown and results must not be cached.
+        """
+        version = IndexVersionService.get(user_id)
+        if version < 0:
+            return None
+        payload = json.dumps(
+            {"query": self.normalize_query(query), **scope},
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.RESULT_KEY_PREFIX}:{user_id}:{version}:{digest}"
+
+    def get_results(self, key: Optional[str]) -> Optional[list]:
+        if key is None or not settings.QUERY_CACHE_ENABLED:
+            return None
+
+        results = self._results.get(key)
+        if results is not None:
+            incr_metric("search_result_local_hits")
+            return results
+
+        try:
+            value = redis_client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Search result cache lookup failed: {e}")
+            value = None
+        if value is None:
+            incr_metric("search_result_misses")
+            return None
+
+        incr_metric("search_result_redis_hits")
+        results = json.loads(value)
+        self._results.set(key, results)
+        return results
+
+    def set_results(self, key: Optional[str], results: list):
+        if key is None or not settings.QUERY_CACHE_ENABLED:
+            return
+
+        self._results.set(key, results)
+        try:
+            redis_client.set(
+                key, json.dumps(results), ex=settings.QUERY_RESULT_CACHE_TTL_SECONDS
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Search result cache write failed: {e}")
@@ -3,115 +3,409 @@ from app.models.note import Note
 from app.exception.service_unavailable import ServiceUnavailableError
 from app.exception.requests_rate_limit_exceeded import RequestRateLimitExceededError
 from app.services.openai_client import OpenAiClient
+from app.services.context_packer_service import ContextPackerService
+from app.services.chat_session_service import ChatSessionService
+from app.services.note_summary_service import NoteSummaryService
+from app.services.intent_classifier_service import IntentClassifierService
+from app.services.query_cache_service import QueryCacheService
+from app.db.database import SessionLocal
+from app.utils.metrics import incr_metric, record_duration
+from app.utils.sse import SSE_PROTOCOL_CUMULATIVE
+from concurrent.futures import Future, ThreadPoolExecutor
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from uuid import UUID
 from app.config import settings
 from openai import OpenAIError
+import asyncio
 import logging
 import json
+import time
 
 logger = logging.getLogger(__name__)
 
+# Shared by all requests of the process; speculative searches are short
+_speculative_executor = ThreadPoolExecutor(
+    max_workers=settings.SPECULATIVE_RETRIEVAL_WORKERS,
+    thread_name_prefix="speculative-retrieval",
+)
+
+# Routing and retrieval of async chat turns. Kept off the loop's default
+# executor, which other to_thread calls share: a turn holds its thread for
+# the LLM router's round trip, so at most CHAT_PREPARE_WORKERS turns per
+# process are being prepared at once and later ones queue here
+_prepare_executor = ThreadPoolExecutor(
+    max_workers=settings.CHAT_PREPARE_WORKERS,
+    thread_name_prefix="chat-prepare",
+)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant for a note-taking app. Answer questions based on the provided context or collect necessary information from user to execute some action based on chat history.\n"
+    "If the answer isn’t in the context, use your own knowledge, but keep replies short and relevant.\n"
+    "After answering, suggest follow-up questions and ask if the user wants to know more."
+)
+
 
 class RAGChatbotService:
     def __init__(self):
         self.openAiClient = OpenAiClient()
 
-    def get_text_content_from_note(self, notes: List[Note], vs: VectorService):
+    def get_text_contents_from_notes(self, notes: List[Note], vs: VectorService):
         """
-        Extract text content from notes.
+        Extract the non-empty text content of each note, one entry per note.
         """
         contents = [vs.extract_plain_text_from_json(note.content) for note in notes]
-        return "\n\n".join(contents)
+        return [content for content in contents if content]
 
-    def answer(
+    def to_langchain_messages(self, chat_history: List[dict]):
+        messages = []
+        for item in chat_history:
+            if item["role"] == "user":
+                messages.append(HumanMessage(content=item["content"]))
+            elif item["role"] == "assistant":
+                messages.append(AIMessage(content=item["content"]))
+        return messages
+
+    def start_speculative_search(self, query: str, top_k: int, search_scope: dict):
+        """
+        Run search_similar_chunks for query on the shared executor, with its
+        own DB session. Returns a Future.
+        """
+
+        def search():
+            db = SessionLocal()
+            try:
+                return VectorService().search_similar_chunks(
+                    query, db, top_k, **search_scope
+                )
+            finally:
+                db.close()
+
+        incr_metric("speculative_retrieval_started")
+        return _speculative_executor.submit(search)
+
+    def discard_speculative(self, speculative: Optional[Future]):
+        """
+        Drop a speculative search nobody will use, cancelling it if it has
+        not started yet.
+        """
+        if speculative is None:
+            return
+        if speculative.cancel():
+            incr_metric("speculative_retrieval_cancelled")
+        else:
+            incr_metric("speculative_retrieval_discarded")
+
+    def retrieve(
+        self,
+        vs: VectorService,
+        question: dict,
+        user_message: str,
+        db: Session,
+        top_k: int,
+        search_scope: dict,
+        speculative: Optional[Future] = None,
+    ):
+        """
+        Chunks for a search decision. Speculative results for the raw message
+        are used as-is when the router kept the message as its query;
+        otherwise they are fused with a search for the router's keyword.
+        """
+        query = question.get("query") or user_message
+        if speculative is None:
+            return vs.search_similar_chunks(query, db, top_k, **search_scope)
+
+        speculative_chunks = speculative.result()
+        normalize = QueryCacheService.normalize_query
+        if normalize(query) == normalize(user_message):
+            incr_metric("speculative_retrieval_used")
+            return speculative_chunks
+
+        incr_metric("speculative_retrieval_refined")
+        refined_chunks = vs.search_similar_chunks(query, db, top_k, **search_scope)
+        return vs.reciprocal_rank_fusion(
+            [refined_chunks, speculative_chunks],
+            k=settings.HYBRID_RRF_K,
+            key=lambda chunk: chunk,
+        )[:top_k]
+
+    def prepare_messages(
         self,
         user_message: str,
         user_id: str,
         db: Session,
-        note_ids: List[str],
+        note_ids: Optional[List[UUID]],
         chat_history: Optional[List[dict]] = None,
         top_k: int = 2,
+        workspace_id: Optional[UUID] = None,
+        search_mode: Optional[str] = None,
+        session_id: Optional[UUID] = None,
+        current_note_id: Optional[UUID] = None,
     ):
-        try:
-            # Estimate user message tokens
-
-            messages_for_streams = []
-            messages_for_streams.append(
-                SystemMessage(
-                    content=(
-                        "You are a helpful assistant for a note-taking app. Answer questions based on the provided context or collect necessary information from user to execute some action based on chat history.\n"
-                        "If the answer isn’t in the context, use your own knowledge, but keep replies short and relevant.\n"
-                        "After answering, suggest follow-up questions and ask if the user wants to know more."
+        """
+        Route the message, gather its context and build the final prompt.
+        note_ids restricts retrieval; current_note_id is only a hint for
+        requests such as "summarize this note". Returns (messages,
+        on_complete), where on_complete records the turn in the chat session
+        once the answer has been streamed.
+        """
+        system_prompt = SYSTEM_PROMPT
+        if session_id:
+            # Server-side session: recent turns plus a summary of the rest
+            summary, chat_history = ChatSessionService.get_history(session_id)
+            if summary:
+                system_prompt = f"{SYSTEM_PROMPT}\n\nSummary of the earlier conversation:\n{summary}"
+
+        # Keep the newest turns that fit; the router and the answer both
+        # see the same bounded history
+        packer = ContextPackerService()
+        chat_history = packer.pack(
+            system_prompt, user_message, chat_history
+        ).history
+        messages_for_streams = [SystemMessage(content=system_prompt)]
+        messages_for_streams.extend(self.to_langchain_messages(chat_history))
+
+        vs = VectorService()
+        search_scope = {
+            "user_id": user_id,
+            "workspace_id": workspace_id,
+            "note_ids": note_ids,
+            "search_mode": search_mode,
+        }
+        # Clear cases are routed locally; the LLM router handles the rest
+        route_started = time.perf_counter()
+        question = IntentClassifierService(vs.embed_query).classify(
+            user_message,
+            chat_history,
+            note_ids or ([current_note_id] if current_note_id else None),
+        )
+        speculative = None
+        if question is None:
+            if settings.SPECULATIVE_RETRIEVAL_ENABLED:
+                # Retrieve for the raw message while the router thinks
+                speculative = self.start_speculative_search(
+                    user_message, top_k, search_scope
+                )
+            try:
+                question = json.loads(
+                    self.openAiClient.detect_if_we_need_to_search_in_vector_db(
+                        messages_for_streams, user_message
                     )
-                ),
+                )
+            finally:
+                # The router failed or returned something unusable; don't
+                # leave the speculative search holding a connection
+                if not isinstance(question, dict) or "type" not in question:
+                    self.discard_speculative(speculative)
+                    speculative = None
+        record_duration("chat_route", time.perf_counter() - route_started)
+
+        if speculative is not None and question["type"] != "search":
+            self.discard_speculative(speculative)
+            speculative = None
+
+        chunks = []
+        documents = []
+        prompt_template = "{question}"
+        if question["type"] == "general":
+            pass
+        elif question["type"] == "search":
+            retrieve_started = time.perf_counter()
+            chunks = self.retrieve(
+                vs, question, user_message, db, top_k, search_scope, speculative
             )
-            if chat_history:
-                for item in chat_history:
-                    if item["role"] == "user":
-                        messages_for_streams.append(
-                            HumanMessage(content=item["content"])
-                        )
-                    elif item["role"] == "assistant":
-                        messages_for_streams.append(AIMessage(content=item["content"]))
-
-            vs = VectorService()
-            question = self.openAiClient.detect_if_we_need_to_search_in_vector_db(
-                messages_for_streams, user_message
+            record_duration("chat_retrieve", time.perf_counter() - retrieve_started)
+            prompt_template = "data you might need from database:\n{context}\n\n Use the history chat and data to answer this question: {question}"
+        elif question["type"] == "summarize_note":
+            note_id = question["query"]
+            notes = (
+                db.query(Note)
+                .filter(Note.id == note_id, Note.user_id == user_id)
+                .all()
             )
 
-            question = json.loads(question)
-            if question["type"] == "general":
-                prompt = user_message
-            elif question["type"] == "search":
-                chunks = vs.search_similar_chunks(question["query"], db, top_k)
-                context = "\n\n".join(chunks)
-                prompt = f"data you might need from database:\n{context}\n\n Use the history chat and data to answer this question: {user_message}"
-            elif question["type"] == "summarize_note":
-                note_id = question["query"]
-                notes = db.query(Note).filter(Note.id == note_id).all()
-
-                if not notes:
-                    prompt = f"Note with id {note_id} not found. Anwser the question: {user_message}"
-                else:
-                    context = self.get_text_content_from_note(notes, vs)
-                    if not context:
-                        prompt = f"Note with id {note_id} content is not summarize. Anwser the question: {user_message}"
-                    else:
-                        prompt = f"Summarize the following note:\n{context}\n\nUse the history chat and data to answer this question: {user_message}"
-            elif question["type"] == "summarize_all_notes":
-                notes = db.query(Note).filter(Note.user_id == user_id).all()
-                if not notes:
-                    prompt = f"User with id {user_id} has no notes. Anwser the question: {user_message}"
+            if not notes:
+                prompt_template = "Note with id {note_id} not found. Anwser the question: {question}"
+            else:
+                documents = self.get_text_contents_from_notes(notes, vs)
+                if not documents:
+                    prompt_template = "Note with id {note_id} content is not summarize. Anwser the question: {question}"
                 else:
-                    context = self.get_text_content_from_note(notes, vs)
-                    if not context:
-                        prompt = f"User with id {user_id} has no notes to summarize. Anwser the question: {user_message}"
-                    else:
-                        prompt = f"Summarize all notes:\n{context}\n\nUse the history chat and data to answer this question: {user_message}"
-            elif question["type"] == "support_later":
-                prompt = f"The action user require will be support in the future. Answer this question: {user_message}"
+                    prompt_template = "Summarize the following note:\n{context}\n\nUse the history chat and data to answer this question: {question}"
+        elif question["type"] == "summarize_all_notes":
+            # Per-workspace rollups of cached note summaries
+            documents = NoteSummaryService(self.openAiClient).summarize_user_notes(
+                user_id, db
+            )
+            if not documents:
+                prompt_template = "User with id {user_id} has no notes to summarize. Anwser the question: {question}"
+            else:
+                prompt_template = "Summarize all notes from these per-workspace summaries:\n{context}\n\nUse the history chat and data to answer this question: {question}"
+        elif question["type"] == "support_later":
+            prompt_template = "The action user require will be support in the future. Answer this question: {question}"
 
-            messages_for_streams.append(HumanMessage(content=prompt))
+        def build_prompt(context):
+            return prompt_template.format(
+                context=context,
+                question=user_message,
+                note_id=question.get("query"),
+                user_id=user_id,
+            )
 
-            if self.openAiClient.count_tokens_in_messages(messages_for_streams) > 500:
-                yield f"data: {json.dumps({'answer': 'The message is too long, please shorten it.', 'done': True, 'error_type': 'HISTORY_TOO_LONG'})}\n\n"
-                return
+        # Fit history, retrieved chunks and note contents into the
+        # prompt budget instead of rejecting long conversations
+        packed = packer.pack(
+            system_prompt, build_prompt(""), chat_history, chunks, documents
+        )
+        messages_for_streams = [SystemMessage(content=system_prompt)]
+        messages_for_streams.extend(self.to_langchain_messages(packed.history))
+        messages_for_streams.append(
+            HumanMessage(
+                content=build_prompt("\n\n".join(packed.chunks + packed.documents))
+            )
+        )
 
-            stream = self.openAiClient.chat_stream(messages=messages_for_streams)
+        on_complete = None
+        if session_id:
+
+            def on_complete(answer):
+                ChatSessionService.append_turns(
+                    session_id, [("user", user_message), ("assistant", answer)]
+                )
+
+        return messages_for_streams, on_complete
+
+    def prepare_messages_in_session(self, *args, **kwargs):
+        """
+        prepare_messages() with a DB session of its own, closed before the
+        answer starts streaming. Takes the same arguments minus db.
+        """
+        db = SessionLocal()
+        try:
+            return self.prepare_messages(*args, db=db, **kwargs)
+        finally:
+            db.close()
 
-            yield from stream
+    def error_event(self, error: Exception) -> str:
+        """
+        Final SSE event reporting an error raised before or while streaming.
+        """
+        try:
+            raise error
         except OpenAIError as openai_error:
             # Catch any generic OpenAI error
             logger.error(f"OpenAI API error: {openai_error}")
-            yield f"data: {json.dumps({'answer': 'OpenAI API is currently unavailable, please try again later.', 'done': True})}\n\n"
+            return f"data: {json.dumps({'answer': 'OpenAI API is currently unavailable, please try again later.', 'done': True})}\n\n"
         except RequestRateLimitExceededError as rate_limit_error:
             error_message = str(rate_limit_error)
-            yield f"data: {json.dumps({'answer': f"{error_message}🙏", 'done': True})}\n\n"
+            return f"data: {json.dumps({'answer': f"{error_message}🙏", 'done': True})}\n\n"
         except ServiceUnavailableError as service_unavailable_error:
             error_message = str(service_unavailable_error)
-            yield f"data: {json.dumps({'answer': f"{error_message}", 'done': True})}\n\n"
+            return f"data: {json.dumps({'answer': f"{error_message}", 'done': True})}\n\n"
         except Exception as e:
             logger.exception(f"Error in RAGChatbot: {e}")
-            yield f"data: {json.dumps({'answer': 'Sorry, something went wrong with the chatbot service. {e}', 'done': True})}\n\n"
+            return f"data: {json.dumps({'answer': 'Sorry, something went wrong with the chatbot service. {e}', 'done': True})}\n\n"
+
+    def answer(
+        self,
+        user_message: str,
+        user_id: str,
+        db: Session,
+        note_ids: Optional[List[UUID]],
+        chat_history: Optional[List[dict]] = None,
+        top_k: int = 2,
+        workspace_id: Optional[UUID] = None,
+        search_mode: Optional[str] = None,
+        session_id: Optional[UUID] = None,
+        protocol_version: int = SSE_PROTOCOL_CUMULATIVE,
+        current_note_id: Optional[UUID] = None,
+    ):
+        started = time.perf_counter()
+        try:
+            messages_for_streams, on_complete = self.prepare_messages(
+                user_message,
+                user_id,
+                db,
+                note_ids,
+                chat_history,
+                top_k,
+                workspace_id=workspace_id,
+                search_mode=search_mode,
+                session_id=session_id,
+                current_note_id=current_note_id,
+            )
+            stream = self.openAiClient.chat_stream(
+                messages=messages_for_streams,
+                on_complete=on_complete,
+                protocol_version=protocol_version,
+            )
+
+            first_event = True
+            for event in stream:
+                if first_event:
+                    record_duration(
+                        "chat_time_to_first_event", time.perf_counter() - started
+                    )
+                    first_event = False
+                yield event
+        except Exception as e:
+            yield self.error_event(e)
+
+    async def aanswer(
+        self,
+        user_message: str,
+        user_id: str,
+        note_ids: Optional[List[UUID]],
+        chat_history: Optional[List[dict]] = None,
+        top_k: int = 2,
+        workspace_id: Optional[UUID] = None,
+        search_mode: Optional[str] = None,
+        session_id: Optional[UUID] = None,
+        protocol_version: int = SSE_PROTOCOL_CUMULATIVE,
+        current_note_id: Optional[UUID] = None,
+    ):
+        """
+        Async variant of answer() for the event loop. Routing and retrieval
+        run on the bounded chat-prepare executor with their own DB session,
+        which is released before the first token; the answer is then
+        streamed with the async client, so an open stream holds neither a
+        thread nor a connection.
+        """
+        started = time.perf_counter()
+
+        def prepare():
+            # Time spent queued for a worker is part of time to first event
+            record_duration("chat_prepare_wait", time.perf_counter() - started)
+            return self.prepare_messages_in_session(
+                user_message=user_message,
+                user_id=user_id,
+                note_ids=note_ids,
+                chat_history=chat_history,
+                top_k=top_k,
+                workspace_id=workspace_id,
+                search_mode=search_mode,
+                session_id=session_id,
+                current_note_id=current_note_id,
+            )
+
+        try:
+            loop = asyncio.get_running_loop()
+            messages_for_streams, on_complete = await loop.run_in_executor(
+                _prepare_executor, prepare
+            )
+
+            first_event = True
+            async for event in self.openAiClient.achat_stream(
+                messages=messages_for_streams,
+                on_complete=on_complete,
+                protocol_version=protocol_version,
+            ):
+                if first_event:
+                    record_duration(
+                        "chat_time_to_first_event", time.perf_counter() - started
+                    )
+                    first_event = False
+                yield event
+        except Exception as e:
+            yield self.error_event(e)
@@ -1,116 +1,56 @@
+import hashlib
 import json
-import threading
-import time
-from sqlalchemy import select
+import math
+import uuid
+from typing import List, Optional
+from uuid import UUID
+from sqlalchemy import Text, bindparam, cast, func, insert, select, text
+from pgvector.sqlalchemy import BIT
 from sqlalchemy.orm import Session
-from app.models.document_embedding import DocumentEmbedding, EmbeddingSource
+from app.models.document_embedding import (
+    DocumentEmbedding,
+    EmbeddingSource,
+    TEXT_SEARCH_CONFIG,
+    embedding_column_type,
+)
 from app.models.note import Note
+from app.services.workspace_service import WorkspaceService
+from app.services.index_version_service import IndexVersionService
+from app.services.local_vector_index_service import LocalVectorIndexService
+from app.config import settings
 from app.services.openai_client import OpenAiClient
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import re
+from app.services.embedding_cache_service import EmbeddingCacheService
+from app.services.query_cache_service import QueryCacheService
+from app.services.embedding_pipeline_service import EmbeddingPipelineService
+from app.services.chunking_service import ChunkingService, get_text_splitter
+from app.utils.note_content import extract_plain_text, load_note_content
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Largest hnsw.ef_search pgvector accepts
+HNSW_MAX_EF_SEARCH = 1000
+
 
 class VectorService:
-    _debounce_timers = {}
+    # Whether the installed pgvector has iterative index scans (>= 0.8);
+    # checked once per process
+    _iterative_scan_supported = None
 
     def __init__(self):
         self.openAiClient = OpenAiClient()
+        self.embeddingCache = EmbeddingCacheService()
+        self.embeddingPipeline = EmbeddingPipelineService()
+        self.chunker = ChunkingService(extract_plain_text)
+        self.localIndex = LocalVectorIndexService()
+        self.queryCache = QueryCacheService()
 
     def extract_plain_text_from_json(self, json_content):
         """
         Extract plain text from a structured JSON document with nested children.
         Handles any level of nesting in the document tree.
         """
-        # Convert string to JSON if needed
-        if isinstance(json_content, str):
-            try:
-                json_content = json.loads(json_content)
-            except json.JSONDecodeError:
-                return ""
-
-        # Helper function to recursively extract text from nodes
-        def extract_text_from_node(node):
-            texts = []
-
-            if not node:
-                return texts
-
-            if "type" in node and node["type"] == "table":
-                table_texts = []
-                if "content" in node and isinstance(node["content"], dict):
-                    table_content = node["content"]
-
-                    # Process rows
-                    if "rows" in table_content and isinstance(
-                        table_content["rows"], list
-                    ):
-                        for row in table_content["rows"]:
-                            row_texts = []
-
-                            # Process cells in the row
-                            if "cells" in row and isinstance(row["cells"], list):
-                                for cell in row["cells"]:
-                                    cell_text = []
-
-                                    # Extract text from cell content
-                                    if "content" in cell and isinstance(
-                                        cell["content"], list
-                                    ):
-                                        for content_item in cell["content"]:
-                                            cell_text.extend(
-                                                extract_text_from_node(content_item)
-                                            )
-
-                                    row_texts.append(" ".join(cell_text))
-
-                            # Join cells with tabs to maintain table structure
-                            if row_texts:
-                                table_texts.append(" | ".join(row_texts))
-
-                # Join rows with newlines
-                if table_texts:
-                    texts.append("\n" + "\n".join(table_texts) + "\n")
-
-            # Handle text nodes directly
-            elif "type" in node and node["type"] == "text" and "text" in node:
-                texts.append(node["text"])
-
-            # Process standard content array
-            elif "content" in node:
-                if isinstance(node["content"], list):
-                    for item in node["content"]:
-                        texts.extend(extract_text_from_node(item))
-
-            # Process children array recursively
-            if "children" in node and isinstance(node["children"], list):
-                for child in node["children"]:
-                    child_texts = extract_text_from_node(child)
-                    if child_texts:
-                        texts.extend(child_texts)
-
-            return texts
-
-        # Process all top-level nodes
-        all_texts = []
-        if isinstance(json_content, list):
-            for node in json_content:
-                all_texts.extend(extract_text_from_node(node))
-        elif isinstance(json_content, dict):
-            all_texts.extend(extract_text_from_node(json_content))
-
-        # Join all text pieces with spaces
-        result = " ".join(all_texts).strip()
-
-        # Clean up spaces but preserve newlines
-        # First collapse multiple spaces within lines
-        result = re.sub(r" +", " ", result)
-        # Then collapse multiple newlines to single newlines
-        result = re.sub(r"\n+", "\n", result)
-
-        return result
+        return extract_plain_text(json_content)
 
     def chunk_text(self, text, chunk_size=800, overlap=100):
         """
@@ -118,16 +58,59 @@ class VectorService:
         chunk_size: maximum number of characters in a chunk
         overlap: number of characters to overlap between chunks
         """
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap,
-            length_function=len,
-        )
+        splitter = get_text_splitter(chunk_size, overlap)
         # Split the text into Document objects
         documents = splitter.create_documents([text])
         # Return just the page_content of each Document as chunks
         return [doc.page_content for doc in documents]
 
+    def embed_texts(self, texts):
+        """
+        Embed texts for indexing, in order, reusing cached vectors for chunks
+        seen before. Misses go through the rate-limited async pipeline.
+        """
+        return self.embeddingCache.get_or_embed(
+            texts, self.embeddingPipeline.embed_documents
+        )
+
+    def embed_query(self, query):
+        # A single query is latency bound; call the pooled client directly
+        return self.queryCache.get_embedding(query, self.openAiClient.embed_documents)
+
+    def write_embeddings(self, rows, db: Session):
+        """
+        Insert DocumentEmbedding rows (dicts of column values) and commit.
+
+        "bulk" mode sends multi-row INSERT statements and commits once, so
+        together with any preceding delete the whole replace happens in one
+        transaction. "orm" mode keeps the original one-object-per-row path,
+        committing every 50 rows, for comparison.
+        """
+        if settings.EMBEDDING_WRITE_MODE == "orm":
+            CHUNK_SIZE = 50  # Rows written per commit
+            for i in range(0, len(rows), CHUNK_SIZE):
+                for row in rows[i : i + CHUNK_SIZE]:
+                    db.add(DocumentEmbedding(**row))
+                db.commit()
+        else:
+            page_size = settings.EMBEDDING_BULK_INSERT_ROWS
+            for i in range(0, len(rows), page_size):
+                page = [
+                    {"id": uuid.uuid4(), **row} for row in rows[i : i + page_size]
+                ]
+                db.execute(insert(DocumentEmbedding).values(page))
+
+        # Commit deletions even when nothing had to be written
+        db.commit()
+
+    def notify_index_changed(self, user_id: int):
+        """
+        Invalidation hook called after the indexers change a user's rows.
+        """
+        IndexVersionService.bump(user_id)
+        if settings.LOCAL_VECTOR_INDEX_ENABLED:
+            self.localIndex.invalidate(user_id)
+
     def index_pdf_content(
         self, note_id: str, pdf_content: str, filename: str, db: Session
     ):
@@ -137,90 +120,119 @@ class VectorService:
 
         # Chunk the content
         chunks = self.chunk_text(pdf_content)
-        CHUNK_SIZE = 50  # Adjust this based on the rate limit of your API
-
-        # Create embeddings for PDF chunks
-        for i in range(0, len(chunks), CHUNK_SIZE):
-            batch = chunks[i : i + CHUNK_SIZE]
-
-            # Ensure that the batch does not exceed the number of chunks
-            if len(batch) == 0:
-                continue  # Skip empty batches if any
-
-            # Process each chunk in the batch
-            for idx, chunk in enumerate(batch):
-                embedding = self.openAiClient.embedding_text(chunk)
-                doc_emb = DocumentEmbedding(
-                    note_id=note_id,
-                    chunk_index=idx + i,  # Adjust index for continuity
-                    content=chunk,
-                    embedding=embedding,
-                    source_type=EmbeddingSource.PDF_ATTACHMENT,
-                    source_file=filename,
-                )
-                db.add(doc_emb)
 
-            db.commit()
+        # Embed every chunk up front; the pipeline runs batches in parallel
+        # within the configured rate limits
+        embeddings = self.embed_texts(chunks)
 
-    def index_note(self, note: Note, db: Session):
-        # Remove old embeddings
-        db.query(DocumentEmbedding).filter(
-            DocumentEmbedding.note_id == note.id,
-            DocumentEmbedding.source_type == EmbeddingSource.NOTE_TEXT,
-        ).delete()
-
-        plain_text = self.extract_plain_text_from_json(note.content)
-        chunks = self.chunk_text(plain_text)
-        # Define the maximum chunk size to avoid rate limit issues
-        CHUNK_SIZE = 50  # Adjust this based on the rate limit of your API
-
-        # Process in batches
-        for i in range(0, len(chunks), CHUNK_SIZE):
-            batch = chunks[i : i + CHUNK_SIZE]
-
-            # Ensure that the batch does not exceed the number of chunks
-            if len(batch) == 0:
-                continue  # Skip empty batches if any
-
-            # Process each chunk in the batch
-            for idx, chunk in enumerate(batch):
-                embedding = self.openAiClient.embedding_text(chunk)
-                doc_emb = DocumentEmbedding(
-                    note_id=note.id,
-                    chunk_index=idx + i,  # Adjust index for continuity
-                    content=chunk,
-                    embedding=embedding,
-                    source_type=EmbeddingSource.NOTE_TEXT,
-                )
-                db.add(doc_emb)
+        note = (
+            db.query(Note.user_id, Note.workspace_id)
+            .filter(Note.id == note_id)
+            .first()
+        )
+        if not note:
+            logger.warning(f"Note {note_id} not found, skipping PDF {filename}")
+            return
 
-            db.commit()
+        # Replace rows from a previous upload of the same file
+        db.query(DocumentEmbedding).filter(
+            DocumentEmbedding.note_id == note_id,
+            DocumentEmbedding.source_type == EmbeddingSource.PDF_ATTACHMENT,
+            DocumentEmbedding.source_file == filename,
+        ).delete(synchronize_session=False)
+
+        rows = [
+            {
+                "note_id": note_id,
+                "user_id": note.user_id,
+                "workspace_id": note.workspace_id,
+                "chunk_index": idx,
+                "content": chunk,
+                "embedding": embedding,
+                "source_type": EmbeddingSource.PDF_ATTACHMENT,
+                "source_file": filename,
+            }
+            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+        ]
+        self.write_embeddings(rows, db)
+        self.notify_index_changed(note.user_id)
+
+    def hash_chunk(self, chunk: dict) -> str:
+        key = json.dumps([chunk["block_ids"], chunk["content"]], ensure_ascii=False)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
-    def debounce_index_note(self, note: Note, db_factory, wait_seconds=2):
+    def index_note(self, note: Note, db: Session):
         """
-        Debounce embedding for a note. Only the last update within wait_seconds will trigger embedding.
-        db_factory: a callable that returns a new Session (e.g., SessionLocal)
+        Incrementally reindex a note. The note is cut into structure-aware
+        chunks and each row remembers a hash of its chunk (text plus source
+        block ids). Chunks whose hash is already stored are left untouched,
+        rows whose hash no longer appears are deleted and only new chunks are
+        embedded. Chunks never cross a heading, so an edit only affects the
+        chunks of its own section.
         """
-        note_id = note.id
-
-        def run():
-            time.sleep(wait_seconds)
-            db = db_factory()
-            try:
-                # Re-fetch the latest note content from DB
-                latest_note = db.query(Note).filter(Note.id == note.id).first()
-                if latest_note:
-                    self.index_note(latest_note, db)
-            finally:
-                db.close()
-            VectorService._debounce_timers.pop(note_id, None)
-
-        # Cancel previous timer if exists
-        if note_id in VectorService._debounce_timers:
-            VectorService._debounce_timers[note_id].cancel()
-        timer = threading.Timer(wait_seconds, run)
-        VectorService._debounce_timers[note_id] = timer
-        timer.start()
+        chunks = {}
+        for chunk in self.chunker.chunk_blocks(load_note_content(note.content)):
+            chunks.setdefault(self.hash_chunk(chunk), chunk)
+
+        # The last indexed version of the note, as stored in the table
+        indexed_hashes = {
+            content_hash
+            for (content_hash,) in db.query(DocumentEmbedding.content_hash)
+            .filter(
+                DocumentEmbedding.note_id == note.id,
+                DocumentEmbedding.source_type == EmbeddingSource.NOTE_TEXT,
+            )
+            .distinct()
+        }
+
+        stale_hashes = [
+            content_hash
+            for content_hash in indexed_hashes
+            if content_hash is None or content_hash not in chunks
+        ]
+        pending = [
+            (content_hash, chunk)
+            for content_hash, chunk in chunks.items()
+            if content_hash not in indexed_hashes
+        ]
+
+        # Embed every new chunk up front; the pipeline runs batches in
+        # parallel within the configured rate limits
+        embeddings = self.embed_texts([chunk["content"] for _, chunk in pending])
+
+        # Delete and insert in one transaction, after the slow embedding calls
+        if stale_hashes:
+            stale_filter = DocumentEmbedding.content_hash.in_(
+                [content_hash for content_hash in stale_hashes if content_hash]
+            )
+            if None in stale_hashes:
+                # Rows indexed before chunk tracking existed
+                stale_filter = stale_filter | DocumentEmbedding.content_hash.is_(None)
+            db.query(DocumentEmbedding).filter(
+                DocumentEmbedding.note_id == note.id,
+                DocumentEmbedding.source_type == EmbeddingSource.NOTE_TEXT,
+                stale_filter,
+            ).delete(synchronize_session=False)
+
+        rows = [
+            {
+                "note_id": note.id,
+                "user_id": note.user_id,
+                "workspace_id": note.workspace_id,
+                "chunk_index": chunk["chunk_index"],
+                "content": chunk["content"],
+                "embedding": embedding,
+                "source_type": EmbeddingSource.NOTE_TEXT,
+                "block_id": chunk["block_ids"][0],
+                "block_ids": chunk["block_ids"],
+                "heading_path": chunk["heading_path"],
+                "content_hash": content_hash,
+            }
+            for (content_hash, chunk), embedding in zip(pending, embeddings)
+        ]
+        self.write_embeddings(rows, db)
+        if rows or stale_hashes:
+            self.notify_index_changed(note.user_id)
 
     def enrich_chunk_with_note_info(self, chunk_content, note_title, note_id):
         """
@@ -231,24 +243,326 @@ class VectorService:
         enriched_content = f"[Source: {note_title} (ID: {note_id})]\n\n{chunk_content}"
         return enriched_content
 
-    def search_similar_chunks(self, query: str, db: Session, top_k):
+    def tune_vector_search(
+        self, db: Session, filtered=False, selectivity=1.0, rows=None
+    ):
         """
-        Search for similar chunks in the database.
+        Set the ANN search breadth for the current transaction only. An HNSW
+        scan returns at most ef_search rows, so ef_search is raised to the
+        number of rows the query needs (e.g. binary rerank candidates).
+        Filtered searches enable pgvector's iterative index scans, so a
+        selective filter keeps scanning the index until enough rows match.
+        Without them, the breadth is divided by the filter's selectivity
+        (the share of all chunks in scope), so about as many matching rows
+        are visited.
         """
-        try:
-            raw_embedding = self.openAiClient.embedding_text(query)
-            stmt = (
-                select(
-                    DocumentEmbedding.content,
-                    Note.id.label("note_id"),
-                    Note.title.label("note_title"),
+        if settings.VECTOR_INDEX_TYPE == "ivfflat":
+            prefix, value = "ivfflat", settings.VECTOR_IVFFLAT_PROBES
+            name, max_value = "ivfflat.probes", settings.VECTOR_IVFFLAT_LISTS
+        else:
+            prefix, value = "hnsw", settings.VECTOR_HNSW_EF_SEARCH
+            name, max_value = "hnsw.ef_search", HNSW_MAX_EF_SEARCH
+            if rows:
+                value = min(max_value, max(value, rows))
+
+        iterative = filtered and self.uses_iterative_scan(db)
+        if filtered and not iterative and 0 < selectivity < 1:
+            value = min(max_value, math.ceil(value / selectivity))
+        db.execute(
+            text("SELECT set_config(:name, :value, true)"),
+            {"name": name, "value": str(value)},
+        )
+        if iterative:
+            db.execute(
+                text("SELECT set_config(:name, :value, true)"),
+                {
+                    "name": f"{prefix}.iterative_scan",
+                    "value": settings.VECTOR_ITERATIVE_SCAN,
+                },
+            )
+
+    def uses_iterative_scan(self, db: Session) -> bool:
+        """Whether filtered searches run with iterative index scans."""
+        if settings.VECTOR_ITERATIVE_SCAN == "off":
+            return False
+        return self.supports_iterative_scan(db)
+
+    def supports_iterative_scan(self, db: Session) -> bool:
+        """
+        Setting hnsw/ivfflat.iterative_scan fails on pgvector < 0.8, which
+        would abort the search transaction, so check the version first.
+        """
+        if VectorService._iterative_scan_supported is None:
+            version = db.execute(
+                text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            ).scalar()
+            try:
+                major, minor = (int(part) for part in version.split(".")[:2])
+                supported = (major, minor) >= (0, 8)
+            except (AttributeError, ValueError):
+                supported = False
+            if not supported:
+                logger.warning(
+                    f"pgvector {version} has no iterative index scans; "
+                    "ignoring VECTOR_ITERATIVE_SCAN"
+                )
+            VectorService._iterative_scan_supported = supported
+        return VectorService._iterative_scan_supported
+
+    def scope_search(self, stmt, db: Session, user_id, workspace_id, note_ids):
+        """
+        Restrict a search statement to the user's chunks, optionally within a
+        workspace (including its sub-workspaces) and/or a list of notes.
+        """
+        stmt = stmt.where(DocumentEmbedding.user_id == user_id)
+        if workspace_id:
+            workspace_ids = WorkspaceService.get_workspace_subtree_ids(
+                db, user_id, workspace_id
+            )
+            stmt = stmt.where(DocumentEmbedding.workspace_id.in_(workspace_ids))
+        if note_ids:
+            stmt = stmt.where(DocumentEmbedding.note_id.in_(note_ids))
+        return stmt
+
+    def count_scope(
+        self, db: Session, user_id, workspace_id, note_ids, max_rows=None
+    ) -> int:
+        """
+        Number of chunks in the search scope, counted through the btree
+        indexes and capped at max_rows when given.
+        """
+        stmt = self.scope_search(
+            select(DocumentEmbedding.id), db, user_id, workspace_id, note_ids
+        )
+        if max_rows is not None:
+            stmt = stmt.limit(max_rows)
+        return db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+
+    def scope_selectivity(self, db: Session, scoped_rows: int) -> float:
+        """
+        Share of all chunks that a scope of scoped_rows keeps, against the
+        planner's row estimate for the table.
+        """
+        total_rows = db.execute(
+            text(
+                "SELECT reltuples FROM pg_class "
+                "WHERE oid = 'document_embeddings'::regclass"
+            )
+        ).scalar()
+        # reltuples is -1 or 0 until the table has been analyzed
+        total_rows = max(total_rows or 0, scoped_rows, 1)
+        return scoped_rows / total_rows
+
+    def _base_search_stmt(self, *columns):
+        return select(
+            DocumentEmbedding.id,
+            DocumentEmbedding.content,
+            Note.id.label("note_id"),
+            Note.title.label("note_title"),
+            *columns,
+        ).join(Note, DocumentEmbedding.note_id == Note.id)
+
+    def vector_search(
+        self, query: str, db: Session, limit, user_id, workspace_id, note_ids
+    ):
+        raw_embedding = self.embed_query(query)
+        if settings.LOCAL_VECTOR_INDEX_ENABLED:
+            rows = self.local_vector_search(
+                raw_embedding, db, limit, user_id, workspace_id, note_ids
+            )
+            if rows is not None:
+                return rows
+
+        distance = DocumentEmbedding.embedding.cosine_distance(raw_embedding)
+        stmt = self.scope_search(
+            self._base_search_stmt(distance.label("distance")),
+            db,
+            user_id,
+            workspace_id,
+            note_ids,
+        )
+
+        # The ANN index yields the nearest rows of the whole table and the
+        # scope is filtered afterwards, so a small scope would come back
+        # short. Small scopes are ranked exactly instead: adding 0 hides the
+        # distance from the ANN index, so the planner finds the rows through
+        # the btree indexes and sorts them.
+        exact_scan_rows = settings.VECTOR_EXACT_SCAN_MAX_ROWS
+        scoped_rows = self.count_scope(
+            db, user_id, workspace_id, note_ids, max_rows=exact_scan_rows + 1
+        )
+        if scoped_rows <= exact_scan_rows:
+            stmt = stmt.order_by(distance + 0).limit(limit)
+            return db.execute(stmt).all()
+
+        index_rows = limit
+        if settings.VECTOR_BINARY_RERANK:
+            index_rows = limit * settings.VECTOR_BINARY_CANDIDATE_MULTIPLIER
+            stmt = stmt.where(
+                DocumentEmbedding.id.in_(
+                    self.binary_candidates(
+                        raw_embedding, db, limit, user_id, workspace_id, note_ids
+                    )
                 )
-                .join(Note, DocumentEmbedding.note_id == Note.id)
-                .order_by(DocumentEmbedding.embedding.cosine_distance(raw_embedding))
-                .limit(top_k)
             )
+        stmt = stmt.order_by(distance).limit(limit)
+
+        selectivity = 1.0
+        if not self.uses_iterative_scan(db):
+            selectivity = self.scope_selectivity(
+                db, self.count_scope(db, user_id, workspace_id, note_ids)
+            )
+        self.tune_vector_search(
+            db, filtered=True, selectivity=selectivity, rows=index_rows
+        )
+        # Relaxed iterative scans may return rows slightly out of order
+        rows = db.execute(stmt).all()
+        return sorted(rows, key=lambda row: row.distance)
 
-            results = db.execute(stmt).mappings().all()
+    def binary_candidates(
+        self, raw_embedding, db: Session, limit, user_id, workspace_id, note_ids
+    ):
+        """
+        First pass: the nearest rows by Hamming distance between
+        binary-quantized vectors, served by the bit_hamming_ops index. The
+        caller re-ranks these candidates with the stored vectors.
+        """
+        bits = BIT(settings.EMBEDDING_DIMENSIONS)
+        # Explicit cast: binary_quantize is overloaded for vector and halfvec
+        query_vector = cast(
+            bindparam("query_vector", raw_embedding, type_=embedding_column_type()),
+            embedding_column_type(),
+        )
+        hamming = cast(func.binary_quantize(DocumentEmbedding.embedding), bits).op(
+            "<~>"
+        )(cast(func.binary_quantize(query_vector), bits))
+        stmt = self.scope_search(
+            select(DocumentEmbedding.id), db, user_id, workspace_id, note_ids
+        )
+        return (
+            stmt.order_by(hamming)
+            .limit(limit * settings.VECTOR_BINARY_CANDIDATE_MULTIPLIER)
+        )
+
+    def local_vector_search(
+        self, raw_embedding, db: Session, limit, user_id, workspace_id, note_ids
+    ):
+        """
+        Rank with the in-process index and fetch the winning rows by primary
+        key. Returns None when the user is not served by the local index.
+        """
+        workspace_ids = None
+        if workspace_id:
+            workspace_ids = WorkspaceService.get_workspace_subtree_ids(
+                db, user_id, workspace_id
+            )
+        try:
+            ranked = self.localIndex.search(
+                user_id, raw_embedding, limit, db, workspace_ids, note_ids
+            )
+        except Exception as e:
+            # Fall back to pgvector rather than failing the search
+            logger.warning(f"Local vector index failed for user {user_id}: {e}")
+            return None
+        if ranked is None:
+            return None
+        if not ranked:
+            return []
+
+        ids = [UUID(embedding_id) for embedding_id, _ in ranked]
+        stmt = self._base_search_stmt().where(DocumentEmbedding.id.in_(ids))
+        rows = {row.id: row for row in db.execute(stmt).all()}
+        return [rows[embedding_id] for embedding_id in ids if embedding_id in rows]
+
+    def lexical_search(
+        self, query: str, db: Session, limit, user_id, workspace_id, note_ids
+    ):
+        """
+        Full-text search over the generated content_tsv column, ranked with
+        ts_rank_cd. Catches exact identifiers, names and code that embeddings
+        tend to miss.
+        """
+        # plainto_tsquery ANDs the words, so a natural question would only
+        # match chunks containing every one of them; OR them instead and let
+        # ts_rank_cd favour chunks that contain more of them
+        terms = cast(func.plainto_tsquery(TEXT_SEARCH_CONFIG, query), Text)
+        ts_query = func.to_tsquery(
+            TEXT_SEARCH_CONFIG, func.replace(terms, " & ", " | ")
+        )
+        rank = func.ts_rank_cd(DocumentEmbedding.content_tsv, ts_query)
+        stmt = self.scope_search(
+            self._base_search_stmt(rank.label("rank")),
+            db,
+            user_id,
+            workspace_id,
+            note_ids,
+        )
+        stmt = (
+            stmt.where(DocumentEmbedding.content_tsv.op("@@")(ts_query))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+        return db.execute(stmt).all()
+
+    def reciprocal_rank_fusion(self, rankings, k=60, key=lambda row: row.id):
+        """
+        Merge ranked result lists: each row scores sum(1 / (k + rank)) over
+        the lists it appears in. Rows are matched by key.
+        """
+        scores = {}
+        rows = {}
+        for ranking in rankings:
+            for rank, row in enumerate(ranking, start=1):
+                row_id = key(row)
+                scores[row_id] = scores.get(row_id, 0.0) + 1.0 / (k + rank)
+                rows.setdefault(row_id, row)
+        ranked = sorted(scores, key=lambda row_id: scores[row_id], reverse=True)
+        return [rows[row_id] for row_id in ranked]
+
+    def search_similar_chunks(
+        self,
+        query: str,
+        db: Session,
+        top_k,
+        user_id: int,
+        workspace_id: Optional[UUID] = None,
+        note_ids: Optional[List[UUID]] = None,
+        search_mode: Optional[str] = None,
+    ):
+        """
+        Search for relevant chunks among the user's notes, optionally limited
+        to a workspace (including its sub-workspaces) and/or a list of notes.
+        search_mode is "vector", "lexical" or "hybrid" (both, merged with
+        reciprocal rank fusion); it defaults to settings.SEARCH_MODE.
+        """
+        search_mode = search_mode or settings.SEARCH_MODE
+        scope = (user_id, workspace_id, note_ids)
+        try:
+            cache_key = self.queryCache.result_key(
+                query,
+                user_id,
+                top_k=top_k,
+                workspace_id=workspace_id,
+                note_ids=sorted(str(note_id) for note_id in note_ids or []),
+                search_mode=search_mode,
+            )
+            cached = self.queryCache.get_results(cache_key)
+            if cached is not None:
+                return [result["content"] for result in cached]
+
+            if search_mode == "lexical":
+                results = self.lexical_search(query, db, top_k, *scope)
+            elif search_mode == "hybrid":
+                candidates = top_k * settings.HYBRID_CANDIDATE_MULTIPLIER
+                results = self.reciprocal_rank_fusion(
+                    [
+                        self.vector_search(query, db, candidates, *scope),
+                        self.lexical_search(query, db, candidates, *scope),
+                    ],
+                    k=settings.HYBRID_RRF_K,
+                )[:top_k]
+            else:
+                results = self.vector_search(query, db, top_k, *scope)
 
             enriched_contents = []
             for row in results:
@@ -258,6 +572,13 @@ class VectorService:
                 )
                 enriched_contents.append(enriched_content)
 
+            self.queryCache.set_results(
+                cache_key,
+                [
+                    {"id": str(row.id), "content": content}
+                    for row, content in zip(results, enriched_contents)
+                ],
+            )
             return enriched_contents
         except Exception as e:
             # Handle the error gracefully
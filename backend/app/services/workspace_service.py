@@ -1,4 +1,5 @@
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.workspace import Workspace
 from typing import List, Dict, Any
@@ -7,6 +8,7 @@ from uuid import UUID
 from fastapi.encoders import jsonable_encoder
 
 from app.schemas.workspace_schemas import WorkspaceBody, WorkspaceSchema
+from app.services.index_version_service import IndexVersionService
 
 class WorkspaceService:
     @staticmethod
@@ -62,6 +64,8 @@ class WorkspaceService:
         workspace.parent_id = parent_id
         db.commit()
         db.refresh(workspace)
+        # Moving a workspace changes which notes a workspace-scoped search covers
+        IndexVersionService.bump(workspace.user_id)
         workspace_dict = WorkspaceSchema.model_validate(workspace).model_dump()
         return jsonable_encoder(workspace_dict)
         
@@ -99,8 +103,26 @@ class WorkspaceService:
                 delete_children(child)
             db.delete(w)
 
+        user_id = workspace.user_id
         delete_children(workspace)
         db.commit()
+        IndexVersionService.bump(user_id)
 
         return {"message": "Deleted successfully"}
-        
\ No newline at end of file
+
+    @staticmethod
+    def get_workspace_subtree_ids(db: Session, user_id: int, workspace_id: UUID) -> List[UUID]:
+        """
+        Get the ids of a workspace and all its sub-workspaces owned by the user.
+        """
+        tree = (
+            select(Workspace.id)
+            .where(Workspace.id == workspace_id, Workspace.user_id == user_id)
+            .cte("workspace_tree", recursive=True)
+        )
+        tree = tree.union_all(
+            select(Workspace.id).where(
+                Workspace.parent_id == tree.c.id, Workspace.user_id == user_id
+            )
+        )
+        return [row.id for row in db.execute(select(tree.c.id)).all()]
@@ -1,6 +1,8 @@
 import logging
 import boto3  # Ensure boto3 is installed in the Celery worker environment
 from botocore.exceptions import ClientError
+from celery.signals import worker_ready
+from redis.exceptions import LockError
 
 from app.worker import celery_app  # Import the configured celery_app from worker.py
 from app.config import settings
@@ -8,6 +10,9 @@ from app.config import settings
 # Import services (these should not configure mappers themselves)
 from app.services.pdf_service import PDFService
 from app.services.vector_service import VectorService
+from app.services.note_reindex_service import NoteReindexService
+from app.services.chat_session_service import ChatSessionService
+from app.services.openai_client import OpenAiClient
 
 # Import models for type hinting and direct use within tasks.
 # Mappers are assumed to be configured by the worker's startup sequence.
@@ -81,3 +86,126 @@ def process_pdf_from_s3(object_key: str, note_id: str):
     finally:
         db.close()
         logger.info("Database session closed")
+
+
+@celery_app.task(name="reindex_note")
+def reindex_note(note_id: str, chain: str = None):
+    """Celery task reindexing a note once its edits have gone quiet"""
+    lock = NoteReindexService.lock(note_id)
+    if not lock.acquire(blocking=False):
+        # Another worker is indexing this note; look again after the quiet period
+        NoteReindexService.reschedule(
+            note_id, settings.NOTE_REINDEX_DEBOUNCE_SECONDS, chain
+        )
+        return {"status": "busy"}
+
+    db = None
+    try:
+        remaining = NoteReindexService.claim(note_id, chain)
+        if remaining is None:
+            return {"status": "clean"}
+        if remaining > 0:
+            NoteReindexService.reschedule(note_id, remaining, chain)
+            return {"status": "debounced"}
+
+        db = SessionLocal()
+        note = db.query(Note).filter(Note.id == note_id).first()
+        if not note:
+            return {"status": "missing"}
+
+        VectorService().index_note(note, db)
+        NoteReindexService.mark_indexed(note_id)
+        logger.info(f"Reindexed note {note_id}")
+        return {"status": "success"}
+    except Exception as e:
+        logger.exception(f"Error reindexing note {note_id}: {e}")
+        NoteReindexService.mark_failed(note_id, chain)
+        return {"status": "error", "message": str(e)}
+    finally:
+        if db is not None:
+            db.close()
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Reindex lock for note {note_id} expired before release")
+
+
+@celery_app.task(name="summarize_chat_session")
+def summarize_chat_session(session_id: str):
+    """Celery task folding the older turns of a chat session into its summary"""
+    try:
+        summarized = ChatSessionService.summarize(session_id, OpenAiClient().chat)
+        return {"status": "success" if summarized else "skipped"}
+    except Exception as e:
+        logger.exception(f"Error summarising chat session {session_id}: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+@celery_app.task(name="summarize_notes")
+def summarize_notes(note_ids: list):
+    """Celery task building the cached summaries of notes that have none"""
+    from app.services.note_summary_service import NoteSummaryService
+
+    db = SessionLocal()
+    summary_service = NoteSummaryService()
+    done = 0
+    try:
+        for note_id in note_ids:
+            if db.query(Note.summary).filter(Note.id == note_id).scalar() is not None:
+                continue
+            summary_service.summarize_note(note_id, db)
+            done += 1
+        return {"status": "success", "count": done}
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Error summarising notes: {e}")
+        return {"status": "error", "message": str(e), "count": done}
+    finally:
+        db.close()
+        # Notes still without a summary may be queued again
+        NoteSummaryService.clear_queued(note_ids)
+
+
+@worker_ready.connect
+def reschedule_dirty_notes(**kwargs):
+    """Pick up notes edited while no worker was running"""
+    NoteReindexService.reschedule_all_dirty()
+
+
+@celery_app.task(name="backfill_embeddings")
+def backfill_embeddings(batch_size: int = 256):
+    """Celery task re-embedding chunks whose vectors were cleared by a storage migration"""
+    db = SessionLocal()
+    vector_service = VectorService()
+    total = 0
+
+    try:
+        while True:
+            rows = (
+                db.query(DocumentEmbedding)
+                .filter(DocumentEmbedding.embedding.is_(None))
+                .order_by(DocumentEmbedding.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            embeddings = vector_service.embed_texts([row.content for row in rows])
+            for row, embedding in zip(rows, embeddings):
+                row.embedding = embedding
+            db.commit()
+            total += len(rows)
+            logger.info(f"Backfilled {total} embeddings")
+
+        if total:
+            for (user_id,) in db.query(DocumentEmbedding.user_id).distinct():
+                if user_id is not None:
+                    vector_service.notify_index_changed(user_id)
+        return {"status": "success", "count": total}
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Error backfilling embeddings: {e}")
+        return {"status": "error", "message": str(e), "count": total}
+    finally:
+        db.close()
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+import redis
+from app.config import settings
+from app.db.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics"
+
+# Increments not yet written to Redis, and the thread that writes them
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flusher = None
+
+
+def _reset_after_fork():
+    # The parent's pending counts are its own, and its thread did not survive
+    global _pending_lock, _flusher
+    _pending.clear()
+    _pending_lock = threading.Lock()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+        flush_metrics()
+
+
+def _add(counts: dict):
+    global _flusher
+    with _pending_lock:
+        _pending.update(counts)
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_periodically, name="metrics-flush", daemon=True
+            )
+            _flusher.start()
+
+
+def flush_metrics():
+    """
+    Write the pending increments to Redis in one pipeline.
+    """
+    with _pending_lock:
+        counts = {name: amount for name, amount in _pending.items() if amount}
+        _pending.clear()
+    if not counts:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for name, amount in counts.items():
+            pipe.hincrby(METRICS_KEY, name, amount)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Failed to record {len(counts)} metrics: {e}")
+
+
+atexit.register(flush_metrics)
+
+
+def incr_metric(name: str, amount: int = 1):
+    """
+    Increment a shared counter. Counters live in Redis so that every API and
+    Celery worker process reports into the same place; increments are
+    buffered in-process and written every METRICS_FLUSH_INTERVAL_SECONDS by
+    a background thread, so callers (including the event loop) never wait
+    on Redis.
+    """
+    if not amount:
+        return
+    _add({name: amount})
+
+
+def record_duration(name: str, seconds: float):
+    """
+    Accumulate a stage duration; averages are derived from the _ms_total and
+    _count counters.
+    """
+    _add({f"{name}_ms_total": int(seconds * 1000), f"{name}_count": 1})
+
+
+def average_durations(metrics: dict) -> dict:
+    """
+    Average milliseconds per recorded stage.
+    """
+    averages = {}
+    for name, total in metrics.items():
+        if not name.endswith("_ms_total"):
+            continue
+        stage = name[: -len("_ms_total")]
+        count = metrics.get(f"{stage}_count")
+        if count:
+            averages[stage] = round(total / count, 1)
+    return averages
+
+
+def get_metrics() -> dict:
+    """
+    Return a snapshot of all shared counters, including this process's
+    pending increments.
+    """
+    flush_metrics()
+    try:
+        counters = redis_client.hgetall(METRICS_KEY)
+        return {name: int(value) for name, value in counters.items()}
+    except redis.RedisError as e:
+        logger.warning(f"Failed to read metrics: {e}")
+        return {}
+
+
+def hit_rate(metrics: dict, hits: List[str], misses: List[str]) -> Optional[float]:
+    """
+    Fraction of lookups served from cache, or None before the first lookup.
+    """
+    hit_count = sum(metrics.get(name, 0) for name in hits)
+    total = hit_count + sum(metrics.get(name, 0) for name in misses)
+    return round(hit_count / total, 4) if total else None
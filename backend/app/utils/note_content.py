@@ -0,0 +1,183 @@
+import json
+import re
+from typing import Iterable, Iterator, Tuple
+
+
+def load_note_content(json_content):
+    """
+    Parse note content stored as a JSON string. Returns None when the string
+    is not valid JSON.
+    """
+    if isinstance(json_content, str):
+        try:
+            return json.loads(json_content)
+        except json.JSONDecodeError:
+            return None
+    return json_content
+
+
+# Markers pushed on the walk stack around table parts: at _START the current
+# output length is remembered, at an end marker everything emitted since is
+# joined into the cell, row or table text
+_START = object()
+_CELL_END = object()
+_ROW_END = object()
+_TABLE_END = object()
+
+
+def _push_table(stack, node):
+    """
+    Push a table block's rows and cells, framed by markers, so that the
+    cells are walked by the same loop as everything else. Rows render as
+    " | " separated cells.
+    """
+    push = stack.append
+    table_content = node.get("content")
+    rows = table_content.get("rows") if isinstance(table_content, dict) else None
+    push(_TABLE_END)
+    if isinstance(rows, list):
+        for row in reversed(rows):
+            if not isinstance(row, dict) or not isinstance(row.get("cells"), list):
+                continue
+            push(_ROW_END)
+            for cell in reversed(row["cells"]):
+                push(_CELL_END)
+                items = cell.get("content") if isinstance(cell, dict) else None
+                if isinstance(items, list):
+                    stack.extend(reversed(items))
+                push(_START)
+            push(_START)
+    push(_START)
+
+
+def iter_text_fragments(json_content) -> Iterator[str]:
+    """
+    Yield the text fragments of a BlockNote document in document order.
+
+    The tree is walked with one explicit stack of pending nodes and table
+    markers, table cells included, so arbitrarily deep nesting never hits
+    the recursion limit. A node's own text comes first, then its inline content, then its
+    children. A table is yielded as one fragment once its last cell is done.
+    """
+    # Pending nodes, next one last, so lists are pushed reversed
+    if isinstance(json_content, list):
+        stack = json_content[::-1]
+    elif isinstance(json_content, dict):
+        stack = [json_content]
+    else:
+        return
+
+    pop = stack.pop
+    extend = stack.extend
+    # Text of the tables being walked, and where each open part started
+    out = []
+    starts = []
+
+    while stack:
+        node = pop()
+        if type(node) is dict:
+            if not node:
+                continue
+            node_type = node.get("type")
+            children = node.get("children")
+
+            # Children are visited after the node's content, so push them
+            # first
+            if children and type(children) is list:
+                extend(reversed(children))
+
+            if node_type == "text" and "text" in node:
+                if starts:
+                    out.append(node["text"])
+                else:
+                    yield node["text"]
+            elif node_type == "table":
+                _push_table(stack, node)
+            else:
+                content = node.get("content")
+                if content and type(content) is list:
+                    extend(reversed(content))
+        elif node is _START:
+            starts.append(len(out))
+        elif node is _CELL_END:
+            start = starts.pop()
+            cell = " ".join(out[start:])
+            del out[start:]
+            out.append(cell)
+        elif node is _ROW_END:
+            start = starts.pop()
+            if len(out) > start:
+                row = " | ".join(out[start:])
+                del out[start:]
+                out.append(row)
+        elif node is _TABLE_END:
+            start = starts.pop()
+            if len(out) > start:
+                table = "\n" + "\n".join(out[start:]) + "\n"
+                del out[start:]
+                if starts:
+                    out.append(table)
+                else:
+                    yield table
+
+
+_TEXT_FIELD_PATTERN = re.compile(r'"text"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def iter_serialized_text_fragments(serialized: str) -> Iterator[str]:
+    """
+    Yield the "text" values found in serialised note content, which may be
+    cut off (e.g. by SQL left()), so an excerpt can be read without loading
+    the whole document. A value cut off by the truncation is skipped.
+    """
+    for match in _TEXT_FIELD_PATTERN.finditer(serialized or ""):
+        try:
+            yield json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+
+
+def _squeeze(text: str, char: str) -> str:
+    """
+    Collapse runs of char into one. str.replace runs in C, and each pass
+    halves every run, which is several times faster than a regex scan over
+    a long note.
+    """
+    double = char * 2
+    while double in text:
+        text = text.replace(double, char)
+    return text
+
+
+def clean_text(fragments: Iterable[str]) -> str:
+    """
+    Join fragments with spaces, collapse runs of spaces and runs of newlines.
+    """
+    result = " ".join(fragments).strip()
+    return _squeeze(_squeeze(result, " "), "\n")
+
+
+def extract_plain_text(json_content) -> str:
+    """
+    Extract plain text from a structured JSON document with nested children.
+    """
+    return clean_text(iter_text_fragments(load_note_content(json_content)))
+
+
+def iter_block_texts(json_content) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (block_id, plain_text) for every top-level block that has text.
+    Blocks without an id fall back to their position in the document.
+    """
+    json_content = load_note_content(json_content)
+    if isinstance(json_content, dict):
+        json_content = [json_content]
+    if not isinstance(json_content, list):
+        return
+
+    for position, block in enumerate(json_content):
+        if not isinstance(block, dict):
+            continue
+        text = clean_text(iter_text_fragments(block))
+        if text:
+            yield str(block.get("id") or f"position:{position}"), text
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Callable
+import redis
+from app.config import settings
+from app.db.redis_client import redis_client
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_KEY_PREFIX = "single_flight"
+
+
+def request_key(kind: str, model: str, payload, **params) -> str:
+    """
+    Stable hash of an upstream request. LangChain messages are reduced to
+    (type, content) pairs.
+    """
+
+    def default(value):
+        if hasattr(value, "type") and hasattr(value, "content"):
+            return [value.type, value.content]
+        return str(value)
+
+    body = json.dumps(
+        {"kind": kind, "model": model, "params": params, "payload": payload},
+        sort_keys=True,
+        default=default,
+    )
+    return f"{kind}:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: the first caller for a key runs the
+    function and every caller that arrives while it is in flight gets the
+    same result (or exception). Calls are only shared while in flight;
+    nothing is cached afterwards.
+
+    With SINGLE_FLIGHT_REDIS_ENABLED the leader of each process also takes a
+    Redis lock for the key. Leaders in other processes then wait for the
+    published result instead of repeating the call, up to
+    SINGLE_FLIGHT_REDIS_WAIT_SECONDS, after which they call upstream
+    themselves. Results must be JSON-serialisable for this.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable):
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            incr_metric(f"single_flight_{self.name}_shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        incr_metric(f"single_flight_{self.name}_calls")
+        try:
+            if settings.SINGLE_FLIGHT_REDIS_ENABLED:
+                call.result = self._do_across_processes(key, fn)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _do_across_processes(self, key: str, fn: Callable):
+        lock_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:lock:{key}"
+        result_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:result:{key}"
+        try:
+            acquired = redis_client.set(
+                lock_key, 1, nx=True, ex=settings.SINGLE_FLIGHT_REDIS_WAIT_SECONDS
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Single-flight lock failed: {e}")
+            return fn()
+
+        if not acquired:
+            deadline = time.monotonic() + settings.SINGLE_FLIGHT_REDIS_WAIT_SECONDS
+            try:
+                while time.monotonic() < deadline:
+                    value = redis_client.get(result_key)
+                    if value is not None:
+                        incr_metric(f"single_flight_{self.name}_shared_remote")
+                        return json.loads(value)
+                    if not redis_client.exists(lock_key):
+                        break
+                    time.sleep(settings.SINGLE_FLIGHT_REDIS_POLL_SECONDS)
+            except redis.RedisError as e:
+                logger.warning(f"Single-flight wait failed: {e}")
+            return fn()
+
+        try:
+            result = fn()
+            try:
+                # Short-lived: only callers already waiting should see it
+                redis_client.set(
+                    result_key,
+                    json.dumps(result),
+                    ex=settings.SINGLE_FLIGHT_REDIS_RESULT_TTL_SECONDS,
+                )
+            except (redis.RedisError, TypeError) as e:
+                logger.warning(f"Single-flight result publish failed: {e}")
+            return result
+        finally:
+            try:
+                redis_client.delete(lock_key)
+            except redis.RedisError:
+                pass
+
+
+class _SharedStream:
+    """
+    One upstream stream fanned out to any number of subscribers. Items are
+    kept so late subscribers replay from the start. The upstream is pumped
+    by its own task, so a subscriber leaving does not stop it for the
+    others; it is cancelled once the last subscriber is gone.
+    """
+
+    def __init__(self, source: AsyncIterator, on_finish: Callable):
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.on_finish = on_finish
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator):
+        try:
+            async for item in source:
+                self.items.append(item)
+                async with self.changed:
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self.on_finish()
+            async with self.changed:
+                self.changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.items):
+                    yield self.items[index]
+                    index += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self.changed:
+                    await self.changed.wait_for(
+                        lambda: len(self.items) > index or self.finished
+                    )
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                self.task.cancel()
+                self.on_finish()
+
+
+class StreamSingleFlight:
+    """
+    Share one in-flight upstream stream between identical requests on the
+    same event loop. Subscribers each get every item from the beginning.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._streams = weakref.WeakKeyDictionary()
+
+    def subscribe(self, key: str, source_factory: Callable[[], AsyncIterator]):
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return source_factory()
+
+        streams = self._streams.setdefault(asyncio.get_running_loop(), {})
+        stream = streams.get(key)
+        if stream is None:
+            incr_metric(f"single_flight_{self.name}_calls")
+
+            def on_finish():
+                if streams.get(key) is stream:
+                    del streams[key]
+
+            stream = _SharedStream(source_factory(), on_finish)
+            streams[key] = stream
+        else:
+            incr_metric(f"single_flight_{self.name}_shared")
+        return stream.subscribe()
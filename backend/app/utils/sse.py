@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Optional
+from app.config import settings
+from app.utils.metrics import incr_metric
+
+logger = logging.getLogger(__name__)
+
+# Protocol 1 re-sends the cumulative answer in every event (what the original
+# frontend expects); protocol 2 sends only the new text
+SSE_PROTOCOL_CUMULATIVE = 1
+SSE_PROTOCOL_DELTA = 2
+
+
+# SSE comment line; clients ignore it, proxies see a live connection
+SSE_HEARTBEAT = ": heartbeat\n\n"
+
+# Yielded by _relay() when its source has been silent for the timeout
+_IDLE = object()
+
+
+def sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class AnswerStreamEncoder:
+    """
+    Turn streamed answer tokens into SSE events for a protocol version.
+
+    In delta mode tokens are buffered into frames that are flushed once they
+    reach SSE_DELTA_MAX_CHARS or SSE_DELTA_MAX_INTERVAL_MS has passed since
+    the last frame; encode_answer() also flushes on that interval while the
+    model is silent. The final event carries the full answer with its SHA-256
+    so clients can check the reassembled text.
+    """
+
+    def __init__(self, protocol_version: int = SSE_PROTOCOL_CUMULATIVE):
+        self.protocol_version = protocol_version
+        self.answer_parts: List[str] = []
+        self.pending: List[str] = []
+        self.pending_chars = 0
+        self.last_flush = time.monotonic()
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.answer_parts)
+
+    def flush_timeout(self) -> Optional[float]:
+        """
+        Seconds until buffered text is due to be flushed, or None when
+        nothing is buffered.
+        """
+        if not self.pending:
+            return None
+        elapsed = time.monotonic() - self.last_flush
+        return max(settings.SSE_DELTA_MAX_INTERVAL_MS / 1000 - elapsed, 0.0)
+
+    def flush(self) -> Optional[str]:
+        """
+        Event carrying the buffered delta text, if any.
+        """
+        if not self.pending:
+            return None
+        delta = "".join(self.pending)
+        self.pending = []
+        self.pending_chars = 0
+        self.last_flush = time.monotonic()
+        return sse_event({"delta": delta, "done": False})
+
+    def add(self, text: str) -> Optional[str]:
+        """
+        Record a token; returns the event to send now, if any.
+        """
+        self.answer_parts.append(text)
+        if self.protocol_version != SSE_PROTOCOL_DELTA:
+            return sse_event({"answer": self.answer, "done": False})
+
+        self.pending.append(text)
+        self.pending_chars += len(text)
+        if (
+            self.pending_chars >= settings.SSE_DELTA_MAX_CHARS
+            or (time.monotonic() - self.last_flush) * 1000
+            >= settings.SSE_DELTA_MAX_INTERVAL_MS
+        ):
+            return self.flush()
+        return None
+
+    def finish(self) -> List[str]:
+        """
+        Events closing the stream: any buffered delta, then the final event.
+        """
+        answer = self.answer
+        if self.protocol_version != SSE_PROTOCOL_DELTA:
+            return [sse_event({"answer": answer, "done": True})]
+
+        events = [event for event in [self.flush()] if event]
+        events.append(
+            sse_event(
+                {
+                    "answer": answer,
+                    "done": True,
+                    "checksum": hashlib.sha256(answer.encode("utf-8")).hexdigest(),
+                }
+            )
+        )
+        return events
+
+
+async def _relay(
+    source: AsyncIterator, timeout: Callable[[], Optional[float]]
+) -> AsyncIterator:
+    """
+    Relay items from source, yielding _IDLE whenever timeout() seconds pass
+    without one (None waits indefinitely). The source is advanced in its own
+    task, so a timeout never interrupts it.
+
+    If the relay is left early (cancelled or closed) the source is cancelled
+    right away instead of being consumed to the end.
+    """
+    iterator = source.__aiter__()
+    pending = None
+    exhausted = False
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=timeout())
+            if not done:
+                yield _IDLE
+                continue
+
+            finished, pending = pending, None
+            try:
+                item = finished.result()
+            except StopAsyncIteration:
+                exhausted = True
+                return
+            except BaseException:
+                exhausted = True
+                raise
+            yield item
+    finally:
+        if not exhausted:
+            # Only plain calls here: awaiting inside a cancelled scope fails
+            if pending is not None and not pending.done():
+                pending.cancel()
+            else:
+                asyncio.ensure_future(iterator.aclose())
+
+
+async def encode_answer(
+    contents: AsyncIterator[str], encoder: AnswerStreamEncoder
+) -> AsyncIterator[str]:
+    """
+    SSE events for streamed answer text. Buffered delta text is flushed once
+    SSE_DELTA_MAX_INTERVAL_MS has passed even if the model pauses, so frames
+    are bounded in time and not only by the next token.
+    """
+    async for content in _relay(contents, encoder.flush_timeout):
+        event = encoder.flush() if content is _IDLE else encoder.add(content)
+        if event:
+            yield event
+
+
+async def with_heartbeats(
+    events: AsyncIterator[str], interval: float = None
+) -> AsyncIterator[str]:
+    """
+    Relay SSE events, sending a heartbeat comment whenever the source has
+    been silent for SSE_HEARTBEAT_SECONDS, so a dead connection shows up as
+    a failed write within that interval even behind buffering proxies.
+
+    When the client goes away (the response is cancelled or its body
+    iterator closed) the upstream generator is cancelled right away instead
+    of being consumed to the end, which aborts the LLM request.
+    """
+    interval = interval or settings.SSE_HEARTBEAT_SECONDS
+    relay = _relay(events, lambda: interval)
+    abandoned = False
+    try:
+        async for event in relay:
+            yield SSE_HEARTBEAT if event is _IDLE else event
+        incr_metric("chat_streams_completed")
+    except (asyncio.CancelledError, GeneratorExit):
+        abandoned = True
+        raise
+    finally:
+        if abandoned:
+            incr_metric("chat_streams_abandoned")
+            logger.info("Chat client disconnected; cancelling generation")
+            # Only plain calls here: awaiting inside a cancelled scope fails.
+            # A relay closed at a yield still has to cancel the source
+            asyncio.ensure_future(relay.aclose())
@@ -0,0 +1,41 @@
+import hashlib
+from functools import lru_cache
+import tiktoken
+from app.config import settings
+from app.utils.lru_cache import LRUCache
+
+# Below this length hashing costs about as much as encoding
+MEMOIZE_MIN_CHARS = 64
+
+_token_counts = LRUCache(settings.TOKEN_COUNT_CACHE_MAX_ENTRIES)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = None):
+    """
+    Resolve the tiktoken encoding for a model once per process.
+    """
+    try:
+        return tiktoken.encoding_for_model(model or settings.CHAT_MODEL)
+    except KeyError:
+        # Fall back to cl100k_base for newer models not explicitly in tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """
+    Number of tokens in text. Counts are memoised by content hash, so chat
+    history replayed on every turn is only tokenised once.
+    """
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if len(text) < MEMOIZE_MIN_CHARS:
+        return len(encoding.encode(text))
+
+    key = (encoding.name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    count = _token_counts.get(key)
+    if count is None:
+        count = len(encoding.encode(text))
+        _token_counts.set(key, count)
+    return count
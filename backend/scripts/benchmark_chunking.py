@@ -0,0 +1,70 @@
+"""
+Throughput of the structure-aware chunker against the original flat-text
+splitter on synthetic notes.
+
+"flat" is the path before ChunkingService: extract the whole note as one
+string and split it with a RecursiveCharacterTextSplitter built for every
+call. "structured" is ChunkingService.chunk_blocks on the block tree. Both
+use chunk_size=800 and overlap=100.
+
+    python -m scripts.benchmark_chunking --notes 200 --blocks 50 500
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.services.chunking_service import ChunkingService
+from app.utils.note_content import extract_plain_text
+from scripts.synthetic_notes import large_note
+
+
+def flat_chunks(content):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=800, chunk_overlap=100, length_function=len
+    )
+    documents = splitter.create_documents([extract_plain_text(content)])
+    return [document.page_content for document in documents]
+
+
+def structured_chunks(chunker: ChunkingService, content):
+    return [chunk["content"] for chunk in chunker.chunk_blocks(content)]
+
+
+def run(name, chunk_fn, notes, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = [chunk_fn(note) for note in notes]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    sizes = [len(chunk) for note_chunks in chunks for chunk in note_chunks]
+    print(
+        f"  {name:10} {len(notes) / best:9.1f} notes/s {len(sizes) / best:10.0f} chunks/s "
+        f"{len(sizes) / len(notes):7.1f} chunks/note "
+        f"{statistics.mean(sizes) if sizes else 0:7.0f} chars/chunk"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--blocks", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunker = ChunkingService(extract_plain_text)
+    for blocks in args.blocks:
+        notes = [large_note(rng, blocks, nesting=3) for _ in range(args.notes)]
+        size = sum(len(json.dumps(note)) for note in notes) / len(notes) / 1024
+        print(f"{args.notes} notes of {blocks} blocks ({size:.0f} KiB JSON each)")
+        run("flat", flat_chunks, notes, args.repeat)
+        run("structured", lambda note: structured_chunks(chunker, note), notes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
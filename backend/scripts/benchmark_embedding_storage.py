@@ -0,0 +1,174 @@
+"""
+Index size, memory and recall@k of the embedding storage settings: reduced
+dimensions, vector vs halfvec columns, and the binary-quantized first pass
+with full-precision re-ranking.
+
+Block texts of synthetic notes and their questions are embedded once at
+--full-dimensions; reduced dimensions are derived by truncating and
+re-normalising, which is how text-embedding-3 shortens vectors. Each setting
+is loaded into a temporary table with an HNSW index on the database from
+DATABASE_URL (pgvector >= 0.7 for halfvec and binary_quantize). Recall@k is
+measured against exact full-dimension cosine search. "RAM" is what has to
+stay cached for searches to avoid disk reads: the HNSW index, or for the
+in-process NumPy index the matrix itself.
+
+    python -m scripts.benchmark_embedding_storage --dimensions 1536 768 256
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+from sqlalchemy import text
+from app.config import settings
+from app.db.database import engine
+from app.utils.note_content import iter_block_texts
+from scripts.synthetic_notes import hashed_embedding, percentile, random_note
+
+
+def embed(texts, args):
+    if args.embeddings == "hashed":
+        return np.asarray(
+            [hashed_embedding(t, args.full_dimensions) for t in texts], dtype=np.float32
+        )
+    # The registry builds its embedder with the configured dimensions
+    settings.EMBEDDING_DIMENSIONS = args.full_dimensions
+    from app.services.embedding_cache_service import EmbeddingCacheService
+    from app.services.openai_client import OpenAiClient
+
+    return np.asarray(
+        EmbeddingCacheService(dimensions=args.full_dimensions).get_or_embed(
+            texts, OpenAiClient().embed_documents
+        ),
+        dtype=np.float32,
+    )
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    vectors = vectors[:, :dimensions]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def literal(vector) -> str:
+    return "[" + ",".join(f"{value:.7g}" for value in vector) + "]"
+
+
+def measure(conn, storage, dimensions, binary, corpus, queries, truth, args):
+    column = f"{storage}({dimensions})"
+    ops = "halfvec_cosine_ops" if storage == "halfvec" else "vector_cosine_ops"
+    conn.execute(text("DROP TABLE IF EXISTS bench_vectors"))
+    conn.execute(
+        text(f"CREATE TEMP TABLE bench_vectors (id integer PRIMARY KEY, embedding {column})")
+    )
+    conn.execute(
+        text(f"INSERT INTO bench_vectors VALUES (:id, CAST(:embedding AS {column}))"),
+        [{"id": i, "embedding": literal(v)} for i, v in enumerate(corpus)],
+    )
+    started = time.perf_counter()
+    if binary:
+        index = f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops"
+    else:
+        index = f"embedding {ops}"
+    conn.execute(
+        text(
+            f"CREATE INDEX bench_vectors_index ON bench_vectors USING hnsw ({index}) "
+            f"WITH (m = {settings.VECTOR_HNSW_M}, "
+            f"ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION})"
+        )
+    )
+    build_seconds = time.perf_counter() - started
+    conn.execute(text("ANALYZE bench_vectors"))
+    index_bytes, table_bytes = conn.execute(
+        text(
+            "SELECT pg_relation_size('bench_vectors_index'), pg_table_size('bench_vectors')"
+        )
+    ).one()
+
+    ef_search = max(settings.VECTOR_HNSW_EF_SEARCH, args.k * args.candidates)
+    conn.execute(text(f"SET hnsw.ef_search = {ef_search}"))
+    query_vector = f"CAST(:query AS {column})"
+    if binary:
+        sql = (
+            "SELECT id FROM (SELECT id, embedding FROM bench_vectors ORDER BY "
+            f"binary_quantize(embedding)::bit({dimensions}) <~> "
+            f"binary_quantize({query_vector})::bit({dimensions}) LIMIT :candidates) c "
+            f"ORDER BY embedding <=> {query_vector} LIMIT :k"
+        )
+    else:
+        sql = f"SELECT id FROM bench_vectors ORDER BY embedding <=> {query_vector} LIMIT :k"
+
+    hits = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        ids = conn.execute(
+            text(sql),
+            {"query": literal(query), "k": args.k, "candidates": args.k * args.candidates},
+        ).scalars().all()
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(ids) & set(expected))
+
+    local_bytes = len(corpus) * dimensions * (2 if storage == "halfvec" else 4)
+    name = f"{storage}{' +binary' if binary else ''}"
+    print(
+        f"{dimensions:>5} {name:15} {table_bytes / 2**20:9.1f} {index_bytes / 2**20:9.1f} "
+        f"{local_bytes / 2**20:9.1f} {build_seconds:7.1f} "
+        f"{hits / (len(queries) * args.k):9.3f} {percentile(latencies, 50):7.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=400)
+    parser.add_argument("--full-dimensions", type=int, default=1536)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 768, 512, 256])
+    parser.add_argument("--storage", nargs="+", default=["vector", "halfvec"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=settings.VECTOR_BINARY_CANDIDATE_MULTIPLIER,
+        help="binary first-pass candidates per result",
+    )
+    parser.add_argument("--embeddings", choices=["openai", "hashed"], default="openai")
+    parser.add_argument("--seed", type=int, default=14)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts, questions = [], []
+    for _ in range(args.notes):
+        _, content, facts = random_note(rng, facts=2)
+        texts.extend(block_text for _, block_text in iter_block_texts(content))
+        questions.extend(question for _, question in facts)
+    texts = list(dict.fromkeys(texts))
+    vectors = embed(texts + questions, args)
+    corpus, queries = vectors[: len(texts)], vectors[len(texts) :]
+    # Exact full-precision, full-dimension neighbours are the reference
+    truth = [np.argsort(-(corpus @ query))[: args.k].tolist() for query in queries]
+    print(f"{len(texts)} vectors, {len(questions)} queries, recall@{args.k}\n")
+
+    print(
+        f"{'dims':>5} {'storage':15} {'table MiB':>9} {'index MiB':>9} "
+        f"{'local MiB':>9} {'build s':>7} {'recall':>9} {'p50 ms':>7}"
+    )
+    with engine.connect() as conn:
+        for dimensions in args.dimensions:
+            for storage in args.storage:
+                for binary in (False, True):
+                    with conn.begin():
+                        measure(
+                            conn,
+                            storage,
+                            dimensions,
+                            binary,
+                            truncate(corpus, dimensions),
+                            truncate(queries, dimensions),
+                            truth,
+                            args,
+                        )
+        with conn.begin():
+            conn.execute(text("DROP TABLE IF EXISTS bench_vectors"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Rows/second of the two DocumentEmbedding write paths ("bulk" multi-row
+INSERTs in one transaction, "orm" one object per row) on the database from
+DATABASE_URL, which needs pgvector and the migrations applied.
+
+Rows carry random vectors of EMBEDDING_DIMENSIONS and are written for a
+temporary user through VectorService.write_embeddings, then deleted.
+
+    python -m scripts.benchmark_embedding_writes --rows 1000 5000
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+from app.config import settings
+from app.db.database import SessionLocal
+from app.models.document_embedding import DocumentEmbedding, EmbeddingSource
+from app.models.note import Note
+from app.services.vector_service import VectorService
+from scripts.synthetic_notes import FILLER, temporary_user
+
+
+def make_rows(rng: np.random.Generator, note, count: int):
+    vectors = rng.standard_normal((count, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        {
+            "note_id": note.id,
+            "user_id": note.user_id,
+            "workspace_id": note.workspace_id,
+            "chunk_index": index,
+            "content": " ".join(random.sample(FILLER, 4)),
+            "embedding": vector.tolist(),
+            "source_type": EmbeddingSource.NOTE_TEXT,
+            "block_id": str(index),
+            "block_ids": [str(index)],
+            "heading_path": [],
+            "content_hash": f"{index:064x}",
+        }
+        for index, vector in enumerate(vectors)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--modes", nargs="+", default=["orm", "bulk"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(8)
+    vs = VectorService()
+    db = SessionLocal()
+    try:
+        with temporary_user(db) as (user, workspace):
+            note = Note(
+                title="Benchmark", content=[], user_id=user.id, workspace_id=workspace.id
+            )
+            db.add(note)
+            db.commit()
+
+            print(f"{'rows':>7} {'mode':6} {'best s':>8} {'rows/s':>10}")
+            for count in args.rows:
+                rows = make_rows(rng, note, count)
+                for mode in args.modes:
+                    settings.EMBEDDING_WRITE_MODE = mode
+                    best = None
+                    for _ in range(args.repeat):
+                        # Same shape as an index_note replace: delete, then write
+                        started = time.perf_counter()
+                        db.query(DocumentEmbedding).filter(
+                            DocumentEmbedding.note_id == note.id
+                        ).delete(synchronize_session=False)
+                        vs.write_embeddings([dict(row) for row in rows], db)
+                        elapsed = time.perf_counter() - started
+                        best = elapsed if best is None else min(best, elapsed)
+                        db.expunge_all()
+                    print(f"{count:7} {mode:6} {best:8.3f} {count / best:10.0f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
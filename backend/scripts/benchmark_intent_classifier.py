@@ -0,0 +1,218 @@
+"""
+How many chat turns the local intent classifier resolves without the LLM
+router, how often those local decisions are wrong, and the time to first
+token that saves.
+
+Turns come from a labelled synthetic set: general questions and small talk,
+questions about facts in the user's notes, single-note and all-notes summary
+requests, and history-dependent follow-ups that should be left to the
+router. None of them are among the classifier's own examples, and no
+message is repeated. The query cache is disabled, so every turn pays for
+its message embedding as a new message would. Turns the classifier cannot
+decide pay that embedding before the router (and the speculative retrieval
+started alongside it) can begin; that extra latency is reported separately.
+Router latency is measured live on a sample of turns through
+OpenAiClient.detect_if_we_need_to_search_in_vector_db, or taken from
+--router-ms. Needs an OpenAI key for embeddings.
+
+    python -m scripts.benchmark_intent_classifier --turns 400
+    python -m scripts.benchmark_intent_classifier --router-ms 650
+"""
+
+import argparse
+import random
+import time
+import uuid
+from collections import Counter
+from langchain.schema import SystemMessage
+from app.config import settings
+from app.services.intent_classifier_service import (
+    SMALL_TALK_PATTERN,
+    IntentClassifierService,
+)
+from app.services.openai_client import OpenAiClient
+from app.services.vector_service import VectorService
+from scripts.synthetic_notes import CITIES, DAYS, PEOPLE, PROJECTS, percentile, random_fact
+
+GENERAL = [
+    "How many days are in a leap year?",
+    "Explain recursion to a beginner",
+    "How do I center a div in CSS?",
+    "What is the boiling point of water in Fahrenheit?",
+    "Suggest a weekend trip near {city}",
+    "Convert 5 miles to kilometres",
+    "What is a hash map?",
+    "Write a haiku about {day} mornings",
+    "Hi",
+    "Thanks!",
+    "hello there",
+    "ok cool",
+]
+SEARCH = [
+    "What did I write about {project}?",
+    "Find my notes on the {project} migration",
+    "Did I note who owns {project}?",
+    "What did {person} say in my notes about the offsite?",
+]
+SUMMARIZE_NOTE = [
+    "Summarize this note",
+    "tl;dr of the current note",
+    "Can you give me the key points of this note?",
+    "Give me a quick recap of the note please",
+]
+SUMMARIZE_ALL = [
+    "Summarize all my notes",
+    "Give me a recap of every note I have",
+    "What are all my notes about?",
+    "Summarize the entire set of notes in my workspace",
+]
+FOLLOW_UPS = [
+    "And what about that one?",
+    "Can you expand on it?",
+    "Who owns it then?",
+    "Say more about those",
+]
+# Wording around a request that leaves its intent unchanged, so that fixed
+# templates still yield distinct messages
+LEAD_INS = ["", "Quick question: ", "One more thing. ", "Hey assistant, "]
+TRAILERS = ["", " Thanks!", " (briefly)"]
+
+
+def fill(rng: random.Random, template: str) -> str:
+    return template.format(
+        project=rng.choice(PROJECTS),
+        person=rng.choice(PEOPLE),
+        day=rng.choice(DAYS),
+        city=rng.choice(CITIES),
+    )
+
+
+def vary(rng: random.Random, message: str) -> str:
+    if SMALL_TALK_PATTERN.match(message):
+        return message
+    return f"{rng.choice(LEAD_INS)}{message}{rng.choice(TRAILERS)}"
+
+
+def labelled_turns(rng: random.Random, count: int):
+    """
+    Yield up to count (message, has_history, note_ids, expected type, kind)
+    with distinct messages.
+    """
+    seen = set()
+    for message, *turn in candidate_turns(rng, count * 50):
+        message = vary(rng, message)
+        if message in seen:
+            continue
+        seen.add(message)
+        yield (message, *turn)
+        if len(seen) == count:
+            return
+
+
+def candidate_turns(rng: random.Random, count: int):
+    for _ in range(count):
+        kind = rng.choice(["general", "search", "fact", "note", "note_id", "all", "follow_up"])
+        has_history = rng.random() < 0.5
+        if kind == "general":
+            yield fill(rng, rng.choice(GENERAL)), has_history, None, "general", kind
+        elif kind == "search":
+            yield fill(rng, rng.choice(SEARCH)), has_history, None, "search", kind
+        elif kind == "fact":
+            yield random_fact(rng)[1], has_history, None, "search", kind
+        elif kind == "note":
+            # Asked from a note page, which sends the current note as a hint
+            note_ids = [uuid.uuid4()]
+            yield rng.choice(SUMMARIZE_NOTE), has_history, note_ids, "summarize_note", kind
+        elif kind == "note_id":
+            yield f"Summarize note {uuid.uuid4()}", has_history, None, "summarize_note", kind
+        elif kind == "all":
+            yield rng.choice(SUMMARIZE_ALL), has_history, None, "summarize_all_notes", kind
+        else:
+            yield rng.choice(FOLLOW_UPS), True, None, "search", kind
+
+
+def router_latency(turns, samples: int) -> float:
+    client = OpenAiClient()
+    latencies = []
+    for message, *_ in turns[:samples]:
+        started = time.perf_counter()
+        client.detect_if_we_need_to_search_in_vector_db([SystemMessage(content="")], message)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--router-ms", type=float, help="assumed router latency")
+    parser.add_argument("--router-samples", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.INTENT_CLASSIFIER_ENABLED = True
+    settings.QUERY_CACHE_ENABLED = False
+    turns = list(labelled_turns(random.Random(args.seed), args.turns))
+    if len(turns) < args.turns:
+        print(f"Only {len(turns)} distinct messages could be generated")
+    classifier = IntentClassifierService(VectorService().embed_query)
+    # Centroids are built once per process; keep that out of the timings
+    classifier._get_centroids()
+
+    resolved, correct, total = Counter(), Counter(), Counter()
+    paths = Counter()
+    latencies = []
+    fallback_latencies = []
+    for message, has_history, note_ids, expected, kind in turns:
+        history = [{"role": "user", "content": "earlier question"}] if has_history else None
+        started = time.perf_counter()
+        decision = classifier.classify(message, history, note_ids)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        total[kind] += 1
+        if decision is None:
+            paths["router"] += 1
+            fallback_latencies.append(latencies[-1])
+            continue
+        resolved[kind] += 1
+        correct[kind] += decision["type"] == expected
+        by_rules = classifier.classify_by_rules(message, has_history, note_ids) is not None
+        paths["rules" if by_rules else "embedding"] += 1
+
+    print(f"{'kind':10} {'turns':>6} {'local':>7} {'correct':>8}")
+    for kind in total:
+        accuracy = f"{correct[kind] / resolved[kind]:8.3f}" if resolved[kind] else f"{'-':>8}"
+        print(f"{kind:10} {total[kind]:6} {resolved[kind] / total[kind]:7.3f} {accuracy}")
+
+    local_total = sum(resolved.values())
+    local_fraction = local_total / len(turns)
+    print(
+        f"\nResolved locally: {local_fraction:.3f} "
+        f"(rules {paths['rules']}, embedding {paths['embedding']}, router {paths['router']}); "
+        f"misrouted {local_total - sum(correct.values())}"
+    )
+
+    local_ms = sum(latencies) / len(latencies)
+    if args.router_ms is not None:
+        router_ms, source = args.router_ms, "assumed"
+    else:
+        router_ms, source = router_latency(turns, args.router_samples), "measured p50"
+    print(
+        f"Local classifier: p50 {percentile(latencies, 50):.1f} ms, "
+        f"p95 {percentile(latencies, 95):.1f} ms, mean {local_ms:.1f} ms"
+    )
+    print(f"LLM router: {router_ms:.0f} ms ({source})")
+    if fallback_latencies:
+        print(
+            f"Added before the router on the {len(fallback_latencies)} undecided "
+            f"turns: p50 {percentile(fallback_latencies, 50):.1f} ms, "
+            f"p95 {percentile(fallback_latencies, 95):.1f} ms"
+        )
+    # Every turn pays for the local attempt; resolved ones skip the router
+    print(
+        f"Mean time to first token saved per turn: "
+        f"{local_fraction * router_ms - local_ms:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Upstream calls made for bursts of concurrent requests with single-flight off
+and on, to show that calls scale with distinct requests rather than total
+requests.
+
+Each burst sends --requests concurrent requests spread over --distinct
+different keys (built with request_key, as the OpenAI client does).
+"blocking" goes through SingleFlight from a thread per request, "stream"
+through StreamSingleFlight from a task per request, each against a stand-in
+upstream that counts its calls and sleeps --upstream-ms (streams emit
+--stream-items items over that time). Every subscriber's stream is checked
+to be complete. Only the in-process layer is measured.
+
+    python -m scripts.benchmark_single_flight --requests 50 --distinct 1 5 50
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.utils.single_flight import SingleFlight, StreamSingleFlight, request_key
+
+
+def keys(requests: int, distinct: int):
+    return [
+        request_key("chat", settings.CHAT_MODEL, f"question {index % distinct}")
+        for index in range(requests)
+    ]
+
+
+def blocking_burst(burst_keys, upstream_seconds: float):
+    flight = SingleFlight("benchmark")
+    calls = 0
+    calls_lock = threading.Lock()
+    barrier = threading.Barrier(len(burst_keys))
+
+    def upstream(key):
+        nonlocal calls
+        with calls_lock:
+            calls += 1
+        time.sleep(upstream_seconds)
+        return key
+
+    def request(key):
+        barrier.wait()
+        return flight.do(key, lambda: upstream(key))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(burst_keys)) as executor:
+        results = list(executor.map(request, burst_keys))
+    elapsed = time.perf_counter() - started
+    if results != burst_keys:
+        sys.exit("blocking: a caller received another request's result")
+    return calls, elapsed
+
+
+async def stream_burst(burst_keys, upstream_seconds: float, items: int):
+    flight = StreamSingleFlight("benchmark")
+    calls = 0
+
+    async def upstream(key):
+        nonlocal calls
+        calls += 1
+        for index in range(items):
+            await asyncio.sleep(upstream_seconds / items)
+            yield f"{key}:{index}"
+
+    async def request(key):
+        return [item async for item in flight.subscribe(key, lambda: upstream(key))]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(request(key) for key in burst_keys))
+    elapsed = time.perf_counter() - started
+    for key, received in zip(burst_keys, results):
+        if received != [f"{key}:{index}" for index in range(items)]:
+            sys.exit("stream: a subscriber received an incomplete stream")
+    return calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--distinct", type=int, nargs="+", default=[1, 5, 50])
+    parser.add_argument("--upstream-ms", type=float, default=200)
+    parser.add_argument("--stream-items", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.SINGLE_FLIGHT_REDIS_ENABLED = False
+    upstream_seconds = args.upstream_ms / 1000
+    print(f"{args.requests} concurrent requests per burst\n")
+    print(f"{'path':9} {'distinct':>8} {'enabled':>8} {'calls':>6} {'wall ms':>8}")
+    for distinct in args.distinct:
+        burst_keys = keys(args.requests, distinct)
+        for enabled in (False, True):
+            settings.SINGLE_FLIGHT_ENABLED = enabled
+            calls, elapsed = blocking_burst(burst_keys, upstream_seconds)
+            print(
+                f"{'blocking':9} {distinct:8} {str(enabled):>8} {calls:6} "
+                f"{elapsed * 1000:8.0f}"
+            )
+            calls, elapsed = asyncio.run(
+                stream_burst(burst_keys, upstream_seconds, args.stream_items)
+            )
+            print(
+                f"{'stream':9} {distinct:8} {str(enabled):>8} {calls:6} "
+                f"{elapsed * 1000:8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Time to first answer event of RAGChatbotService.answer with speculative
+retrieval off and on, for the three outcomes of the LLM router.
+
+The router, the search and the answer stream are replaced by stand-ins: the
+router sleeps for --router-ms, a search for --search-ms, and the stream
+yields its first event at once. The numbers therefore show how much of the
+search hides behind the router rather than the cost of either. The local
+intent classifier is disabled so every turn goes through the router.
+Outcomes: "same" (search for the raw message: the speculative result is
+used), "refined" (search for a different keyword: a second search runs and
+is fused with the speculative one) and "general" (no search: the
+speculative one is discarded).
+
+    python -m scripts.benchmark_speculative_retrieval --router-ms 600 --search-ms 150
+"""
+
+import argparse
+import json
+import sys
+import time
+from app.config import settings
+from app.services.openai_client import OpenAiClient
+from app.services.rag_chatbot_service import RAGChatbotService
+from app.services.vector_service import VectorService
+from scripts.synthetic_notes import FILLER, percentile
+
+MESSAGE = "Who is giving the talk about where Apollo is heading?"
+DECISIONS = {
+    "same": {"type": "search", "query": MESSAGE},
+    "refined": {"type": "search", "query": "Apollo roadmap presentation"},
+    "general": {"type": "general"},
+}
+FIRST_EVENT = "data: first\n\n"
+
+
+def install_stand_ins(args, outcome: dict):
+    def detect_if_we_need_to_search_in_vector_db(self, messages_for_streams, user_message):
+        time.sleep(args.router_ms / 1000)
+        return json.dumps(outcome["decision"])
+
+    def search_similar_chunks(self, query, db, top_k=2, **scope):
+        time.sleep(args.search_ms / 1000)
+        return [f"[{query}] {FILLER[i % len(FILLER)]}" for i in range(top_k)]
+
+    def chat_stream(self, messages, on_complete=None, **kwargs):
+        yield FIRST_EVENT
+
+    OpenAiClient.detect_if_we_need_to_search_in_vector_db = (
+        detect_if_we_need_to_search_in_vector_db
+    )
+    OpenAiClient.chat_stream = chat_stream
+    VectorService.search_similar_chunks = search_similar_chunks
+
+
+def run(service: RAGChatbotService, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stream = service.answer(MESSAGE, "benchmark-user", None, None)
+        event = next(stream)
+        latencies.append((time.perf_counter() - started) * 1000)
+        stream.close()
+        if event != FIRST_EVENT:
+            # answer() reports failures as an SSE event instead of raising
+            sys.exit(f"answer() failed: {event.strip()}")
+    return percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--router-ms", type=float, default=600)
+    parser.add_argument("--search-ms", type=float, default=150)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    settings.INTENT_CLASSIFIER_ENABLED = False
+    outcome = {}
+    install_stand_ins(args, outcome)
+    service = RAGChatbotService()
+
+    print(
+        f"router {args.router_ms:.0f} ms, search {args.search_ms:.0f} ms, "
+        f"p50 of {args.repeat} runs\n"
+    )
+    print(f"{'outcome':8} {'off ms':>8} {'on ms':>8} {'saved ms':>9}")
+    for name, decision in DECISIONS.items():
+        outcome["decision"] = decision
+        settings.SPECULATIVE_RETRIEVAL_ENABLED = False
+        off = run(service, args.repeat)
+        settings.SPECULATIVE_RETRIEVAL_ENABLED = True
+        on = run(service, args.repeat)
+        print(f"{name:8} {off:8.0f} {on:8.0f} {off - on:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
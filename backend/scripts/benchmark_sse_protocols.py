@@ -0,0 +1,95 @@
+"""
+Bytes and CPU per streamed answer for SSE protocol 1 (cumulative answer in
+every event) and protocol 2 (buffered deltas plus a checksummed final event).
+
+Synthetic answers are fed token by token through AnswerStreamEncoder, the
+encoder both chat endpoints use. Token arrival is paced on a virtual clock
+(--token-ms apart) so delta framing follows SSE_DELTA_MAX_CHARS and
+SSE_DELTA_MAX_INTERVAL_MS as it would live, without sleeping. "gzip" is the
+size of the whole event stream compressed, for deployments behind a
+compressing proxy. CPU is process time for encoding only.
+
+    python -m scripts.benchmark_sse_protocols --tokens 200 800 --token-ms 20
+"""
+
+import argparse
+import gzip
+import random
+import time
+from app.utils import sse
+from app.utils.sse import SSE_PROTOCOL_CUMULATIVE, SSE_PROTOCOL_DELTA, AnswerStreamEncoder
+from scripts.synthetic_notes import FILLER
+
+
+class VirtualClock:
+    """
+    Stands in for the time module inside app.utils.sse.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def synthetic_tokens(rng: random.Random, count: int):
+    words = " ".join(rng.choice(FILLER) for _ in range(count // 8 + 1)).split(" ")
+    tokens = []
+    for word in words:
+        # Roughly how BPE splits English: short words whole, long ones in two
+        piece = f" {word}" if tokens else word
+        if len(piece) > 7:
+            tokens.extend([piece[:5], piece[5:]])
+        else:
+            tokens.append(piece)
+    return tokens[:count]
+
+
+def encode(tokens, protocol_version: int, clock: VirtualClock, token_ms: float):
+    encoder = AnswerStreamEncoder(protocol_version)
+    events = []
+    for token in tokens:
+        clock.now += token_ms / 1000
+        event = encoder.add(token)
+        if event:
+            events.append(event)
+    events.extend(encoder.finish())
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[200, 800])
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=23)
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    sse.time = clock
+    rng = random.Random(args.seed)
+
+    print(
+        f"{'tokens':>6} {'protocol':>8} {'events':>7} {'bytes':>10} {'gzip':>8} "
+        f"{'CPU ms':>8}"
+    )
+    for count in args.tokens:
+        tokens = synthetic_tokens(rng, count)
+        for protocol_version in (SSE_PROTOCOL_CUMULATIVE, SSE_PROTOCOL_DELTA):
+            events = encode(tokens, protocol_version, clock, args.token_ms)
+            stream = "".join(events).encode("utf-8")
+
+            started = time.process_time()
+            for _ in range(args.repeat):
+                encode(tokens, protocol_version, clock, args.token_ms)
+            cpu_ms = (time.process_time() - started) / args.repeat * 1000
+
+            print(
+                f"{len(tokens):6} {protocol_version:8} {len(events):7} {len(stream):10} "
+                f"{len(gzip.compress(stream)):8} {cpu_ms:8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
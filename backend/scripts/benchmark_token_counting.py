@@ -0,0 +1,117 @@
+"""
+Cost of counting prompt tokens on every turn of a long chat, before and
+after the tokenizer and count memoisation in app.utils.tokens.
+
+A conversation is replayed turn by turn; after each turn the whole history
+is counted, as the chat path does before every model call. "legacy" is
+count_tokens_in_messages as it was: resolve the encoding with
+tiktoken.encoding_for_model and encode every message on every call.
+"current" is OpenAiClient.count_tokens_in_messages. Both must agree.
+
+    python -m scripts.benchmark_token_counting --turns 20 100
+"""
+
+import argparse
+import random
+import sys
+import time
+import tiktoken
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from app.services.openai_client import OpenAiClient
+from scripts.synthetic_notes import FILLER, random_fact
+
+
+def legacy_count_tokens_in_messages(messages, model="gpt-4.1-nano"):
+    """
+    OpenAiClient.count_tokens_in_messages before the change, verbatim apart
+    from dropping self.
+    """
+    # Get the encoding for the model
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Fall back to cl100k_base for newer models not explicitly in tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+
+    # Per OpenAI's documentation for chat models
+    tokens_per_message = (
+        3  # every message follows <|start|>{role/name}\n{content}<|end|>
+    )
+    tokens_per_name = 1  # if there's a name, the role is omitted
+
+    # Base tokens for the entire request
+    num_tokens = 0
+
+    # Count tokens in each message
+    for message in messages:
+        num_tokens += tokens_per_message
+
+        # Count tokens in the content
+        if message.content:
+            num_tokens += len(encoding.encode(message.content))
+
+        # Count tokens in the name if applicable (rare in LangChain messages)
+        if hasattr(message, "name") and message.name:
+            num_tokens += tokens_per_name
+
+    # Add the final assistant reply token
+    num_tokens += 3
+
+    return num_tokens
+
+
+def conversation(rng: random.Random, turns: int, reply_sentences: int):
+    for _ in range(turns):
+        _, question = random_fact(rng)
+        reply = " ".join(rng.choice(FILLER) for _ in range(reply_sentences))
+        yield HumanMessage(content=question), AIMessage(content=reply)
+
+
+def replay(count_fn, system_prompt: str, turns):
+    """
+    Count the full history after every turn; returns (seconds, last count).
+    """
+    messages = [SystemMessage(content=system_prompt)]
+    elapsed = 0.0
+    total = 0
+    for human, ai in turns:
+        messages.append(human)
+        started = time.perf_counter()
+        total = count_fn(messages)
+        elapsed += time.perf_counter() - started
+        messages.append(ai)
+    return elapsed, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--reply-sentences", type=int, default=12)
+    parser.add_argument("--model", default="gpt-4.1-nano")
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+
+    client = OpenAiClient()
+    system_prompt = " ".join(FILLER) * 4
+    print(f"{'turns':>6} {'tokens':>8} {'legacy ms':>10} {'current ms':>11} {'speedup':>8}")
+    for turns in args.turns:
+        # A fresh conversation per size, so earlier runs do not warm the cache
+        rng = random.Random(f"{args.seed}-{turns}")
+        history = list(conversation(rng, turns, args.reply_sentences))
+        legacy, expected = replay(
+            lambda m: legacy_count_tokens_in_messages(m, args.model), system_prompt, history
+        )
+        current, actual = replay(
+            lambda m: client.count_tokens_in_messages(m, args.model), system_prompt, history
+        )
+        if actual != expected:
+            print(f"Count mismatch at {turns} turns: legacy {expected}, current {actual}")
+            sys.exit(1)
+        print(
+            f"{turns:6} {actual:8} {legacy * 1000:10.1f} {current * 1000:11.1f} "
+            f"{legacy / current:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Check that the iterative note text extractor (app.utils.note_content) gives
+byte-identical output to the original recursive implementation, and time
+both on large synthetic notes.
+
+The corpus is generated: synthetic notes with headings, nested lists and
+tables, plus mutated copies with missing keys, wrong types, None nodes and
+JSON-string content. --from-db also compares every note stored in the
+database. Inputs the recursive version cannot handle (it raises, e.g. on
+deep nesting) are counted separately. Exits with status 1 on any mismatch.
+
+    python -m scripts.check_note_text_extraction --documents 5000
+    python -m scripts.check_note_text_extraction --from-db
+"""
+
+import argparse
+import copy
+import json
+import random
+import re
+import sys
+import timeit
+from app.utils.note_content import extract_plain_text
+from scripts.synthetic_notes import large_note, random_note
+
+
+def legacy_extract_plain_text(json_content):
+    """
+    VectorService.extract_plain_text_from_json before the rewrite, verbatim
+    apart from dropping self.
+    """
+    # Convert string to JSON if needed
+    if isinstance(json_content, str):
+        try:
+            json_content = json.loads(json_content)
+        except json.JSONDecodeError:
+            return ""
+
+    # Helper function to recursively extract text from nodes
+    def extract_text_from_node(node):
+        texts = []
+
+        if not node:
+            return texts
+
+        if "type" in node and node["type"] == "table":
+            table_texts = []
+            if "content" in node and isinstance(node["content"], dict):
+                table_content = node["content"]
+
+                # Process rows
+                if "rows" in table_content and isinstance(
+                    table_content["rows"], list
+                ):
+                    for row in table_content["rows"]:
+                        row_texts = []
+
+                        # Process cells in the row
+                        if "cells" in row and isinstance(row["cells"], list):
+                            for cell in row["cells"]:
+                                cell_text = []
+
+                                # Extract text from cell content
+                                if "content" in cell and isinstance(
+                                    cell["content"], list
+                                ):
+                                    for content_item in cell["content"]:
+                                        cell_text.extend(
+                                            extract_text_from_node(content_item)
+                                        )
+
+                                row_texts.append(" ".join(cell_text))
+
+                        # Join cells with tabs to maintain table structure
+                        if row_texts:
+                            table_texts.append(" | ".join(row_texts))
+
+            # Join rows with newlines
+            if table_texts:
+                texts.append("\n" + "\n".join(table_texts) + "\n")
+
+        # Handle text nodes directly
+        elif "type" in node and node["type"] == "text" and "text" in node:
+            texts.append(node["text"])
+
+        # Process standard content array
+        elif "content" in node:
+            if isinstance(node["content"], list):
+                for item in node["content"]:
+                    texts.extend(extract_text_from_node(item))
+
+        # Process children array recursively
+        if "children" in node and isinstance(node["children"], list):
+            for child in node["children"]:
+                child_texts = extract_text_from_node(child)
+                if child_texts:
+                    texts.extend(child_texts)
+
+        return texts
+
+    # Process all top-level nodes
+    all_texts = []
+    if isinstance(json_content, list):
+        for node in json_content:
+            all_texts.extend(extract_text_from_node(node))
+    elif isinstance(json_content, dict):
+        all_texts.extend(extract_text_from_node(json_content))
+
+    # Join all text pieces with spaces
+    result = " ".join(all_texts).strip()
+
+    # Clean up spaces but preserve newlines
+    # First collapse multiple spaces within lines
+    result = re.sub(r" +", " ", result)
+    # Then collapse multiple newlines to single newlines
+    result = re.sub(r"\n+", "\n", result)
+
+    return result
+
+
+def _nodes(value):
+    """
+    Every dict inside a document, for picking mutation targets.
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def mutate(rng: random.Random, document):
+    """
+    A copy of document with a few structural faults of the kinds stored
+    content can have.
+    """
+    document = copy.deepcopy(document)
+    nodes = list(_nodes(document))
+    for _ in range(rng.randint(1, 4)):
+        node = rng.choice(nodes)
+        fault = rng.randrange(7)
+        if fault == 0:
+            node.pop(rng.choice(list(node) or ["content"]), None)
+        elif fault == 1 and "content" in node:
+            node["content"] = rng.choice([None, "", {}, "plain string", 42])
+        elif fault == 2 and "children" in node:
+            node["children"] = rng.choice([None, {}, [None, {}], "text"])
+        elif fault == 3:
+            node["type"] = rng.choice(["text", "table", None, "unknown"])
+        elif fault == 4 and isinstance(node.get("content"), list):
+            node["content"].append(rng.choice([None, {}, {"type": "text"}]))
+        elif fault == 5:
+            node["text"] = rng.choice(["", "  spaced  out  ", "multi\n\n\nline"])
+        elif fault == 6 and node.get("type") == "table":
+            node["content"] = {"rows": [{"cells": [{}, {"content": None}]}, {}]}
+    return document
+
+
+def corpus(rng: random.Random, documents: int):
+    for index in range(documents):
+        _, content, _ = random_note(rng, sections=rng.randint(1, 6), nesting=4)
+        variant = index % 5
+        if variant == 1:
+            content = mutate(rng, content)
+        elif variant == 2:
+            content = json.dumps(content)
+        elif variant == 3:
+            content = rng.choice(content) if content else {}
+        elif variant == 4:
+            content = rng.choice(["", "not json", "[]", "{}", None, [], [None]])
+        yield content
+
+
+def compare(documents):
+    checked = mismatched = legacy_failed = 0
+    for content in documents:
+        try:
+            expected = legacy_extract_plain_text(content)
+        except Exception:
+            legacy_failed += 1
+            continue
+        checked += 1
+        actual = extract_plain_text(content)
+        if actual.encode("utf-8") != expected.encode("utf-8"):
+            mismatched += 1
+            if mismatched <= 5:
+                print(f"Mismatch:\n  expected {expected[:200]!r}\n  actual   {actual[:200]!r}")
+    return checked, mismatched, legacy_failed
+
+
+def notes_from_db(batch_size: int = 500):
+    from app.db.database import SessionLocal
+    from app.models.note import Note
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Note.content).execution_options(yield_per=batch_size)
+        for (content,) in rows:
+            yield content
+    finally:
+        db.close()
+
+
+def benchmark(rng: random.Random, blocks: int, number: int):
+    document = large_note(rng, blocks, nesting=8)
+    size = len(json.dumps(document))
+    legacy = min(
+        timeit.repeat(lambda: legacy_extract_plain_text(document), number=number, repeat=5)
+    )
+    current = min(
+        timeit.repeat(lambda: extract_plain_text(document), number=number, repeat=5)
+    )
+    print(
+        f"{blocks:>6} blocks ({size / 1024:8.0f} KiB): recursive "
+        f"{legacy / number * 1000:8.2f} ms, iterative {current / number * 1000:8.2f} ms "
+        f"({legacy / current:4.2f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--number", type=int, default=5, help="calls per timing")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    documents = notes_from_db() if args.from_db else corpus(rng, args.documents)
+    checked, mismatched, legacy_failed = compare(documents)
+    print(
+        f"Compared {checked} documents: {mismatched} mismatches "
+        f"({legacy_failed} skipped because the recursive version raised)"
+    )
+
+    # Nesting the recursive version cannot handle at all
+    deep = current = {"type": "paragraph", "content": [], "children": []}
+    for level in range(sys.getrecursionlimit() * 2):
+        child = {"type": "paragraph", "content": [{"type": "text", "text": str(level)}]}
+        current["children"] = [child]
+        current = child
+    try:
+        legacy_extract_plain_text(deep)
+        print("Deep nesting: recursive version succeeded")
+    except RecursionError:
+        print("Deep nesting: recursive version hit the recursion limit")
+    print(f"Deep nesting: iterative version extracted {len(extract_plain_text(deep))} chars")
+
+    print("\nMicro-benchmark on large synthetic notes")
+    for blocks in args.sizes:
+        benchmark(rng, blocks, args.number)
+
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Offline evaluation of the retrieval modes: recall@k and latency of vector,
+lexical and hybrid search on a synthetic corpus.
+
+Synthetic notes are indexed for a temporary user through
+VectorService.index_note. Every fact stored in a note comes with a
+paraphrased question; a question counts as recalled at k when a chunk of the
+note holding its fact is among the top k results. Questions that mention an
+identifier (ticket or error codes) are also reported separately, since that
+is where lexical search is expected to help.
+
+Needs the database from DATABASE_URL with the migrations applied, Redis, and
+an OpenAI key unless --embeddings hashed is used. Everything created is
+deleted afterwards. Result caching is disabled so every search is timed.
+
+    python -m scripts.evaluate_retrieval --notes 200 --k 1 3 5
+"""
+
+import argparse
+import random
+import re
+import time
+from app.config import settings
+from app.db.database import SessionLocal
+from app.models.note import Note
+from app.services.vector_service import VectorService
+from scripts.synthetic_notes import (
+    hashed_embedding,
+    percentile,
+    random_note,
+    temporary_user,
+)
+
+SOURCE_ID_PATTERN = re.compile(r"\(ID: ([0-9a-f-]{36})\)\]")
+CODE_PATTERN = re.compile(r"\b[A-Z]{2}-\d{4}\b")
+
+
+def build_corpus(vs: VectorService, db, user, workspace, args):
+    rng = random.Random(args.seed)
+    questions = []
+    for _ in range(args.notes):
+        title, content, facts = random_note(rng, facts=args.facts_per_note)
+        note = Note(
+            title=title, content=content, user_id=user.id, workspace_id=workspace.id
+        )
+        db.add(note)
+        db.commit()
+        vs.index_note(note, db)
+        questions.extend((question, str(note.id)) for _, question in facts)
+    return questions
+
+
+def evaluate(vs: VectorService, db, user, questions, mode: str, ks, repeat: int):
+    hits = {k: {"all": 0, "identifier": 0} for k in ks}
+    counts = {"all": 0, "identifier": 0}
+    latencies = []
+    for question, note_id in questions:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = vs.search_similar_chunks(
+                question, db, max(ks), user.id, search_mode=mode
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        note_ids = [
+            match.group(1) if match else None
+            for match in (SOURCE_ID_PATTERN.search(result) for result in results)
+        ]
+        kinds = ["all"] + (["identifier"] if CODE_PATTERN.search(question) else [])
+        for kind in kinds:
+            counts[kind] += 1
+            for k in ks:
+                if note_id in note_ids[:k]:
+                    hits[k][kind] += 1
+
+    recall = {
+        kind: {k: hits[k][kind] / counts[kind] if counts[kind] else None for k in ks}
+        for kind in counts
+    }
+    return recall, latencies, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--facts-per-note", type=int, default=2)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument(
+        "--modes", nargs="+", default=["vector", "lexical", "hybrid"]
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per question")
+    parser.add_argument("--embeddings", choices=["openai", "hashed"], default="openai")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    settings.QUERY_CACHE_ENABLED = False
+    vs = VectorService()
+    if args.embeddings == "hashed":
+        dimensions = settings.EMBEDDING_DIMENSIONS
+        vs.embed_texts = lambda texts: [hashed_embedding(t, dimensions) for t in texts]
+        vs.embed_query = lambda query: hashed_embedding(query, dimensions)
+
+    db = SessionLocal()
+    try:
+        with temporary_user(db) as (user, workspace):
+            started = time.perf_counter()
+            questions = build_corpus(vs, db, user, workspace, args)
+            print(
+                f"Indexed {args.notes} notes ({len(questions)} questions) in "
+                f"{time.perf_counter() - started:.1f}s with {args.embeddings} embeddings"
+            )
+
+            header = " ".join(f"R@{k:<5}" for k in args.k)
+            print(f"\n{'mode':8} {'questions':12} {header} {'p50 ms':>8} {'p95 ms':>8}")
+            for mode in args.modes:
+                recall, latencies, counts = evaluate(
+                    vs, db, user, questions, mode, args.k, args.repeat
+                )
+                for kind in ("all", "identifier"):
+                    if not counts[kind]:
+                        continue
+                    values = " ".join(f"{recall[kind][k]:<7.3f}" for k in args.k)
+                    timing = (
+                        f"{percentile(latencies, 50):8.1f} {percentile(latencies, 95):8.1f}"
+                        if kind == "all"
+                        else ""
+                    )
+                    label = f"{kind} ({counts[kind]})"
+                    print(f"{mode:8} {label:12} {values} {timing}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Synthetic BlockNote notes and helpers shared by the evaluation and benchmark
+scripts in this directory. Run the scripts from backend/, e.g.
+
+    python -m scripts.evaluate_retrieval --help
+"""
+
+import hashlib
+import random
+import re
+import uuid
+from contextlib import contextmanager
+from typing import List, Tuple
+import numpy as np
+
+PROJECTS = [
+    "Apollo", "Borealis", "Cobalt", "Dynamo", "Ember", "Falcon", "Granite",
+    "Helix", "Ion", "Juniper", "Kestrel", "Lumen", "Meridian", "Nimbus",
+    "Onyx", "Pulsar", "Quartz", "Riviera", "Sequoia", "Tundra",
+]
+PEOPLE = [
+    "Alice", "Bao", "Carmen", "Dmitri", "Esther", "Farid", "Grace", "Hiro",
+    "Ingrid", "Jamal", "Keiko", "Luis", "Mei", "Nadia", "Omar", "Priya",
+]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+CITIES = ["Lisbon", "Osaka", "Denver", "Nairobi", "Oslo", "Hanoi", "Quito"]
+
+# (sentence stored in the note, question asked about it). The questions are
+# paraphrased so that they only partly share words with the sentence.
+FACTS = [
+    (
+        "The {project} budget review moved to {day} afternoon.",
+        "When are we discussing money for {project}?",
+    ),
+    (
+        "{person} will present the {project} roadmap at the all-hands.",
+        "Who is giving the talk about where {project} is heading?",
+    ),
+    (
+        "Ship {project} with make release-{code} once the smoke tests pass.",
+        "How do I deploy {project} to production?",
+    ),
+    (
+        "Error {code} in {project} means the cache warmed up too slowly.",
+        "What does {code} mean?",
+    ),
+    (
+        "The {project} offsite is in {city}; {person} books the hotel.",
+        "Where is the {project} team trip and who handles lodging?",
+    ),
+    (
+        "{person} owns the on-call rotation for {project} this quarter.",
+        "Who do I page when {project} breaks?",
+    ),
+    (
+        "Customer ticket {code} asks for CSV export in {project}.",
+        "Which ticket requested spreadsheet downloads?",
+    ),
+    (
+        "The {project} database migration needs a maintenance window on {day}.",
+        "When is {project} downtime scheduled for the schema change?",
+    ),
+]
+
+FILLER = [
+    "We agreed to revisit this after the next planning session.",
+    "Remember to update the shared document with the latest numbers.",
+    "Most of the discussion was about priorities for the coming weeks.",
+    "Several follow-ups are still open and need an owner.",
+    "The notes below are a rough summary of what was said.",
+    "Feedback from the last retrospective was mostly positive.",
+    "Keep an eye on the metrics dashboard after each release.",
+    "A few people asked for clearer documentation of the process.",
+    "Action items are tracked in the team board, not here.",
+    "The draft still needs a review before it is shared widely.",
+]
+
+
+def _inline(text: str) -> list:
+    return [{"type": "text", "text": text, "styles": {}}]
+
+
+def _block(block_type: str, text: str = "", **extra) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": block_type,
+        "props": extra.pop("props", {}),
+        "content": _inline(text) if text else [],
+        "children": extra.pop("children", []),
+        **extra,
+    }
+
+
+def _table(rng: random.Random, rows: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": "table",
+        "props": {},
+        "content": {
+            "type": "tableContent",
+            "rows": [
+                {
+                    "cells": [
+                        _inline(rng.choice(PROJECTS)),
+                        _inline(rng.choice(PEOPLE)),
+                        _inline(str(rng.randint(1, 99))),
+                    ]
+                }
+                for _ in range(rows)
+            ],
+        },
+        "children": [],
+    }
+
+
+def random_code(rng: random.Random) -> str:
+    return f"{rng.choice('ABCDEFGHKMNPQRSTX')}{rng.choice('KMPQRSTX')}-{rng.randint(1000, 9999)}"
+
+
+def random_fact(rng: random.Random) -> Tuple[str, str]:
+    sentence, question = rng.choice(FACTS)
+    values = {
+        "project": rng.choice(PROJECTS),
+        "person": rng.choice(PEOPLE),
+        "day": rng.choice(DAYS),
+        "city": rng.choice(CITIES),
+        "code": random_code(rng),
+    }
+    return sentence.format(**values), question.format(**values)
+
+
+def random_note(
+    rng: random.Random, sections: int = 3, facts: int = 1, nesting: int = 2
+) -> Tuple[str, list, List[Tuple[str, str]]]:
+    """
+    A note as (title, BlockNote content, [(fact, question)]). Sections hold
+    a heading, paragraphs, list items (nested up to nesting levels) and the
+    occasional table; facts are placed in random paragraphs.
+    """
+    note_facts = [random_fact(rng) for _ in range(facts)]
+    paragraphs = []
+    blocks = []
+    for section in range(sections):
+        blocks.append(
+            _block(
+                "heading",
+                f"{rng.choice(PROJECTS)} {rng.choice(['notes', 'plan', 'status'])}",
+                props={"level": rng.choice([1, 2, 3])},
+            )
+        )
+        for _ in range(rng.randint(1, 3)):
+            paragraph = _block("paragraph", " ".join(rng.sample(FILLER, 3)))
+            paragraphs.append(paragraph)
+            blocks.append(paragraph)
+        item = _block("bulletListItem", rng.choice(FILLER))
+        blocks.append(item)
+        for _ in range(rng.randint(0, nesting)):
+            child = _block("bulletListItem", rng.choice(FILLER))
+            item["children"].append(child)
+            item = child
+        if rng.random() < 0.3:
+            blocks.append(_table(rng, rng.randint(2, 5)))
+
+    for fact, _ in note_facts:
+        paragraph = rng.choice(paragraphs)
+        paragraph["content"].append({"type": "text", "text": " " + fact, "styles": {}})
+
+    title = f"{rng.choice(PROJECTS)} {rng.choice(['meeting', 'notes', 'ideas', 'log'])}"
+    return title, blocks, note_facts
+
+
+def large_note(rng: random.Random, blocks: int, nesting: int = 6) -> list:
+    """
+    A long document for throughput benchmarks: many sections with deep list
+    nesting and tables.
+    """
+    content = []
+    while len(content) < blocks:
+        content.extend(random_note(rng, sections=5, facts=2, nesting=nesting)[1])
+    return content[:blocks]
+
+
+def hashed_embedding(text: str, dimensions: int) -> List[float]:
+    """
+    Deterministic bag-of-words embedding (feature hashing of words and word
+    bigrams). Lets the scripts run without an API key; it has no notion of
+    synonyms, so quality numbers from it are only a lower bound.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    words = re.findall(r"\w+", text.lower())
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if value >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+@contextmanager
+def temporary_user(db):
+    """
+    A throwaway user with one workspace; everything created for it is
+    deleted on exit.
+    """
+    from app.models.document_embedding import DocumentEmbedding
+    from app.models.note import Note
+    from app.models.user import User
+    from app.models.workspace import Workspace
+
+    user = User(email=f"benchmark-{uuid.uuid4()}@example.invalid", username="benchmark")
+    db.add(user)
+    db.flush()
+    workspace = Workspace(name="Benchmark", user_id=user.id)
+    db.add(workspace)
+    db.commit()
+    try:
+        yield user, workspace
+    finally:
+        db.rollback()
+        note_ids = db.query(Note.id).filter(Note.user_id == user.id)
+        db.query(DocumentEmbedding).filter(DocumentEmbedding.note_id.in_(note_ids)).delete(
+            synchronize_session=False
+        )
+        db.query(Note).filter(Note.user_id == user.id).delete(synchronize_session=False)
+        db.query(Workspace).filter(Workspace.user_id == user.id).delete(
+            synchronize_session=False
+        )
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def db():
+    """
+    A session on the configured database whose changes are rolled back at
+    the end of the test. Tests using it are skipped when Postgres is not
+    reachable.
+    """
+    from app.db.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError as e:
+        session.close()
+        pytest.skip(f"database not reachable: {e}")
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
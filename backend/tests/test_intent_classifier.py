@@ -0,0 +1,55 @@
+import uuid
+import pytest
+from app.services.intent_classifier_service import IntentClassifierService
+
+
+@pytest.fixture
+def classifier():
+    def embed_query(_):
+        raise AssertionError("rules must not embed the message")
+
+    return IntentClassifierService(embed_query)
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["Summarize this note", "tl;dr of the current note", "Recap this note please"],
+)
+def test_open_note_summary_uses_the_note_hint(classifier, message):
+    note_id = uuid.uuid4()
+
+    decision = classifier.classify_by_rules(message, False, [note_id])
+
+    assert decision == {"type": "summarize_note", "query": str(note_id)}
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Summarize my note on the budget review",
+        "Give me a summary of the note about the offsite",
+        "Recap the note from Tuesday's standup",
+    ],
+)
+def test_other_note_summary_is_not_the_open_note(classifier, message):
+    decision = classifier.classify_by_rules(message, False, [uuid.uuid4()])
+
+    assert decision is None
+
+
+def test_summary_by_id_ignores_the_note_hint(classifier):
+    note_id = uuid.uuid4()
+
+    decision = classifier.classify_by_rules(
+        f"Summarize note {note_id}", False, [uuid.uuid4()]
+    )
+
+    assert decision == {"type": "summarize_note", "query": str(note_id)}
+
+
+def test_my_note_on_a_topic_is_a_search(classifier):
+    message = "What's in my note on the Apollo launch?"
+
+    decision = classifier.classify_by_rules(message, False, [uuid.uuid4()])
+
+    assert decision == {"type": "search", "query": message}
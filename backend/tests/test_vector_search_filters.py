@@ -0,0 +1,99 @@
+import uuid
+import numpy as np
+import pytest
+from sqlalchemy import insert, text
+from app.config import settings
+from app.models.document_embedding import DocumentEmbedding
+from app.models.note import Note
+from app.models.user import User
+from app.models.workspace import Workspace
+from app.services.vector_service import VectorService
+
+TOP_K = 5
+
+
+def unit_rows(rng, count, center=None):
+    vectors = rng.standard_normal((count, settings.EMBEDDING_DIMENSIONS))
+    if center is not None:
+        vectors = vectors * 0.05 + center
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def add_user_chunks(db, vectors):
+    user = User(email=f"test-{uuid.uuid4()}@example.invalid", username="test")
+    db.add(user)
+    db.flush()
+    workspace = Workspace(name="Test", user_id=user.id)
+    db.add(workspace)
+    db.flush()
+    note = Note(title="Test", user_id=user.id, workspace_id=workspace.id)
+    db.add(note)
+    db.flush()
+    db.execute(
+        insert(DocumentEmbedding).values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "note_id": note.id,
+                    "user_id": user.id,
+                    "workspace_id": workspace.id,
+                    "chunk_index": index,
+                    "content": f"chunk {index}",
+                    "embedding": vector.tolist(),
+                }
+                for index, vector in enumerate(vectors)
+            ]
+        )
+    )
+    return user
+
+
+@pytest.fixture
+def selective_scope(db, monkeypatch):
+    """
+    Another user's chunks cluster around the query, so the ANN index's
+    nearest rows are almost all outside the searched user's scope.
+    """
+    if db.execute(
+        text("SELECT 1 FROM pg_extension WHERE extname = 'vector'")
+    ).scalar() is None:
+        pytest.skip("pgvector is not installed")
+
+    rng = np.random.default_rng(0)
+    query = unit_rows(rng, 1)[0]
+
+    def add_scope(scoped_rows, other_rows):
+        add_user_chunks(db, unit_rows(rng, other_rows, center=query))
+        user = add_user_chunks(db, unit_rows(rng, scoped_rows))
+        db.execute(text("ANALYZE document_embeddings"))
+        # Make the planner use the ANN index even on a small test table
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        return user
+
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_INDEX_ENABLED", False)
+    monkeypatch.setattr(settings, "VECTOR_BINARY_RERANK", False)
+    vs = VectorService()
+    monkeypatch.setattr(vs, "embed_query", lambda _: query.tolist())
+    return vs, add_scope
+
+
+def test_small_scope_returns_top_k(db, selective_scope):
+    vs, add_scope = selective_scope
+    user = add_scope(scoped_rows=8, other_rows=2000)
+
+    rows = vs.vector_search("question", db, TOP_K, user.id, None, None)
+
+    assert len(rows) == TOP_K
+
+
+def test_selective_scope_on_ann_index_returns_top_k(db, selective_scope, monkeypatch):
+    vs, add_scope = selective_scope
+    # Force the ANN path, which alone returned about ef_search * 9% rows
+    monkeypatch.setattr(settings, "VECTOR_EXACT_SCAN_MAX_ROWS", 0)
+    user = add_scope(scoped_rows=200, other_rows=2000)
+
+    rows = vs.vector_search("question", db, TOP_K, user.id, None, None)
+
+    assert len(rows) == TOP_K
+    distances = [row.distance for row in rows]
+    assert distances == sorted(distances)
@@ -9,9 +9,32 @@ export interface ChatMessage {
 export interface ChatbotRequest {
   message: string;
   note_ids?: string[] | null;
+  current_note_id?: string | null;
+  session_id?: string | null;
   chat_history?: ChatMessage[];
+  protocol_version?: 1 | 2;
 }
 
+export interface ChatSession {
+  session_id: string;
+  summary: string;
+  turns: ChatMessage[];
+}
+
+export const CHAT_SESSION_NOT_FOUND = 'CHAT_SESSION_NOT_FOUND';
+
+// Server-side chat session: the history stays on the server, so each request
+// only carries the new message
+export const createChatSession = async (): Promise<ChatSession> => {
+  const res = await api.post('/chatbot/sessions');
+  return res.data;
+};
+
+export const deleteChatSession = async (sessionId: string) => {
+  const res = await api.delete(`/chatbot/sessions/${sessionId}`);
+  return res.data;
+};
+
 // Streaming API call
 export const sendMessageChatbot = async (
   request: ChatbotRequest,
@@ -29,10 +52,14 @@ export const sendMessageChatbot = async (
         'Content-Type': 'application/json',
         Authorization: `Bearer ${token}`,
       },
-      body: JSON.stringify(request),
+      // Protocol 2: the server sends only new text per event
+      body: JSON.stringify({ protocol_version: 2, ...request }),
     });
 
     if (!response.ok) {
+      if (response.status === 404 && request.session_id) {
+        throw new Error(CHAT_SESSION_NOT_FOUND);
+      }
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
@@ -40,6 +67,7 @@ export const sendMessageChatbot = async (
     const reader = response.body!.getReader();
     const decoder = new TextDecoder();
     let buffer = '';
+    let answer = '';
 
     while (true) {
       const { value, done } = await reader.read();
@@ -61,7 +89,13 @@ export const sendMessageChatbot = async (
           const jsonData = message.slice(6); // Remove 'data: ' prefix
           try {
             const data = JSON.parse(jsonData);
-            onChunk(data.answer, data.done, data);
+            if (typeof data.delta === 'string') {
+              answer += data.delta;
+              onChunk(answer, data.done, data);
+            } else {
+              // Final (or error) event: carries the full answer
+              onChunk(data.answer, data.done, data);
+            }
           } catch (e) {
             console.error('Error parsing message:', message, e);
           }
@@ -3,7 +3,12 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/u
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Bot, Send, Loader2, MessageSquare, AlertTriangle, RefreshCw } from 'lucide-react';
-import { sendMessageChatbot } from '@/api/chatbot';
+import {
+  CHAT_SESSION_NOT_FOUND,
+  createChatSession,
+  deleteChatSession,
+  sendMessageChatbot,
+} from '@/api/chatbot';
 import { cn } from '@/lib/utils';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { Avatar, AvatarFallback } from '@/components/ui/avatar';
@@ -26,6 +31,7 @@ export default function ChatbotModal() {
   const [historyLimitExceeded, setHistoryLimitExceeded] = useState(false);
   const scrollRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
+  const sessionIdRef = useRef<string | null>(null);
   const { noteId } = useParams<{ noteId: string }>();
 
   // Effect for auto-scrolling and auto-focusing
@@ -45,6 +51,12 @@ export default function ChatbotModal() {
   }, [messages, open]);
 
   const resetChat = useCallback(() => {
+    if (sessionIdRef.current) {
+      deleteChatSession(sessionIdRef.current).catch((err) =>
+        console.log('Failed to delete chat session', err)
+      );
+      sessionIdRef.current = null;
+    }
     setMessages([]);
     setHistoryLimitExceeded(false);
     toast('Chat history reset');
@@ -70,11 +82,16 @@ export default function ChatbotModal() {
     setIsStreaming(true);
 
     try {
+      if (!sessionIdRef.current) {
+        const session = await createChatSession();
+        sessionIdRef.current = session.session_id;
+      }
       await sendMessageChatbot(
         {
           message: input,
-          note_ids: noteId ? [noteId] : [],
-          chat_history: messages,
+          // The open note is a hint for "this note", not a search filter
+          current_note_id: noteId ?? null,
+          session_id: sessionIdRef.current,
         },
         // This callback gets called with each chunk
         (chunk, isDone, responseObj) => {
@@ -115,6 +132,10 @@ export default function ChatbotModal() {
       );
     } catch (error) {
       console.error('Chatbot error:', error);
+      if (error instanceof Error && error.message === CHAT_SESSION_NOT_FOUND) {
+        // The session expired; the next message starts a new one
+        sessionIdRef.current = null;
+      }
       setMessages((msgs) => {
         const messages = [...msgs];
         const lastIndex = messages.length - 1;